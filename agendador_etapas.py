@@ -0,0 +1,169 @@
+"""
+Agendador de Etapas em Paralelo
+Priceless Bank - Mastercard Challenge 2025
+
+As etapas de um pipeline (cache_etapas.Etapa) já declaram suas dependências
+e formam um grafo. O agendador calcula, em um pool de threads, cada etapa
+assim que todas as suas dependências ficam prontas, enquanto o script segue
+pedindo os resultados na ordem dos relatórios: resultado() de uma etapa em
+andamento espera por ela. Com as etapas independentes rodando ao mesmo
+tempo, o tempo total se aproxima do caminho crítico do grafo em vez da soma
+das etapas.
+
+Threads bastam: o grosso do trabalho está no numpy, no pandas e no sklearn,
+que liberam o GIL, e os resultados ficam em memória, sem cópia nem pickle
+entre processos. A varredura de k e os gráficos continuam nos seus próprios
+pools de processos, que são criados de dentro das etapas, com outras
+threads rodando: por isso usam contexto_processos(), e não o fork padrão,
+que copiaria travas em poder de outras threads e poderia deixar os
+processos filhos bloqueados para sempre.
+
+Só as etapas necessárias são agendadas: as pedidas e, das que não estão em
+cache, as dependências. Uma etapa com erro não agenda as que dependem dela;
+o erro aparece no resultado() de quem a pedir.
+
+Com liberar=True (execuções com orçamento de memória, ver
+orcamento_memoria.py), cada etapa descarta seu resultado assim que as
+dependentes terminam e, se foi pedida, assim que o script o recebe: um
+DataFrame intermediário só vive enquanto alguém ainda o usa.
+
+Uso:
+    from agendador_etapas import AgendadorEtapas
+    with AgendadorEtapas([etapas['demografia'], etapas['perfil']], n_threads=4):
+        demografia = etapas['demografia'].resultado()
+        perfil = etapas['perfil'].resultado()
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def contexto_processos():
+    """
+    Contexto de multiprocessing seguro para criar pools a partir de threads:
+    forkserver (os processos nascem de um servidor sem threads) ou, onde ele
+    não existe, spawn.
+    """
+    metodo = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(metodo)
+
+
+def etapas_necessarias(pedidas):
+    """
+    Etapas a calcular para obter as `pedidas`, cada uma com as dependências
+    que precisam terminar antes dela (nenhuma, se a etapa está em cache).
+    """
+    necessarias = {}
+    pilha = list(pedidas)
+    while pilha:
+        etapa = pilha.pop()
+        if etapa in necessarias:
+            continue
+        necessarias[etapa] = [] if etapa.em_cache() else list(etapa.dependencias)
+        pilha.extend(necessarias[etapa])
+    return necessarias
+
+
+class AgendadorEtapas:
+    """
+    Calcula as etapas pedidas (e as necessárias para elas) em até
+    `n_threads` threads (None: uma por núcleo). Com 1 thread, nada é
+    agendado e cada etapa é calculada sob demanda, na thread que pedir o
+    resultado, como sem o agendador. Com `liberar`, os resultados saem da
+    memória das etapas depois do último consumo, com ou sem threads.
+    """
+
+    def __init__(self, etapas, n_threads=None, liberar=False):
+        self.etapas = list(etapas)
+        self.n_threads = n_threads or os.cpu_count() or 1
+        self.liberar = liberar
+        self.futuros = {}
+        self._faltando = {}
+        self._dependentes = {}
+        self._executor = None
+        self._ativas = 0
+        self._cancelado = False
+        self._condicao = threading.Condition()
+
+    def iniciar(self):
+        if self._executor is not None or (self.n_threads == 1 and not self.liberar):
+            return self
+        # As chaves (hashes das entradas) são calculadas aqui, na thread principal
+        necessarias = etapas_necessarias(self.etapas)
+        if self.liberar:
+            self._reter(necessarias)
+        if self.n_threads == 1:
+            return self
+        for etapa, dependencias in necessarias.items():
+            self._faltando[etapa] = set(dependencias)
+            for dependencia in dependencias:
+                self._dependentes.setdefault(dependencia, []).append(etapa)
+        self._executor = ThreadPoolExecutor(max_workers=min(self.n_threads, len(necessarias)) or 1,
+                                            thread_name_prefix='etapa')
+        for etapa in [e for e, faltando in self._faltando.items() if not faltando]:
+            self._submeter(etapa)
+        return self
+
+    def _reter(self, necessarias):
+        # Consumidores: as dependentes que serão calculadas e o script, se a pediu
+        consumidores = dict.fromkeys(necessarias, 0)
+        for etapa in self.etapas:
+            consumidores[etapa] = 1
+        for dependencias in necessarias.values():
+            for dependencia in dependencias:
+                consumidores[dependencia] += 1
+        for etapa, n in consumidores.items():
+            etapa.reter(n)
+
+    def _submeter(self, etapa):
+        with self._condicao:
+            if self._cancelado:
+                return
+            self._ativas += 1
+            self.futuros[etapa] = self._executor.submit(etapa.calcular)
+        self.futuros[etapa].add_done_callback(lambda futuro: self._concluida(etapa, futuro))
+
+    def _concluida(self, etapa, futuro):
+        try:
+            if futuro.cancelled() or futuro.exception() is not None:
+                return
+            prontas = []
+            with self._condicao:
+                for dependente in self._dependentes.get(etapa, []):
+                    self._faltando[dependente].discard(etapa)
+                    if not self._faltando[dependente]:
+                        prontas.append(dependente)
+            for dependente in prontas:
+                self._submeter(dependente)
+        finally:
+            # As dependentes já foram contadas antes de esta sair da conta
+            with self._condicao:
+                self._ativas -= 1
+                self._condicao.notify_all()
+
+    def esperar(self):
+        """Espera todas as etapas agendadas; repassa o primeiro erro."""
+        if self._executor is None:
+            return
+        with self._condicao:
+            self._condicao.wait_for(lambda: self._ativas == 0)
+        for futuro in list(self.futuros.values()):
+            futuro.result()
+
+    def encerrar(self, cancelar=False):
+        if self._executor is None:
+            return
+        with self._condicao:
+            self._cancelado = cancelar
+        if not cancelar:
+            self.esperar()
+        self._executor.shutdown(wait=True, cancel_futures=cancelar)
+        self._executor = None
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, tipo, erro, traceback):
+        self.encerrar(cancelar=erro is not None)
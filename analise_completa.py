@@ -0,0 +1,172 @@
+"""
+Análise Completa: Segmentação e Renda x Idade
+Priceless Bank - Mastercard Challenge 2025
+
+Roda analise_segmentacao.py e analise_renda_idade.py (em memória) em uma
+única execução. A base é carregada e as features são calculadas uma vez; a
+análise de renda parte das features da segmentação e refaz só as faixas
+etárias detalhadas. As etapas das duas análises formam um único grafo,
+calculado em --threads threads (ver agendador_etapas.py): as etapas de
+renda rodam enquanto a varredura de k e os relatórios da segmentação
+avançam. Relatórios em texto, CSVs, gráficos e modelo são os mesmos das
+duas execuções separadas, na mesma ordem.
+
+As etapas de renda entram no cache da segmentação com o prefixo 'renda.'.
+
+Com --memoria-maxima (ver orcamento_memoria.py), as etapas rodam em
+sequência e cada uma sai da memória depois do último consumo: as features
+e o k-means da segmentação são liberados antes de a análise de renda montar
+as suas tabelas.
+
+Uso:
+    python analise_completa.py [--arquivo Base_clientes.csv] [--threads N]
+                               [--sem-cache] [--limpar-cache] [--k K] [--processos N]
+                               [--graficos auto|exato|densidade|amostra]
+                               [--relatorio compartilhado|independente|painel|pacote|nenhum]
+                               [--processos-graficos N] [--sem-graficos]
+                               [--erro-quantis E] [--top-por Estado|Cidade|Faixa_Etaria] [--top-n N]
+                               [--memoria-maxima TAMANHO]
+                               [--instrumentacao leve|detalhada|desligada] [--trace]
+"""
+
+import argparse
+import sys
+
+import analise_renda_idade
+import analise_segmentacao
+import instrumentacao
+import relatorio_html
+from agendador_etapas import AgendadorEtapas
+from cache_etapas import CacheEtapas, DIRETORIO_CACHE
+from estatisticas_streaming import ERRO_QUANTIS
+from graficos_grandes import MODOS
+from instrumentacao import MODOS_INSTRUMENTACAO
+from orcamento_memoria import relatorio_orcamento, relatorio_pico, tamanho_memoria, verificar_orcamento
+from relatorio_html import MODOS_RELATORIO
+
+ARQUIVO_EXECUCAO = 'execucao_analise_completa.json'
+PREFIXO_RENDA = 'renda.'
+
+
+def montar_etapas(caminho=analise_segmentacao.ARQUIVO_CLIENTES, cache=None, n_clusters=None,
+                  n_processos=None, erro_quantis=ERRO_QUANTIS, economizar_memoria=False):
+    """Etapas das duas análises, com a carga e as features da segmentação compartilhadas."""
+    cache = cache if cache is not None else CacheEtapas()
+    segmentacao = analise_segmentacao.montar_etapas(caminho, cache=cache, n_clusters=n_clusters,
+                                                    n_processos=n_processos,
+                                                    economizar_memoria=economizar_memoria)
+    renda = analise_renda_idade.montar_etapas(caminho, cache=cache, erro_quantis=erro_quantis,
+                                              features=segmentacao['features'], prefixo=PREFIXO_RENDA,
+                                              economizar_memoria=economizar_memoria)
+    return segmentacao, renda
+
+
+def executar(caminho=analise_segmentacao.ARQUIVO_CLIENTES, cache=None, modo_graficos='auto',
+             modo_relatorio='compartilhado', processos_graficos=None, n_threads=None,
+             topo_por=None, topo_n=analise_renda_idade.TOPO_N, n_clusters=None, n_processos=None,
+             erro_quantis=ERRO_QUANTIS, economizar_memoria=False):
+    segmentacao, renda = montar_etapas(caminho, cache, n_clusters, n_processos, erro_quantis,
+                                       economizar_memoria)
+    graficos = modo_relatorio != 'nenhum'
+    pedidas = analise_segmentacao.etapas_relatorio(segmentacao, graficos) + list(renda.values())
+
+    # Um só agendador para as duas análises (e para liberar os resultados);
+    # cada uma só consome os resultados
+    with AgendadorEtapas(pedidas, n_threads, liberar=economizar_memoria):
+        analise_segmentacao.executar_pipeline(caminho, cache=cache, modo_graficos=modo_graficos,
+                                              modo_relatorio=modo_relatorio,
+                                              processos_graficos=processos_graficos,
+                                              etapas=segmentacao, n_threads=1)
+
+        print()
+        analise_renda_idade.relatorio_inicio()
+        relatorio_html.configurar(modo_relatorio, titulo='Renda x Idade - Priceless Bank',
+                                  arquivo_painel='relatorio_renda_idade.html',
+                                  n_processos=processos_graficos)
+        analise_renda_idade.executar_em_memoria(caminho, modo_graficos, erro_quantis, topo_por, topo_n,
+                                                etapas=renda, n_threads=1)
+        arquivos_html = relatorio_html.finalizar()
+    analise_renda_idade.relatorio_arquivos(arquivos_html, topo_por, topo_n)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Segmentação e renda x idade em uma execução - Priceless Bank')
+    parser.add_argument('--arquivo', default=analise_segmentacao.ARQUIVO_CLIENTES,
+                        help='CSV da base de clientes')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='threads que calculam as etapas independentes ao mesmo tempo '
+                             '(padrão: uma por núcleo; 1: em sequência)')
+    parser.add_argument('--dir-cache', default=DIRETORIO_CACHE,
+                        help='diretório do cache de etapas')
+    parser.add_argument('--sem-cache', action='store_true',
+                        help='recalcula todas as etapas sem ler nem gravar o cache')
+    parser.add_argument('--limpar-cache', action='store_true',
+                        help='apaga o cache de etapas antes de executar')
+    k_range = analise_segmentacao.K_RANGE
+    parser.add_argument('--k', type=int, default=None, choices=k_range, metavar='K',
+                        help=f'número de segmentos, de {k_range.start} a {k_range.stop - 1} '
+                             '(padrão: detectado pelo cotovelo)')
+    parser.add_argument('--processos', type=int, default=None,
+                        help='processos da varredura de k e da atribuição dos segmentos (padrão: um por núcleo)')
+    parser.add_argument('--graficos', choices=MODOS, default='auto',
+                        help='dispersões exatas, agregadas em grade ou amostradas')
+    parser.add_argument('--relatorio', choices=MODOS_RELATORIO, default='compartilhado',
+                        help='formato dos gráficos (ver relatorio_html.py)')
+    parser.add_argument('--processos-graficos', type=int, default=None,
+                        help='processos que montam e gravam os gráficos (padrão: um por núcleo)')
+    parser.add_argument('--sem-graficos', action='store_true',
+                        help='só relatórios em texto, CSVs e modelo (o mesmo que --relatorio nenhum)')
+    parser.add_argument('--erro-quantis', type=float, default=ERRO_QUANTIS,
+                        help='erro de posição das medianas e percentis, em fração dos clientes')
+    parser.add_argument('--top-por', choices=analise_renda_idade.COLUNAS_TOPO, default=None,
+                        help='exporta também os clientes de maior renda de cada grupo')
+    parser.add_argument('--top-n', type=int, default=analise_renda_idade.TOPO_N,
+                        help=f'clientes por grupo em --top-por (padrão: {analise_renda_idade.TOPO_N})')
+    parser.add_argument('--memoria-maxima', type=tamanho_memoria, default=None, metavar='TAMANHO',
+                        help='orçamento de memória (ex.: 800M, 4G); ver orcamento_memoria.py')
+    parser.add_argument('--instrumentacao', choices=MODOS_INSTRUMENTACAO, default='leve',
+                        help=f'medições por seção gravadas em {ARQUIVO_EXECUCAO} (padrão: leve)')
+    parser.add_argument('--trace', action='store_true',
+                        help='grava também o trace das seções (formato do Chrome/Perfetto)')
+    args = parser.parse_args()
+    if args.sem_graficos:
+        args.relatorio = 'nenhum'
+
+    economizar_memoria = args.memoria_maxima is not None
+    if economizar_memoria:
+        args.threads = args.threads or 1
+        args.processos = args.processos or 1
+        args.processos_graficos = args.processos_graficos or 1
+        processos = sum(n for n in (args.processos, args.processos_graficos) if n > 1)
+        try:
+            clientes, estimativa = verificar_orcamento(args.memoria_maxima, 'completa',
+                                                       args.arquivo, processos)
+        except MemoryError as erro:
+            print(f"❌ {erro}")
+            sys.exit(1)
+        relatorio_orcamento(args.memoria_maxima, clientes, estimativa)
+
+    medicoes = instrumentacao.configurar(args.instrumentacao, nome='analise_completa')
+    cache = CacheEtapas(args.dir_cache, ativo=not args.sem_cache)
+    if args.limpar_cache:
+        cache.limpar()
+    with instrumentacao.secao('analise_completa'):
+        executar(args.arquivo, cache=cache, modo_graficos=args.graficos, modo_relatorio=args.relatorio,
+                 processos_graficos=args.processos_graficos, n_threads=args.threads,
+                 topo_por=args.top_por, topo_n=args.top_n, n_clusters=args.k,
+                 n_processos=args.processos, erro_quantis=args.erro_quantis,
+                 economizar_memoria=economizar_memoria)
+    if economizar_memoria:
+        relatorio_pico(args.memoria_maxima)
+    arquivos_execucao = medicoes.gravar(ARQUIVO_EXECUCAO,
+                                        trace=args.trace and ARQUIVO_EXECUCAO.replace('.json', '.trace.json'))
+    if arquivos_execucao:
+        print("\n📈 Relatório de execução:")
+        for arquivo in arquivos_execucao:
+            print(f"   • {arquivo}")
+    print("\n" + "="*80)
+
+
+if __name__ == '__main__':
+    main()
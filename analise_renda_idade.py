@@ -3,376 +3,903 @@ Análise de Correlação: Renda x Idade
 Priceless Bank - Mastercard Challenge 2025
 
 Objetivo: Identificar quais faixas etárias possuem maior poder aquisitivo
+
+Com --streaming, a base é lida em chunks de tamanho fixo e todas as tabelas
+são obtidas de estatísticas mescláveis (contagem, soma, M2, co-momentos e
+resumos de quantis por grupo), com memória limitada pelo tamanho do chunk. Os
+CSVs exportados são os mesmos do modo em memória.
+
+Nos dois modos, medianas, o corte do TOP 10% e os box plots saem dos mesmos
+resumos de quantis (exatos em bases pequenas; em bases grandes, com erro de
+posição de até --erro-quantis vezes o número de clientes).
+
+Uso:
+    python analise_renda_idade.py [--streaming] [--tamanho-chunk N] [--erro-quantis E]
+                                  [--graficos auto|exato|densidade|amostra]
+                                  [--relatorio compartilhado|independente|painel|pacote|nenhum]
+                                  [--processos-graficos N] [--sem-graficos] [--threads N]
+                                  [--top-por Estado|Cidade|Faixa_Etaria] [--top-n N]
+                                  [--memoria-maxima TAMANHO]
+                                  [--instrumentacao leve|detalhada|desligada] [--trace]
+
+O TOP 10% e, com --top-por, os --top-n clientes de maior renda de cada grupo
+saem de uma seleção parcial em memória ou de heaps limitados no modo
+streaming (ver selecao_topo.py), gravados direto no CSV.
+
+Com --sem-graficos (o mesmo que --relatorio nenhum), só os relatórios em
+texto e os CSVs são gerados e o plotly não é importado; para execuções
+agendadas em que só os arquivos interessam.
+
+Com --memoria-maxima, a análise em memória verifica antes de ler a base se
+a estimativa de pico cabe no orçamento (senão, indica o --streaming) e
+acumula correlação e quantis em blocos (ver orcamento_memoria.py).
+
+Em memória, os cálculos são etapas com dependências declaradas (as tabelas
+por estado, por faixa e por idade saem do cubo; o TOP 10%, dos quantis),
+calculadas em --threads threads assim que ficam prontas (ver
+agendador_etapas.py). analise_completa.py roda esta análise junto com a
+segmentação, sobre a mesma carga e as mesmas features.
+
+Cada execução grava execucao_renda_idade.json com tempo, CPU, memória e
+linhas de cada etapa, agregação e gráfico (ver instrumentacao.py).
 """
 
+# plotly é importado nas funções de figura: sem gráficos (--sem-graficos ou
+# --streaming), a execução não paga a importação
+import argparse
+import sys
 import pandas as pd
 import numpy as np
-from datetime import datetime
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import warnings
 warnings.filterwarnings('ignore')
 
-print("="*80)
-print("💰 ANÁLISE DETALHADA: RENDA x IDADE")
-print("="*80)
+from agendador_etapas import AgendadorEtapas
+from base_colunar import ARQUIVO_CLIENTES, carregar_clientes
+from cache_etapas import CacheEtapas, Etapa
+from cubo_agregado import CuboAgregado
+from estatisticas_streaming import (ERRO_QUANTIS, EstatisticasGrupo, MatrizComomentos, QuantisGrupo,
+                                    ResumoQuantis)
+from features_clientes import DATA_REFERENCIA, FAIXA_ETARIA_DETALHADA, calcular_features
+from graficos_grandes import LIMITE_PONTOS, MODOS, caixa, dispersao, escolher_modo
+import instrumentacao
+from instrumentacao import MODOS_INSTRUMENTACAO
+import relatorio_html
+from relatorio_html import MODOS_RELATORIO, agendar_figura
+from orcamento_memoria import (TAMANHO_BLOCO, relatorio_orcamento, relatorio_pico, tamanho_memoria,
+                               verificar_orcamento)
+from selecao_topo import (TopoStreaming, exportar_posicoes, posicoes_topo, posicoes_topo_grupo,
+                          quantidade_fracao)
+
+ARQUIVO_EXECUCAO = 'execucao_renda_idade.json'
+COLUNAS_BASE = ['Cliente_ID', 'Data_Nascimento', 'Renda_Anual', 'Estado', 'Cidade', 'Numero_Cartoes']
+COLUNAS_ANALISE = ['Cliente_ID', 'Idade', 'Renda_Anual', 'Faixa_Etaria', 'Estado', 'Cidade', 'Numero_Cartoes']
+_, BINS_FAIXA_ETARIA, LABELS_FAIXA_ETARIA = FAIXA_ETARIA_DETALHADA
+DIMENSOES_CUBO = ['Estado', 'Cidade', 'Faixa_Etaria', 'Idade']
+MEDIDAS_CUBO = ['Renda_Anual', 'Idade', 'Numero_Cartoes']
+TAMANHO_CHUNK = 100_000
+COLUNAS_TOPO = ['Estado', 'Cidade', 'Faixa_Etaria']
+TOPO_N = 100
+
 
 # ============================================================================
 # CARREGAR E PREPARAR DADOS
 # ============================================================================
-print("\n📊 Carregando dados...")
+def preparar_analise(df):
+    """Calcula Idade e Faixa_Etaria e remove linhas incompletas (base ou chunk)."""
+    calcular_features(df, DATA_REFERENCIA, {'Faixa_Etaria': FAIXA_ETARIA_DETALHADA})
+
+    # Remover valores nulos
+    return df[COLUNAS_ANALISE].dropna()
+
 
-df = pd.read_csv('Base_clientes.csv')
+def carregar_dados(caminho=ARQUIVO_CLIENTES):
+    # Base colunar tipada: lê apenas as colunas usadas nesta análise
+    df = carregar_clientes(caminho, colunas=COLUNAS_BASE)
+    return preparar_analise(df)
 
-# Converter datas e calcular idade
-df['Data_Nascimento'] = pd.to_datetime(df['Data_Nascimento'], format='%d/%m/%Y', errors='coerce')
-data_referencia = datetime(2025, 10, 3)
-df['Idade'] = ((data_referencia - df['Data_Nascimento']).dt.days / 365.25).round(0)
 
-# Criar faixas etárias detalhadas
-df['Faixa_Etaria'] = pd.cut(df['Idade'], 
-                             bins=[0, 25, 30, 35, 40, 45, 50, 55, 60, 65, 100],
-                             labels=['18-25', '26-30', '31-35', '36-40', '41-45', 
-                                    '46-50', '51-55', '56-60', '61-65', '65+'])
+def analise_de_features(df_features):
+    """
+    Mesmo resultado de carregar_dados a partir das features já calculadas
+    por analise_segmentacao.py (mesma carga e mesma Idade): só as faixas
+    etárias detalhadas são refeitas.
+    """
+    # A seleção de colunas já não altera as features; a faixa entra só nela
+    df = df_features[[c for c in COLUNAS_ANALISE if c != 'Faixa_Etaria']]
+    calcular_features(df, DATA_REFERENCIA, {'Faixa_Etaria': FAIXA_ETARIA_DETALHADA})
+    return df[COLUNAS_ANALISE].dropna()
 
-# Remover valores nulos
-df_analise = df[['Cliente_ID', 'Idade', 'Renda_Anual', 'Faixa_Etaria', 'Estado', 'Cidade', 'Numero_Cartoes']].dropna()
 
-print(f"✓ {len(df_analise):,} clientes com dados completos\n")
+def ler_chunks(caminho, tamanho_chunk):
+    for chunk in pd.read_csv(caminho, usecols=COLUNAS_BASE, chunksize=tamanho_chunk):
+        yield preparar_analise(chunk)
+
 
 # ============================================================================
 # 1. ANÁLISE DE CORRELAÇÃO
 # ============================================================================
-print("="*80)
-print("🔍 CORRELAÇÃO ENTRE RENDA E IDADE")
-print("="*80)
-
-correlacao = df_analise['Renda_Anual'].corr(df_analise['Idade'])
-print(f"\n📊 Coeficiente de Correlação de Pearson: {correlacao:.4f}")
-
-if abs(correlacao) < 0.1:
-    interpretacao = "MUITO FRACA - Praticamente sem relação linear"
-elif abs(correlacao) < 0.3:
-    interpretacao = "FRACA - Pouca relação linear"
-elif abs(correlacao) < 0.5:
-    interpretacao = "MODERADA - Relação linear moderada"
-elif abs(correlacao) < 0.7:
-    interpretacao = "FORTE - Forte relação linear"
-else:
-    interpretacao = "MUITO FORTE - Relação linear muito forte"
-
-print(f"Interpretação: {interpretacao}")
-
-if correlacao > 0:
-    print("\n💡 Tendência: Quanto MAIOR a idade, MAIOR tende a ser a renda")
-elif correlacao < 0:
-    print("\n💡 Tendência: Quanto MAIOR a idade, MENOR tende a ser a renda")
-else:
-    print("\n💡 Não há relação linear entre idade e renda")
+def interpretar_correlacao(correlacao):
+    if abs(correlacao) < 0.1:
+        return "MUITO FRACA - Praticamente sem relação linear"
+    elif abs(correlacao) < 0.3:
+        return "FRACA - Pouca relação linear"
+    elif abs(correlacao) < 0.5:
+        return "MODERADA - Relação linear moderada"
+    elif abs(correlacao) < 0.7:
+        return "FORTE - Forte relação linear"
+    return "MUITO FORTE - Relação linear muito forte"
+
+
+def calcular_correlacao(df_analise, tamanho_bloco=None):
+    comomentos = MatrizComomentos(['Renda_Anual', 'Idade'])
+    comomentos.atualizar(df_analise, tamanho_bloco)
+    return comomentos.pearson().iloc[0, 1]
+
+
+def relatorio_correlacao(correlacao):
+    print("="*80)
+    print("🔍 CORRELAÇÃO ENTRE RENDA E IDADE")
+    print("="*80)
+
+    print(f"\n📊 Coeficiente de Correlação de Pearson: {correlacao:.4f}")
+    print(f"Interpretação: {interpretar_correlacao(correlacao)}")
+
+    if correlacao > 0:
+        print("\n💡 Tendência: Quanto MAIOR a idade, MAIOR tende a ser a renda")
+    elif correlacao < 0:
+        print("\n💡 Tendência: Quanto MAIOR a idade, MENOR tende a ser a renda")
+    else:
+        print("\n💡 Não há relação linear entre idade e renda")
+
 
 # ============================================================================
 # 2. RENDA MÉDIA POR FAIXA ETÁRIA
 # ============================================================================
-print("\n" + "="*80)
-print("💰 RENDA MÉDIA POR FAIXA ETÁRIA")
-print("="*80)
+def calcular_cubo(df_analise):
+    """Cubo de agregados da análise: as tabelas por faixa, idade e estado saem dele."""
+    return CuboAgregado.construir(df_analise, DIMENSOES_CUBO, MEDIDAS_CUBO)
+
+
+def calcular_quantis(df_analise, erro=ERRO_QUANTIS, tamanho_bloco=None):
+    """
+    Resumos de quantis da renda, geral e por faixa etária; com
+    `tamanho_bloco`, atualizados bloco a bloco, como os chunks do streaming.
+    """
+    quantis = {'renda': ResumoQuantis(erro), 'renda_faixa': QuantisGrupo(erro)}
+    tamanho_bloco = tamanho_bloco or max(len(df_analise), 1)
+    for inicio in range(0, len(df_analise), tamanho_bloco):
+        atualizar_quantis(quantis, df_analise.iloc[inicio:inicio + tamanho_bloco])
+    return quantis
+
+
+def atualizar_quantis(quantis, df):
+    quantis['renda'].atualizar(df['Renda_Anual'].to_numpy('float64'))
+    quantis['renda_faixa'].atualizar(df['Faixa_Etaria'].astype(str), df['Renda_Anual'])
 
-renda_por_faixa = df_analise.groupby('Faixa_Etaria').agg({
-    'Renda_Anual': ['mean', 'median', 'std', 'count']
-}).round(2)
 
-renda_por_faixa.columns = ['Renda_Média', 'Renda_Mediana', 'Desvio_Padrão', 'Num_Clientes']
-renda_por_faixa = renda_por_faixa.sort_values('Renda_Média', ascending=False)
+def calcular_renda_por_faixa(cubo, quantis):
+    por_faixa = cubo.agregar(['Faixa_Etaria'])
+    mediana = quantis['renda_faixa'].quantil(0.5)
+    renda_por_faixa = pd.DataFrame({
+        'Renda_Média': por_faixa.media('Renda_Anual'),
+        'Renda_Mediana': mediana.reindex(por_faixa.linhas.index.astype(str)).to_numpy(),
+        'Desvio_Padrão': por_faixa.desvio('Renda_Anual'),
+        'Num_Clientes': por_faixa.contagem('Renda_Anual'),
+    }).round(2)
+    return renda_por_faixa.sort_values('Renda_Média', ascending=False)
 
-print("\n📊 Ranking das Faixas Etárias por Renda Média:")
-print(renda_por_faixa.to_string())
 
-# Identificar faixa com maior renda
-faixa_mais_rica = renda_por_faixa.index[0]
-renda_mais_alta = renda_por_faixa.iloc[0]['Renda_Média']
+def relatorio_renda_por_faixa(renda_por_faixa):
+    print("\n" + "="*80)
+    print("💰 RENDA MÉDIA POR FAIXA ETÁRIA")
+    print("="*80)
 
-print(f"\n🏆 FAIXA ETÁRIA MAIS RICA: {faixa_mais_rica} anos")
-print(f"   💵 Renda Média: R$ {renda_mais_alta:,.2f}")
-print(f"   👥 Número de Clientes: {int(renda_por_faixa.iloc[0]['Num_Clientes'])}")
+    print("\n📊 Ranking das Faixas Etárias por Renda Média:")
+    print(renda_por_faixa.to_string())
 
-# Faixa com menor renda
-faixa_mais_pobre = renda_por_faixa.index[-1]
-renda_mais_baixa = renda_por_faixa.iloc[-1]['Renda_Média']
+    # Identificar faixa com maior renda
+    faixa_mais_rica = renda_por_faixa.index[0]
+    renda_mais_alta = renda_por_faixa.iloc[0]['Renda_Média']
 
-print(f"\n📉 FAIXA ETÁRIA COM MENOR RENDA: {faixa_mais_pobre} anos")
-print(f"   💵 Renda Média: R$ {renda_mais_baixa:,.2f}")
-print(f"   👥 Número de Clientes: {int(renda_por_faixa.iloc[-1]['Num_Clientes'])}")
+    print(f"\n🏆 FAIXA ETÁRIA MAIS RICA: {faixa_mais_rica} anos")
+    print(f"   💵 Renda Média: R$ {renda_mais_alta:,.2f}")
+    print(f"   👥 Número de Clientes: {int(renda_por_faixa.iloc[0]['Num_Clientes'])}")
+
+    # Faixa com menor renda
+    faixa_mais_pobre = renda_por_faixa.index[-1]
+    renda_mais_baixa = renda_por_faixa.iloc[-1]['Renda_Média']
+
+    print(f"\n📉 FAIXA ETÁRIA COM MENOR RENDA: {faixa_mais_pobre} anos")
+    print(f"   💵 Renda Média: R$ {renda_mais_baixa:,.2f}")
+    print(f"   👥 Número de Clientes: {int(renda_por_faixa.iloc[-1]['Num_Clientes'])}")
+
+    diferenca_percentual = ((renda_mais_alta - renda_mais_baixa) / renda_mais_baixa * 100)
+    print(f"\n📈 Diferença: A faixa mais rica ganha {diferenca_percentual:.1f}% a mais que a mais pobre")
 
-diferenca_percentual = ((renda_mais_alta - renda_mais_baixa) / renda_mais_baixa * 100)
-print(f"\n📈 Diferença: A faixa mais rica ganha {diferenca_percentual:.1f}% a mais que a mais pobre")
 
 # ============================================================================
 # 3. DISTRIBUIÇÃO DE RENDA POR IDADE EXATA
 # ============================================================================
-print("\n" + "="*80)
-print("🎯 TOP 10 IDADES COM MAIOR RENDA MÉDIA")
-print("="*80)
+def calcular_renda_por_idade(cubo):
+    por_idade = cubo.agregar(['Idade'])
+    renda_por_idade = pd.DataFrame({
+        'Renda_Média': por_idade.media('Renda_Anual'),
+        'Num_Clientes': por_idade.contagem('Renda_Anual'),
+    }).round(2)
+    return filtrar_renda_por_idade(renda_por_idade)
+
 
-renda_por_idade = df_analise.groupby('Idade').agg({
-    'Renda_Anual': ['mean', 'count']
-}).round(2)
-renda_por_idade.columns = ['Renda_Média', 'Num_Clientes']
-renda_por_idade = renda_por_idade[renda_por_idade['Num_Clientes'] >= 5]  # Pelo menos 5 clientes
-renda_por_idade = renda_por_idade.sort_values('Renda_Média', ascending=False)
+def filtrar_renda_por_idade(renda_por_idade):
+    renda_por_idade = renda_por_idade[renda_por_idade['Num_Clientes'] >= 5]  # Pelo menos 5 clientes
+    return renda_por_idade.sort_values('Renda_Média', ascending=False)
+
+
+def relatorio_renda_por_idade(renda_por_idade):
+    print("\n" + "="*80)
+    print("🎯 TOP 10 IDADES COM MAIOR RENDA MÉDIA")
+    print("="*80)
+
+    print("\n📊 Top 10 Idades Específicas com Maior Renda:")
+    for idx, (idade, row) in enumerate(renda_por_idade.head(10).iterrows(), 1):
+        print(f"{idx:2d}. {int(idade)} anos → R$ {row['Renda_Média']:>12,.2f} ({int(row['Num_Clientes'])} clientes)")
 
-print("\n📊 Top 10 Idades Específicas com Maior Renda:")
-for idx, (idade, row) in enumerate(renda_por_idade.head(10).iterrows(), 1):
-    print(f"{idx:2d}. {int(idade)} anos → R$ {row['Renda_Média']:>12,.2f} ({int(row['Num_Clientes'])} clientes)")
 
 # ============================================================================
 # 4. CLIENTES DE ALTA RENDA (TOP 10%)
 # ============================================================================
-print("\n" + "="*80)
-print("💎 PERFIL DOS CLIENTES DE ALTA RENDA (TOP 10%)")
-print("="*80)
-
-percentil_90 = df_analise['Renda_Anual'].quantile(0.90)
-clientes_ricos = df_analise[df_analise['Renda_Anual'] >= percentil_90]
-
-print(f"\n💰 Renda mínima para TOP 10%: R$ {percentil_90:,.2f}")
-print(f"👥 Quantidade de clientes: {len(clientes_ricos)}")
-print(f"\n📊 Perfil dos Clientes de Alta Renda:")
-print(f"   • Idade Média: {clientes_ricos['Idade'].mean():.1f} anos")
-print(f"   • Idade Mediana: {clientes_ricos['Idade'].median():.0f} anos")
-print(f"   • Renda Média: R$ {clientes_ricos['Renda_Anual'].mean():,.2f}")
-print(f"   • Cartões Médio: {clientes_ricos['Numero_Cartoes'].mean():.1f}")
-
-print(f"\n🎂 Distribuição Etária dos Ricos (TOP 10%):")
-dist_ricos = clientes_ricos['Faixa_Etaria'].value_counts().sort_index()
-for faixa, count in dist_ricos.items():
-    pct = (count / len(clientes_ricos)) * 100
-    print(f"   • {faixa} anos: {count} clientes ({pct:.1f}%)")
+def calcular_alta_renda(df_analise, quantis):
+    # Seleção parcial das posições do TOP 10% (empates no corte incluídos),
+    # na ordem da base; as colunas são lidas só nessas posições
+    percentil_90 = quantis['renda'].quantil(0.90)
+    renda = df_analise['Renda_Anual'].to_numpy('float64')
+    posicoes = np.sort(posicoes_topo(renda, quantidade_fracao(len(renda), 0.10), empates=True))
+    idade = df_analise['Idade'].to_numpy('float64')[posicoes]
+    idade_ricos = ResumoQuantis(quantis['renda'].erro)
+    idade_ricos.atualizar(idade)
+    return {
+        'percentil_90': percentil_90,
+        'clientes': None,
+        'posicoes': posicoes,
+        'quantidade': len(posicoes),
+        'idade_media': idade.mean(),
+        'idade_mediana': idade_ricos.quantil(0.5),
+        'renda_media': renda[posicoes].mean(),
+        'cartoes_medio': df_analise['Numero_Cartoes'].to_numpy('float64')[posicoes].mean(),
+        'dist_faixa': df_analise['Faixa_Etaria'].take(posicoes).value_counts().sort_index(),
+    }
+
+
+def relatorio_alta_renda(alta_renda):
+    print("\n" + "="*80)
+    print("💎 PERFIL DOS CLIENTES DE ALTA RENDA (TOP 10%)")
+    print("="*80)
+
+    print(f"\n💰 Renda mínima para TOP 10%: R$ {alta_renda['percentil_90']:,.2f}")
+    print(f"👥 Quantidade de clientes: {alta_renda['quantidade']}")
+    print(f"\n📊 Perfil dos Clientes de Alta Renda:")
+    print(f"   • Idade Média: {alta_renda['idade_media']:.1f} anos")
+    print(f"   • Idade Mediana: {alta_renda['idade_mediana']:.0f} anos")
+    print(f"   • Renda Média: R$ {alta_renda['renda_media']:,.2f}")
+    print(f"   • Cartões Médio: {alta_renda['cartoes_medio']:.1f}")
+
+    print(f"\n🎂 Distribuição Etária dos Ricos (TOP 10%):")
+    for faixa, count in alta_renda['dist_faixa'].items():
+        pct = (count / alta_renda['quantidade']) * 100
+        print(f"   • {faixa} anos: {count} clientes ({pct:.1f}%)")
+
 
 # ============================================================================
 # 5. ANÁLISE POR ESTADO
 # ============================================================================
-print("\n" + "="*80)
-print("🗺️ RENDA x IDADE POR ESTADO")
-print("="*80)
-
-print("\n📊 Renda Média e Idade Média por Estado:")
-por_estado = df_analise.groupby('Estado').agg({
-    'Renda_Anual': 'mean',
-    'Idade': 'mean',
-    'Cliente_ID': 'count'
-}).round(2)
-por_estado.columns = ['Renda_Média', 'Idade_Média', 'Num_Clientes']
-por_estado = por_estado.sort_values('Renda_Média', ascending=False)
-
-for estado, row in por_estado.iterrows():
-    print(f"\n{estado}:")
-    print(f"   💵 Renda Média: R$ {row['Renda_Média']:,.2f}")
-    print(f"   🎂 Idade Média: {row['Idade_Média']:.1f} anos")
-    print(f"   👥 Clientes: {int(row['Num_Clientes'])}")
+def calcular_por_estado(cubo):
+    por_estado = cubo.agregar(['Estado'])
+    tabela = pd.DataFrame({
+        'Renda_Média': por_estado.media('Renda_Anual'),
+        'Idade_Média': por_estado.media('Idade'),
+        'Num_Clientes': por_estado.contagem(),
+    }).round(2)
+    return tabela.sort_values('Renda_Média', ascending=False)
+
+
+def relatorio_por_estado(por_estado):
+    print("\n" + "="*80)
+    print("🗺️ RENDA x IDADE POR ESTADO")
+    print("="*80)
+
+    print("\n📊 Renda Média e Idade Média por Estado:")
+    for estado, row in por_estado.iterrows():
+        print(f"\n{estado}:")
+        print(f"   💵 Renda Média: R$ {row['Renda_Média']:,.2f}")
+        print(f"   🎂 Idade Média: {row['Idade_Média']:.1f} anos")
+        print(f"   👥 Clientes: {int(row['Num_Clientes'])}")
+
 
 # ============================================================================
 # 6. VISUALIZAÇÕES INTERATIVAS
 # ============================================================================
-print("\n" + "="*80)
-print("📊 GERANDO VISUALIZAÇÕES INTERATIVAS")
-print("="*80)
-
-# 1. Scatter plot Renda x Idade
-fig1 = px.scatter(
-    df_analise,
-    x='Idade',
-    y='Renda_Anual',
-    color='Estado',
-    size='Numero_Cartoes',
-    hover_data=['Cidade'],
-    title='💰 Correlação: Renda x Idade (tamanho = número de cartões)',
-    labels={'Idade': 'Idade (anos)', 'Renda_Anual': 'Renda Anual (R$)'},
-    height=600
-)
-fig1.write_html('correlacao_renda_idade_scatter.html')
-print("\n✓ Gráfico salvo: correlacao_renda_idade_scatter.html")
-
-# 2. Box plot Renda por Faixa Etária
-fig2 = go.Figure()
-for faixa in sorted(df_analise['Faixa_Etaria'].dropna().unique()):
-    dados_faixa = df_analise[df_analise['Faixa_Etaria'] == faixa]['Renda_Anual']
-    fig2.add_trace(go.Box(
-        y=dados_faixa,
-        name=str(faixa),
-        boxmean='sd'
+def gerar_graficos(df_analise, alta_renda, cubo, quantis, modo_graficos='auto'):
+    print("\n" + "="*80)
+    print("📊 GERANDO VISUALIZAÇÕES INTERATIVAS")
+    print("="*80)
+
+    # As tabelas saem daqui; montar e gravar cada figura fica com o pool do relatório
+    # 1. Scatter plot Renda x Idade (agregado acima de LIMITE_PONTOS clientes)
+    modo = escolher_modo(len(df_analise), modo_graficos)
+    clientes = df_analise[['Idade', 'Renda_Anual', 'Estado', 'Cidade', 'Numero_Cartoes']]
+    destino = agendar_figura('correlacao_renda_idade_scatter.html', figura_dispersao, clientes, modo)
+    print(f"\n✓ Gráfico salvo: {destino}")
+    if modo != 'exato':
+        print(f"   (modo {modo}: {len(df_analise):,} clientes, limite do modo exato: {LIMITE_PONTOS:,} pontos)")
+
+    # 2. Box plot Renda por Faixa Etária (quartis dos resumos, média e desvio do cubo)
+    por_faixa = cubo.agregar(['Faixa_Etaria'])
+    box_renda = quantis['renda_faixa'].resumo_box()
+    box_renda['media'] = por_faixa.media('Renda_Anual').set_axis(por_faixa.linhas.index.astype(str))
+    box_renda['desvio'] = por_faixa.desvio('Renda_Anual').set_axis(por_faixa.linhas.index.astype(str))
+    destino = agendar_figura('distribuicao_renda_faixa_etaria.html', figura_box_renda, box_renda)
+    print(f"✓ Gráfico salvo: {destino}")
+
+    # 3. Gráfico de barras - Renda Média por Faixa Etária
+    renda_por_faixa_sorted = cubo.agregar(['Faixa_Etaria']).media('Renda_Anual').sort_index()
+    destino = agendar_figura('renda_media_faixa_etaria.html', figura_renda_media, renda_por_faixa_sorted)
+    print(f"✓ Gráfico salvo: {destino}")
+
+    # 4. Heatmap Renda Média por Estado e Faixa Etária
+    pivot_renda = (cubo.agregar(['Estado', 'Faixa_Etaria']).media('Renda_Anual')
+                   .unstack('Faixa_Etaria').dropna(axis=1, how='all').round(0))
+    destino = agendar_figura('heatmap_renda_estado_idade.html', figura_heatmap, pivot_renda)
+    print(f"✓ Gráfico salvo: {destino}")
+
+    # 5. Histograma 2D - Densidade de Renda x Idade
+    destino = agendar_figura('densidade_renda_idade.html', figura_densidade,
+                             df_analise['Idade'], df_analise['Renda_Anual'])
+    print(f"✓ Gráfico salvo: {destino}")
+
+    # 6. Comparação: TOP 10% vs Resto
+    ricos = np.zeros(len(df_analise), dtype=bool)
+    ricos[alta_renda['posicoes']] = True
+    idade = df_analise['Idade']
+    destino = agendar_figura('comparacao_idade_ricos_vs_outros.html', figura_ricos_vs_demais,
+                             idade[ricos], idade[~ricos])
+    print(f"✓ Gráfico salvo: {destino}")
+
+
+def figura_dispersao(clientes, modo):
+    fig, _ = dispersao(
+        clientes,
+        ['Idade', 'Renda_Anual'],
+        'Estado',
+        modo=modo,
+        medidas=['Numero_Cartoes'],
+        size='Numero_Cartoes',
+        hover_data=['Cidade'],
+        title='💰 Correlação: Renda x Idade (tamanho = número de cartões)',
+        labels={'Idade': 'Idade (anos)', 'Renda_Anual': 'Renda Anual (R$)'},
+        height=600
+    )
+    return fig
+
+
+def figura_box_renda(box_renda):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for faixa, resumo in box_renda.iterrows():
+        fig.add_trace(caixa(resumo, str(faixa), media=resumo['media'], desvio=resumo['desvio']))
+
+    fig.update_layout(
+        title='📊 Distribuição de Renda por Faixa Etária (Box Plot)',
+        yaxis_title='Renda Anual (R$)',
+        xaxis_title='Faixa Etária',
+        height=600
+    )
+    return fig
+
+
+def figura_renda_media(renda_por_faixa_sorted):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=renda_por_faixa_sorted.index.astype(str),
+        y=renda_por_faixa_sorted.values,
+        marker_color='rgb(55, 128, 191)',
+        text=[f'R$ {val:,.0f}' for val in renda_por_faixa_sorted.values],
+        textposition='outside'
     ))
 
-fig2.update_layout(
-    title='📊 Distribuição de Renda por Faixa Etária (Box Plot)',
-    yaxis_title='Renda Anual (R$)',
-    xaxis_title='Faixa Etária',
-    height=600
-)
-fig2.write_html('distribuicao_renda_faixa_etaria.html')
-print("✓ Gráfico salvo: distribuicao_renda_faixa_etaria.html")
-
-# 3. Gráfico de barras - Renda Média por Faixa Etária
-fig3 = go.Figure()
-
-renda_por_faixa_sorted = df_analise.groupby('Faixa_Etaria')['Renda_Anual'].mean().sort_index()
-
-fig3.add_trace(go.Bar(
-    x=renda_por_faixa_sorted.index.astype(str),
-    y=renda_por_faixa_sorted.values,
-    marker_color='rgb(55, 128, 191)',
-    text=[f'R$ {val:,.0f}' for val in renda_por_faixa_sorted.values],
-    textposition='outside'
-))
-
-fig3.update_layout(
-    title='💵 Renda Média por Faixa Etária',
-    xaxis_title='Faixa Etária',
-    yaxis_title='Renda Média Anual (R$)',
-    height=600
-)
-fig3.write_html('renda_media_faixa_etaria.html')
-print("✓ Gráfico salvo: renda_media_faixa_etaria.html")
-
-# 4. Heatmap Renda Média por Estado e Faixa Etária
-pivot_renda = df_analise.pivot_table(
-    values='Renda_Anual',
-    index='Estado',
-    columns='Faixa_Etaria',
-    aggfunc='mean'
-).round(0)
-
-fig4 = go.Figure(data=go.Heatmap(
-    z=pivot_renda.values,
-    x=pivot_renda.columns.astype(str),
-    y=pivot_renda.index,
-    colorscale='RdYlGn',
-    text=pivot_renda.values.astype(int),
-    texttemplate='R$%{text}',
-    textfont={"size": 10},
-    colorbar=dict(title="Renda Média<br>(R$)")
-))
-
-fig4.update_layout(
-    title='🔥 Heatmap: Renda Média por Estado e Faixa Etária',
-    xaxis_title='Faixa Etária',
-    yaxis_title='Estado',
-    height=500
-)
-fig4.write_html('heatmap_renda_estado_idade.html')
-print("✓ Gráfico salvo: heatmap_renda_estado_idade.html")
-
-# 5. Histograma 2D - Densidade de Renda x Idade
-fig5 = go.Figure(go.Histogram2d(
-    x=df_analise['Idade'],
-    y=df_analise['Renda_Anual'],
-    colorscale='Viridis',
-    nbinsx=30,
-    nbinsy=30
-))
-
-fig5.update_layout(
-    title='🎨 Densidade: Concentração de Clientes por Renda e Idade',
-    xaxis_title='Idade (anos)',
-    yaxis_title='Renda Anual (R$)',
-    height=600
-)
-fig5.write_html('densidade_renda_idade.html')
-print("✓ Gráfico salvo: densidade_renda_idade.html")
-
-# 6. Comparação: TOP 10% vs Resto
-fig6 = make_subplots(
-    rows=1, cols=2,
-    subplot_titles=('Distribuição de Idade - TOP 10%', 'Distribuição de Idade - Demais 90%'),
-    specs=[[{'type': 'histogram'}, {'type': 'histogram'}]]
-)
-
-outros_clientes = df_analise[df_analise['Renda_Anual'] < percentil_90]
-
-fig6.add_trace(
-    go.Histogram(x=clientes_ricos['Idade'], name='TOP 10%', marker_color='gold', nbinsx=20),
-    row=1, col=1
-)
-
-fig6.add_trace(
-    go.Histogram(x=outros_clientes['Idade'], name='Demais 90%', marker_color='lightblue', nbinsx=20),
-    row=1, col=2
-)
-
-fig6.update_layout(
-    title_text='👑 Comparação de Distribuição Etária: Ricos vs Demais',
-    height=500,
-    showlegend=False
-)
-fig6.write_html('comparacao_idade_ricos_vs_outros.html')
-print("✓ Gráfico salvo: comparacao_idade_ricos_vs_outros.html")
+    fig.update_layout(
+        title='💵 Renda Média por Faixa Etária',
+        xaxis_title='Faixa Etária',
+        yaxis_title='Renda Média Anual (R$)',
+        height=600
+    )
+    return fig
+
+
+def figura_heatmap(pivot_renda):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(data=go.Heatmap(
+        z=pivot_renda.values,
+        x=pivot_renda.columns.astype(str),
+        y=pivot_renda.index,
+        colorscale='RdYlGn',
+        text=pivot_renda.values.astype(int),
+        texttemplate='R$%{text}',
+        textfont={"size": 10},
+        colorbar=dict(title="Renda Média<br>(R$)")
+    ))
+
+    fig.update_layout(
+        title='🔥 Heatmap: Renda Média por Estado e Faixa Etária',
+        xaxis_title='Faixa Etária',
+        yaxis_title='Estado',
+        height=500
+    )
+    return fig
+
+
+def figura_densidade(idade, renda):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Histogram2d(
+        x=idade,
+        y=renda,
+        colorscale='Viridis',
+        nbinsx=30,
+        nbinsy=30
+    ))
+
+    fig.update_layout(
+        title='🎨 Densidade: Concentração de Clientes por Renda e Idade',
+        xaxis_title='Idade (anos)',
+        yaxis_title='Renda Anual (R$)',
+        height=600
+    )
+    return fig
+
+
+def figura_ricos_vs_demais(idade_ricos, idade_outros):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(
+        rows=1, cols=2,
+        subplot_titles=('Distribuição de Idade - TOP 10%', 'Distribuição de Idade - Demais 90%'),
+        specs=[[{'type': 'histogram'}, {'type': 'histogram'}]]
+    )
+
+    fig.add_trace(
+        go.Histogram(x=idade_ricos, name='TOP 10%', marker_color='gold', nbinsx=20),
+        row=1, col=1
+    )
+
+    fig.add_trace(
+        go.Histogram(x=idade_outros, name='Demais 90%', marker_color='lightblue', nbinsx=20),
+        row=1, col=2
+    )
+
+    fig.update_layout(
+        title_text='👑 Comparação de Distribuição Etária: Ricos vs Demais',
+        height=500,
+        showlegend=False
+    )
+    return fig
+
 
 # ============================================================================
 # 7. INSIGHTS ESTRATÉGICOS
 # ============================================================================
-print("\n" + "="*80)
-print("💡 INSIGHTS ESTRATÉGICOS - QUEM TEM MAIS DINHEIRO?")
-print("="*80)
-
-print("\n🎯 CONCLUSÕES PRINCIPAIS:\n")
-
-print(f"1. PERFIL DE ALTA RENDA:")
-print(f"   • Faixa etária predominante: {faixa_mais_rica} anos")
-print(f"   • Renda média nesta faixa: R$ {renda_mais_alta:,.2f}")
-print(f"   • Idade média dos 10% mais ricos: {clientes_ricos['Idade'].mean():.1f} anos")
-
-print(f"\n2. CORRELAÇÃO IDADE-RENDA:")
-if abs(correlacao) < 0.1:
-    print(f"   • A idade NÃO é um bom preditor de renda (correlação: {correlacao:.4f})")
-    print(f"   • Clientes de todas as idades podem ter alta renda")
-else:
-    print(f"   • Correlação: {correlacao:.4f} ({interpretacao})")
-
-print(f"\n3. DISTRIBUIÇÃO GEOGRÁFICA:")
-estado_mais_rico = por_estado.index[0]
-print(f"   • Estado com maior renda média: {estado_mais_rico}")
-print(f"   • Renda média em {estado_mais_rico}: R$ {por_estado.loc[estado_mais_rico, 'Renda_Média']:,.2f}")
-
-print(f"\n4. OPORTUNIDADES DE NEGÓCIO:")
-print(f"   • Focar produtos premium nas faixas: {', '.join([str(f) for f in renda_por_faixa.head(3).index])}")
-print(f"   • {len(clientes_ricos)} clientes (TOP 10%) representam potencial de alta margem")
-print(f"   • Estados prioritários: {', '.join(por_estado.head(3).index)}")
+def insights_estrategicos(correlacao, renda_por_faixa, alta_renda, por_estado):
+    print("\n" + "="*80)
+    print("💡 INSIGHTS ESTRATÉGICOS - QUEM TEM MAIS DINHEIRO?")
+    print("="*80)
+
+    print("\n🎯 CONCLUSÕES PRINCIPAIS:\n")
+
+    print(f"1. PERFIL DE ALTA RENDA:")
+    print(f"   • Faixa etária predominante: {renda_por_faixa.index[0]} anos")
+    print(f"   • Renda média nesta faixa: R$ {renda_por_faixa.iloc[0]['Renda_Média']:,.2f}")
+    print(f"   • Idade média dos 10% mais ricos: {alta_renda['idade_media']:.1f} anos")
+
+    print(f"\n2. CORRELAÇÃO IDADE-RENDA:")
+    if abs(correlacao) < 0.1:
+        print(f"   • A idade NÃO é um bom preditor de renda (correlação: {correlacao:.4f})")
+        print(f"   • Clientes de todas as idades podem ter alta renda")
+    else:
+        print(f"   • Correlação: {correlacao:.4f} ({interpretar_correlacao(correlacao)})")
+
+    print(f"\n3. DISTRIBUIÇÃO GEOGRÁFICA:")
+    estado_mais_rico = por_estado.index[0]
+    print(f"   • Estado com maior renda média: {estado_mais_rico}")
+    print(f"   • Renda média em {estado_mais_rico}: R$ {por_estado.loc[estado_mais_rico, 'Renda_Média']:,.2f}")
+
+    print(f"\n4. OPORTUNIDADES DE NEGÓCIO:")
+    print(f"   • Focar produtos premium nas faixas: {', '.join([str(f) for f in renda_por_faixa.head(3).index])}")
+    print(f"   • {alta_renda['quantidade']} clientes (TOP 10%) representam potencial de alta margem")
+    print(f"   • Estados prioritários: {', '.join(por_estado.head(3).index)}")
+
 
 # ============================================================================
 # 8. EXPORTAR DADOS
 # ============================================================================
-print("\n" + "="*80)
-print("💾 EXPORTANDO DADOS")
-print("="*80)
-
-# Salvar análise por faixa etária
-renda_por_faixa.to_csv('analise_renda_por_faixa_etaria.csv', encoding='utf-8-sig')
-print("\n✓ Arquivo salvo: analise_renda_por_faixa_etaria.csv")
-
-# Salvar clientes de alta renda
-clientes_ricos_export = df_analise[df_analise['Renda_Anual'] >= percentil_90].copy()
-clientes_ricos_export.to_csv('clientes_alta_renda_top10.csv', index=False, encoding='utf-8-sig')
-print("✓ Arquivo salvo: clientes_alta_renda_top10.csv")
-
-# Salvar análise por estado
-por_estado.to_csv('renda_idade_por_estado.csv', encoding='utf-8-sig')
-print("✓ Arquivo salvo: renda_idade_por_estado.csv")
-
-print("\n" + "="*80)
-print("✅ ANÁLISE COMPLETA!")
-print("="*80)
-
-print("\n📂 Arquivos HTML gerados (abra no navegador):")
-print("   • correlacao_renda_idade_scatter.html")
-print("   • distribuicao_renda_faixa_etaria.html")
-print("   • renda_media_faixa_etaria.html")
-print("   • heatmap_renda_estado_idade.html")
-print("   • densidade_renda_idade.html")
-print("   • comparacao_idade_ricos_vs_outros.html")
-
-print("\n📊 Arquivos CSV gerados:")
-print("   • analise_renda_por_faixa_etaria.csv")
-print("   • clientes_alta_renda_top10.csv")
-print("   • renda_idade_por_estado.csv")
-
-print("\n" + "="*80)
+def arquivo_topo(topo_por, topo_n):
+    return f"clientes_alta_renda_top{topo_n}_por_{topo_por.lower()}.csv"
+
+
+def exportar_dados(renda_por_faixa, alta_renda, por_estado, df_analise=None):
+    print("\n" + "="*80)
+    print("💾 EXPORTANDO DADOS")
+    print("="*80)
+
+    # Salvar análise por faixa etária
+    renda_por_faixa.to_csv('analise_renda_por_faixa_etaria.csv', encoding='utf-8-sig')
+    print("\n✓ Arquivo salvo: analise_renda_por_faixa_etaria.csv")
+
+    # Salvar clientes de alta renda: em memória, direto das posições selecionadas;
+    # no modo streaming, já gravado durante a leitura
+    if alta_renda.get('posicoes') is not None:
+        exportar_posicoes(df_analise, alta_renda['posicoes'], 'clientes_alta_renda_top10.csv')
+    print("✓ Arquivo salvo: clientes_alta_renda_top10.csv")
+
+    # Salvar análise por estado
+    por_estado.to_csv('renda_idade_por_estado.csv', encoding='utf-8-sig')
+    print("✓ Arquivo salvo: renda_idade_por_estado.csv")
+
+
+# ============================================================================
+# MODO STREAMING
+# ============================================================================
+def calcular_streaming(caminho, tamanho_chunk=TAMANHO_CHUNK, erro_quantis=ERRO_QUANTIS,
+                       topo_por=None, topo_n=TOPO_N):
+    """
+    Duas passadas por chunks sobre o CSV. A primeira acumula co-momentos,
+    estatísticas por grupo, resumos de quantis da renda e, com `topo_por`,
+    os `topo_n` clientes de maior renda de cada grupo; a segunda, já com o
+    percentil 90 conhecido, grava os clientes do TOP 10% e resume seu perfil.
+    """
+    topo = TopoStreaming('Renda_Anual', topo_n, topo_por) if topo_por else None
+    comomentos = MatrizComomentos(['Renda_Anual', 'Idade'])
+    renda_faixa = EstatisticasGrupo()
+    renda_idade = EstatisticasGrupo()
+    renda_estado = EstatisticasGrupo()
+    idade_estado = EstatisticasGrupo()
+    quantis = {'renda': ResumoQuantis(erro_quantis), 'renda_faixa': QuantisGrupo(erro_quantis)}
+    total = 0
+
+    for chunk in ler_chunks(caminho, tamanho_chunk):
+        total += len(chunk)
+        faixa = chunk['Faixa_Etaria'].astype(str)
+        comomentos.atualizar(chunk)
+        renda_faixa.atualizar(faixa, chunk['Renda_Anual'])
+        renda_idade.atualizar(chunk['Idade'], chunk['Renda_Anual'])
+        renda_estado.atualizar(chunk['Estado'], chunk['Renda_Anual'])
+        idade_estado.atualizar(chunk['Estado'], chunk['Idade'])
+        atualizar_quantis(quantis, chunk)
+        if topo is not None:
+            topo.atualizar(chunk)
+
+    # Tabelas na mesma ordem de grupos do groupby do modo em memória
+    ordem_faixas = [f for f in LABELS_FAIXA_ETARIA if f in renda_faixa.tabela.index]
+    renda_por_faixa = pd.DataFrame({
+        'Renda_Média': renda_faixa.media(),
+        'Renda_Mediana': quantis['renda_faixa'].quantil(0.5),
+        'Desvio_Padrão': renda_faixa.desvio(),
+        'Num_Clientes': renda_faixa.contagem(),
+    }).reindex(ordem_faixas).round(2)
+    renda_por_faixa.index = pd.CategoricalIndex(ordem_faixas, categories=LABELS_FAIXA_ETARIA,
+                                                ordered=True, name='Faixa_Etaria')
+    renda_por_faixa = renda_por_faixa.sort_values('Renda_Média', ascending=False)
+
+    renda_por_idade = pd.DataFrame({
+        'Renda_Média': renda_idade.media(),
+        'Num_Clientes': renda_idade.contagem(),
+    }).sort_index().round(2)
+    renda_por_idade.index.name = 'Idade'
+    renda_por_idade = filtrar_renda_por_idade(renda_por_idade)
+
+    por_estado = pd.DataFrame({
+        'Renda_Média': renda_estado.media(),
+        'Idade_Média': idade_estado.media(),
+        'Num_Clientes': renda_estado.contagem(),
+    }).sort_index().round(2)
+    por_estado.index.name = 'Estado'
+    por_estado = por_estado.sort_values('Renda_Média', ascending=False)
+
+    percentil_90 = quantis['renda'].quantil(0.90)
+    alta_renda = resumir_alta_renda_streaming(caminho, tamanho_chunk, percentil_90,
+                                              erro_quantis=erro_quantis)
+
+    return {
+        'total': total,
+        'correlacao': comomentos.pearson().iloc[0, 1],
+        'renda_por_faixa': renda_por_faixa,
+        'renda_por_idade': renda_por_idade,
+        'alta_renda': alta_renda,
+        'por_estado': por_estado,
+        'topo': topo,
+    }
+
+
+def resumir_alta_renda_streaming(caminho, tamanho_chunk, percentil_90,
+                                 arquivo_saida='clientes_alta_renda_top10.csv',
+                                 erro_quantis=ERRO_QUANTIS):
+    quantidade = 0
+    soma_idade = soma_renda = soma_cartoes = 0.0
+    idade_ricos = ResumoQuantis(erro_quantis)
+    dist_faixa = pd.Series(0, index=pd.CategoricalIndex(LABELS_FAIXA_ETARIA, ordered=True,
+                                                         name='Faixa_Etaria'), name='count')
+    primeiro = True
+
+    for chunk in ler_chunks(caminho, tamanho_chunk):
+        ricos = chunk[chunk['Renda_Anual'] >= percentil_90]
+        if ricos.empty:
+            continue
+        ricos.to_csv(arquivo_saida, mode='w' if primeiro else 'a', header=primeiro,
+                     index=False, encoding='utf-8-sig' if primeiro else 'utf-8')
+        primeiro = False
+        quantidade += len(ricos)
+        soma_idade += ricos['Idade'].sum()
+        soma_renda += ricos['Renda_Anual'].sum()
+        soma_cartoes += ricos['Numero_Cartoes'].sum()
+        idade_ricos.atualizar(ricos['Idade'].to_numpy('float64'))
+        contagem = ricos['Faixa_Etaria'].astype(str).value_counts()
+        dist_faixa += contagem.reindex(LABELS_FAIXA_ETARIA, fill_value=0).to_numpy()
+
+    if primeiro:
+        pd.DataFrame(columns=COLUNAS_ANALISE).to_csv(arquivo_saida, index=False, encoding='utf-8-sig')
+
+    return {
+        'percentil_90': percentil_90,
+        'clientes': None,
+        'quantidade': quantidade,
+        'idade_media': soma_idade / quantidade if quantidade else np.nan,
+        'idade_mediana': idade_ricos.quantil(0.5),
+        'renda_media': soma_renda / quantidade if quantidade else np.nan,
+        'cartoes_medio': soma_cartoes / quantidade if quantidade else np.nan,
+        'dist_faixa': dist_faixa,
+    }
+
+
+# ============================================================================
+# EXECUÇÃO
+# ============================================================================
+def montar_etapas(caminho=ARQUIVO_CLIENTES, cache=None, erro_quantis=ERRO_QUANTIS,
+                  features=None, prefixo='', economizar_memoria=False):
+    """
+    Etapas de cálculo da análise em memória, com suas dependências: as
+    tabelas por faixa, por idade e por estado dependem só do cubo, e o TOP
+    10% só dos quantis. Sem `cache`, nada é gravado em disco. Com `features`
+    (a etapa de mesmo nome de analise_segmentacao.montar_etapas), a base não
+    é lida de novo; `prefixo` distingue os nomes quando as duas análises
+    rodam juntas. Com `economizar_memoria`, correlação e quantis são
+    acumulados em blocos (ver orcamento_memoria.py).
+    """
+    tamanho_bloco = TAMANHO_BLOCO if economizar_memoria else None
+    cache = cache if cache is not None else CacheEtapas(ativo=False)
+    etapas = {}
+    if features is None:
+        etapas['carregar'] = Etapa(cache, prefixo + 'carregar', carregar_dados,
+                                   parametros={'caminho': caminho}, entradas=[caminho])
+    else:
+        etapas['carregar'] = Etapa(cache, prefixo + 'carregar', analise_de_features,
+                                   dependencias=[features])
+    etapas['correlacao'] = Etapa(cache, prefixo + 'correlacao', calcular_correlacao,
+                                 dependencias=[etapas['carregar']],
+                                 parametros={'tamanho_bloco': tamanho_bloco})
+    etapas['cubo'] = Etapa(cache, prefixo + 'cubo', calcular_cubo,
+                           dependencias=[etapas['carregar']])
+    etapas['quantis'] = Etapa(cache, prefixo + 'quantis', calcular_quantis,
+                              dependencias=[etapas['carregar']],
+                              parametros={'erro': erro_quantis, 'tamanho_bloco': tamanho_bloco})
+    etapas['renda_por_faixa'] = Etapa(cache, prefixo + 'renda_por_faixa', calcular_renda_por_faixa,
+                                      dependencias=[etapas['cubo'], etapas['quantis']])
+    etapas['renda_por_idade'] = Etapa(cache, prefixo + 'renda_por_idade', calcular_renda_por_idade,
+                                      dependencias=[etapas['cubo']])
+    etapas['alta_renda'] = Etapa(cache, prefixo + 'alta_renda', calcular_alta_renda,
+                                 dependencias=[etapas['carregar'], etapas['quantis']])
+    etapas['por_estado'] = Etapa(cache, prefixo + 'por_estado', calcular_por_estado,
+                                 dependencias=[etapas['cubo']])
+    return etapas
+
+
+def exportar_topo_grupo(df_analise, topo_por, topo_n):
+    posicoes = posicoes_topo_grupo(df_analise[topo_por], df_analise['Renda_Anual'], topo_n)
+    exportar_posicoes(df_analise, posicoes, arquivo_topo(topo_por, topo_n))
+    print(f"✓ Arquivo salvo: {arquivo_topo(topo_por, topo_n)}")
+
+
+def executar_em_memoria(caminho=ARQUIVO_CLIENTES, modo_graficos='auto', erro_quantis=ERRO_QUANTIS,
+                        topo_por=None, topo_n=TOPO_N, etapas=None, n_threads=None,
+                        economizar_memoria=False):
+    """
+    Executa a análise com a base em memória. As etapas de cálculo (ver
+    montar_etapas) rodam em `n_threads` threads (None: uma por núcleo; 1:
+    em sequência) enquanto os relatórios são impressos na ordem de sempre.
+    Com `economizar_memoria`, as etapas acumulam em blocos e cada uma sai da
+    memória depois do último consumo.
+    """
+    etapas = etapas or montar_etapas(caminho, erro_quantis=erro_quantis,
+                                     economizar_memoria=economizar_memoria)
+    with AgendadorEtapas(etapas.values(), n_threads, liberar=economizar_memoria):
+        _relatorios(etapas, modo_graficos, topo_por, topo_n)
+
+
+def _relatorios(etapas, modo_graficos, topo_por, topo_n):
+    print("\n📊 Carregando dados...")
+    df_analise = etapas['carregar'].resultado()
+    print(f"✓ {len(df_analise):,} clientes com dados completos\n")
+
+    correlacao = etapas['correlacao'].resultado()
+    relatorio_correlacao(correlacao)
+
+    renda_por_faixa = etapas['renda_por_faixa'].resultado()
+    relatorio_renda_por_faixa(renda_por_faixa)
+
+    relatorio_renda_por_idade(etapas['renda_por_idade'].resultado())
+
+    alta_renda = etapas['alta_renda'].resultado()
+    relatorio_alta_renda(alta_renda)
+
+    por_estado = etapas['por_estado'].resultado()
+    relatorio_por_estado(por_estado)
+
+    if relatorio_html.graficos_ativos():
+        with instrumentacao.secao('graficos', categoria='etapa'):
+            gerar_graficos(df_analise, alta_renda, etapas['cubo'].resultado(),
+                           etapas['quantis'].resultado(), modo_graficos)
+    else:
+        print("\n" + "="*80)
+        print("📊 VISUALIZAÇÕES INTERATIVAS")
+        print("="*80)
+        print("\nℹ️  Execução sem gráficos (--sem-graficos)")
+    insights_estrategicos(correlacao, renda_por_faixa, alta_renda, por_estado)
+    with instrumentacao.secao('exportar', categoria='exportar'):
+        exportar_dados(renda_por_faixa, alta_renda, por_estado, df_analise)
+    if topo_por:
+        with instrumentacao.secao('topo_grupo', categoria='exportar'):
+            exportar_topo_grupo(df_analise, topo_por, topo_n)
+
+
+def executar_streaming(caminho=ARQUIVO_CLIENTES, tamanho_chunk=TAMANHO_CHUNK, erro_quantis=ERRO_QUANTIS,
+                       topo_por=None, topo_n=TOPO_N):
+    print(f"\n📊 Lendo dados em chunks de {tamanho_chunk:,} linhas...")
+    with instrumentacao.secao('streaming', categoria='etapa') as secao:
+        resultado = calcular_streaming(caminho, tamanho_chunk, erro_quantis, topo_por, topo_n)
+        secao['linhas'] = resultado['total']
+    print(f"✓ {resultado['total']:,} clientes com dados completos\n")
+
+    relatorio_correlacao(resultado['correlacao'])
+    relatorio_renda_por_faixa(resultado['renda_por_faixa'])
+    relatorio_renda_por_idade(resultado['renda_por_idade'])
+    relatorio_alta_renda(resultado['alta_renda'])
+    relatorio_por_estado(resultado['por_estado'])
+
+    print("\n" + "="*80)
+    print("📊 VISUALIZAÇÕES INTERATIVAS")
+    print("="*80)
+    print("\nℹ️  Modo streaming: os gráficos por cliente não são gerados")
+
+    insights_estrategicos(resultado['correlacao'], resultado['renda_por_faixa'],
+                          resultado['alta_renda'], resultado['por_estado'])
+    with instrumentacao.secao('exportar', categoria='exportar'):
+        exportar_dados(resultado['renda_por_faixa'], resultado['alta_renda'], resultado['por_estado'])
+    if topo_por:
+        resultado['topo'].exportar(arquivo_topo(topo_por, topo_n))
+        print(f"✓ Arquivo salvo: {arquivo_topo(topo_por, topo_n)}")
+
+
+def relatorio_inicio():
+    print("="*80)
+    print("💰 ANÁLISE DETALHADA: RENDA x IDADE")
+    print("="*80)
+
+
+def relatorio_arquivos(arquivos_html, topo_por=None, topo_n=TOPO_N):
+    print("\n" + "="*80)
+    print("✅ ANÁLISE COMPLETA!")
+    print("="*80)
+
+    if arquivos_html:
+        print("\n📂 Arquivos HTML gerados (abra no navegador):")
+        for arquivo in arquivos_html:
+            print(f"   • {arquivo}")
+
+    print("\n📊 Arquivos CSV gerados:")
+    print("   • analise_renda_por_faixa_etaria.csv")
+    print("   • clientes_alta_renda_top10.csv")
+    print("   • renda_idade_por_estado.csv")
+    if topo_por:
+        print(f"   • {arquivo_topo(topo_por, topo_n)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Análise de renda x idade - Priceless Bank')
+    parser.add_argument('--arquivo', default=ARQUIVO_CLIENTES,
+                        help='CSV da base de clientes')
+    parser.add_argument('--streaming', action='store_true',
+                        help='lê a base em chunks com memória limitada')
+    parser.add_argument('--tamanho-chunk', type=int, default=TAMANHO_CHUNK,
+                        help='linhas por chunk no modo streaming')
+    parser.add_argument('--erro-quantis', type=float, default=ERRO_QUANTIS,
+                        help='erro de posição das medianas e percentis, em fração dos clientes '
+                             f'(padrão: {ERRO_QUANTIS}; bases pequenas são exatas)')
+    parser.add_argument('--graficos', choices=MODOS, default='auto',
+                        help='dispersão exata, agregada em grade (densidade) ou amostrada '
+                             f'(padrão: exata até {LIMITE_PONTOS:,} clientes)')
+    parser.add_argument('--relatorio', choices=MODOS_RELATORIO, default='compartilhado',
+                        help='um HTML por gráfico com plotly.js compartilhado (padrão), com plotly.js '
+                             'embutido em cada um (independente), painel único, painel em .html.gz (pacote) '
+                             'ou nenhum gráfico')
+    parser.add_argument('--processos-graficos', type=int, default=None,
+                        help='processos que montam e gravam os gráficos (padrão: um por núcleo)')
+    parser.add_argument('--sem-graficos', action='store_true',
+                        help='só relatórios em texto e CSVs, sem importar o plotly (o mesmo que --relatorio nenhum)')
+    parser.add_argument('--top-por', choices=COLUNAS_TOPO, default=None,
+                        help='exporta também os clientes de maior renda de cada grupo')
+    parser.add_argument('--top-n', type=int, default=TOPO_N,
+                        help=f'clientes por grupo em --top-por (padrão: {TOPO_N})')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='threads que calculam as etapas independentes ao mesmo tempo '
+                             '(padrão: uma por núcleo; 1: em sequência)')
+    parser.add_argument('--memoria-maxima', type=tamanho_memoria, default=None, metavar='TAMANHO',
+                        help='orçamento de memória da análise em memória (ex.: 800M, 4G): etapas em '
+                             'sequência, em blocos e liberadas logo após o uso; falha antes de ler a '
+                             'base se a estimativa passar do orçamento')
+    parser.add_argument('--instrumentacao', choices=MODOS_INSTRUMENTACAO, default='leve',
+                        help=f'medições por seção gravadas em {ARQUIVO_EXECUCAO} (padrão: leve; '
+                             'detalhada inclui o pico de memória de cada seção)')
+    parser.add_argument('--trace', action='store_true',
+                        help='grava também o trace das seções (formato do Chrome/Perfetto)')
+    args = parser.parse_args()
+    if args.sem_graficos:
+        args.relatorio = 'nenhum'
+
+    # O streaming já tem memória limitada pelo chunk; o orçamento vale para a análise em memória
+    economizar_memoria = args.memoria_maxima is not None and not args.streaming
+    if economizar_memoria:
+        args.threads = args.threads or 1
+        args.processos_graficos = args.processos_graficos or 1
+        processos = args.processos_graficos if args.processos_graficos > 1 else 0
+        try:
+            clientes, estimativa = verificar_orcamento(args.memoria_maxima, 'renda', args.arquivo, processos)
+        except MemoryError as erro:
+            print(f"❌ {erro}")
+            sys.exit(1)
+
+    relatorio_inicio()
+    if economizar_memoria:
+        relatorio_orcamento(args.memoria_maxima, clientes, estimativa)
+
+    medicoes = instrumentacao.configurar(args.instrumentacao, nome='analise_renda_idade')
+    with instrumentacao.secao('analise_renda_idade'):
+        if args.streaming:
+            executar_streaming(args.arquivo, args.tamanho_chunk, args.erro_quantis,
+                               args.top_por, args.top_n)
+            arquivos_html = []
+        else:
+            # Os gráficos são gerados no pool enquanto os insights e os CSVs são calculados
+            relatorio_html.configurar(args.relatorio, titulo='Renda x Idade - Priceless Bank',
+                                      arquivo_painel='relatorio_renda_idade.html',
+                                      n_processos=args.processos_graficos)
+            executar_em_memoria(args.arquivo, args.graficos, args.erro_quantis,
+                                args.top_por, args.top_n, n_threads=args.threads,
+                                economizar_memoria=economizar_memoria)
+            arquivos_html = relatorio_html.finalizar()
+
+    relatorio_arquivos(arquivos_html, args.top_por, args.top_n)
+    if economizar_memoria:
+        relatorio_pico(args.memoria_maxima)
+    arquivos_execucao = medicoes.gravar(ARQUIVO_EXECUCAO,
+                                        trace=args.trace and ARQUIVO_EXECUCAO.replace('.json', '.trace.json'))
+    if arquivos_execucao:
+        print("\n📈 Relatório de execução:")
+        for arquivo in arquivos_execucao:
+            print(f"   • {arquivo}")
+
+    print("\n" + "="*80)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,537 +4,1043 @@ Mastercard Challenge 2025
 
 Este script realiza a análise completa de segmentação de clientes
 utilizando dados demográficos e machine learning.
+
+Cada seção numerada é exposta como uma etapa nomeada (carregar, features,
+correlacao, kmeans, avaliacao, cubo, quantis, geografia, demografia, pca,
+perfil, exportar) cujo resultado fica em cache em disco. Uma etapa só é recalculada quando o arquivo
+de entrada, seus parâmetros ou alguma etapa anterior mudaram; os gráficos e
+relatórios são sempre refeitos a partir dos resultados em cache.
+
+As etapas formam um grafo de dependências (idade, renda, localização e
+correlação dependem só das features; cubo, avaliação, PCA e perfil, do
+k-means) e são
+calculadas em um pool de --threads threads assim que suas dependências
+ficam prontas (ver agendador_etapas.py), enquanto os relatórios são
+impressos na ordem de sempre.
+
+Uso:
+    python analise_segmentacao.py [--sem-cache] [--limpar-cache] [--k K] [--processos N]
+                                  [--graficos auto|exato|densidade|amostra]
+                                  [--relatorio compartilhado|independente|painel|pacote|nenhum]
+                                  [--processos-graficos N] [--sem-graficos] [--threads N]
+                                  [--memoria-maxima TAMANHO]
+                                  [--instrumentacao leve|detalhada|desligada] [--trace]
+
+Com --sem-graficos (o mesmo que --relatorio nenhum), só os relatórios em
+texto, os CSVs e o modelo são gerados: nenhuma figura é montada, a projeção
+PCA não é calculada e o plotly não é importado.
+
+Os eixos da projeção PCA do gráfico de segmentos (em bases grandes, pela
+covariância acumulada em blocos de TAMANHO_BLOCO_PCA linhas) ficam no cache
+de etapas e são exportados com o modelo, para que pontuar_clientes.py
+projete clientes novos nos mesmos eixos. O sklearn só é importado quando o
+k-means precisa ser ajustado (ou lido do cache).
+
+Com --memoria-maxima (por exemplo, 2G), a execução cabe em um orçamento de
+memória: o pico é estimado antes de ler a base (e a execução falha na hora
+se não couber), as etapas rodam em sequência, o k-means usa uma matriz
+float32 e cada resultado sai da memória depois do último consumo (ver
+orcamento_memoria.py).
+
+Cada execução grava execucao_segmentacao.json com tempo, CPU, memória e
+linhas de cada etapa, agregação, ajuste da varredura de k, gráfico e
+exportação (ver instrumentacao.py).
+
+Ou, a partir de outro script:
+    from analise_segmentacao import montar_etapas
+    etapas = montar_etapas('Base_clientes.csv')
+    perfil = etapas['perfil'].resultado()
 """
 
 # ============================================================================
 # 1. IMPORTAR BIBLIOTECAS
 # ============================================================================
-print("🔄 Importando bibliotecas...")
-
+# plotly e sklearn são importados nas funções que os usam: uma execução sem
+# gráficos (--sem-graficos) ou com o k-means em cache não paga a importação
+import argparse
+import sys
 import pandas as pd
 import numpy as np
-from datetime import datetime
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
 import warnings
 warnings.filterwarnings('ignore')
 
-# Configurações de visualização
-sns.set_palette('husl')
-plt.rcParams['figure.figsize'] = (12, 6)
+from agendador_etapas import AgendadorEtapas
+from avaliacao_segmentos import N_AMOSTRAS, N_BOOTSTRAP, TAMANHO_AMOSTRA, avaliar_segmentacao
+from base_colunar import ARQUIVO_CLIENTES, carregar_clientes
+from cache_etapas import CacheEtapas, Etapa, DIRETORIO_CACHE
+from cubo_agregado import CuboAgregado
+from estatisticas_streaming import ERRO_QUANTIS, ComomentosGrupo, MatrizComomentos, ResumoQuantis
+from frequencias_categoricas import top_categorias
+from graficos_grandes import LIMITE_PONTOS, MODOS, caixa, dispersao, escolher_modo
+from instrumentacao import MODOS_INSTRUMENTACAO
+import instrumentacao
+from features_clientes import (CONTA_ADICIONAL, DATA_REFERENCIA, FAIXAS_SEGMENTACAO,
+                               VARIAVEIS_CLUSTER, criar_features)
+from modelo_segmentacao import DIRETORIO_MODELOS, ModeloSegmentacao, config_features
+from orcamento_memoria import (TAMANHO_BLOCO, relatorio_orcamento, relatorio_pico, tamanho_memoria,
+                               verificar_orcamento)
+from relatorio_segmentos import relatorio_perfil
+from resumo_geografico import COLUNAS_GEOGRAFIA, ResumoGeografico
+import relatorio_html
+from relatorio_html import MODOS_RELATORIO, agendar_figura
+from varredura_k import K_RANGE, N_CLUSTERS, RANDOM_STATE, PoolMatriz, escolher_modelo, varrer_k
+
+ARQUIVO_EXECUCAO = 'execucao_segmentacao.json'
+VARIAVEIS_CORRELACAO = ['Idade', 'Renda_Anual', 'Numero_Cartoes',
+                        'Possui_Conta_Adicional_Bin', 'Tempo_Cliente_Anos']
+FAIXAS = FAIXAS_SEGMENTACAO
+TOP_LOCALIZACAO = 3
+DIMENSOES_CUBO = ['Estado', 'Cidade', 'Faixa_Etaria', 'Faixa_Renda', 'Idade']
+MEDIDAS_QUANTIS = ['Idade', 'Renda_Anual']
+TAMANHO_BLOCO_PCA = 200_000  # acima disso, a covariância da PCA é acumulada em blocos
 
-print("✓ Bibliotecas importadas com sucesso!\n")
 
 # ============================================================================
 # 2. CARREGAR E EXPLORAR DADOS
 # ============================================================================
-print("="*80)
-print("📊 CARREGANDO BASE DE DADOS")
-print("="*80)
-
-df_clientes = pd.read_csv('Base_clientes.csv')
-
-print(f"\n📊 Total de clientes: {len(df_clientes):,}")
-print(f"📋 Colunas disponíveis: {list(df_clientes.columns)}")
-print("\n" + "="*80)
-print("Primeiras 10 linhas:")
-print(df_clientes.head(10))
-
-# Informações do dataset
-print("\n" + "="*80)
-print("📈 INFORMAÇÕES DO DATASET:")
-print("="*80)
-df_clientes.info()
-
-print("\n" + "="*80)
-print("📊 ESTATÍSTICAS DESCRITIVAS:")
-print("="*80)
-print(df_clientes.describe())
-
-# Valores ausentes
-print("\n" + "="*80)
-print("❓ VALORES AUSENTES POR COLUNA:")
-print("="*80)
-missing_data = pd.DataFrame({
-    'Total Missing': df_clientes.isnull().sum(),
-    'Percentual (%)': (df_clientes.isnull().sum() / len(df_clientes) * 100).round(2)
-})
-missing_data = missing_data[missing_data['Total Missing'] > 0].sort_values('Total Missing', ascending=False)
-print(missing_data)
+def carregar_dados(caminho):
+    # Lê a base colunar tipada (convertida do CSV na primeira execução)
+    return carregar_clientes(caminho)
+
+
+def relatorio_dados(df_clientes):
+    print("="*80)
+    print("📊 CARREGANDO BASE DE DADOS")
+    print("="*80)
+
+    print(f"\n📊 Total de clientes: {len(df_clientes):,}")
+    print(f"📋 Colunas disponíveis: {list(df_clientes.columns)}")
+    print("\n" + "="*80)
+    print("Primeiras 10 linhas:")
+    print(df_clientes.head(10))
+
+    # Informações do dataset
+    print("\n" + "="*80)
+    print("📈 INFORMAÇÕES DO DATASET:")
+    print("="*80)
+    df_clientes.info()
+
+    print("\n" + "="*80)
+    print("📊 ESTATÍSTICAS DESCRITIVAS:")
+    print("="*80)
+    print(df_clientes.describe())
+
+    # Valores ausentes
+    print("\n" + "="*80)
+    print("❓ VALORES AUSENTES POR COLUNA:")
+    print("="*80)
+    missing_data = pd.DataFrame({
+        'Total Missing': df_clientes.isnull().sum(),
+        'Percentual (%)': (df_clientes.isnull().sum() / len(df_clientes) * 100).round(2)
+    })
+    missing_data = missing_data[missing_data['Total Missing'] > 0].sort_values('Total Missing', ascending=False)
+    print(missing_data)
+
 
 # ============================================================================
 # 3. PREPARAÇÃO E ENGENHARIA DE FEATURES
 # ============================================================================
-print("\n" + "="*80)
-print("🔧 PREPARAÇÃO E ENGENHARIA DE FEATURES")
-print("="*80)
-
-df = df_clientes.copy()
-
-# Converter datas
-df['Data_Nascimento'] = pd.to_datetime(df['Data_Nascimento'], format='%d/%m/%Y', errors='coerce')
-df['Data_Criacao_Conta'] = pd.to_datetime(df['Data_Criacao_Conta'], errors='coerce')
-
-# Calcular idade atual
-data_referencia = datetime(2025, 10, 3)
-df['Idade'] = ((data_referencia - df['Data_Nascimento']).dt.days / 365.25).round(0)
-
-# Calcular tempo como cliente
-df['Tempo_Cliente_Anos'] = ((data_referencia - df['Data_Criacao_Conta']).dt.days / 365.25).round(2)
-
-# Criar faixas etárias
-df['Faixa_Etaria'] = pd.cut(df['Idade'], 
-                             bins=[0, 25, 35, 45, 55, 65, 100],
-                             labels=['18-25', '26-35', '36-45', '46-55', '56-65', '65+'])
+def relatorio_features(df):
+    print("\n" + "="*80)
+    print("🔧 PREPARAÇÃO E ENGENHARIA DE FEATURES")
+    print("="*80)
 
-# Criar faixas de renda
-df['Faixa_Renda'] = pd.cut(df['Renda_Anual'], 
-                            bins=[0, 30000, 50000, 80000, 120000, np.inf],
-                            labels=['Até 30k', '30k-50k', '50k-80k', '80k-120k', 'Acima 120k'])
+    print(f"\n✓ Features criadas com sucesso!")
+    print(f"📊 Dataset atualizado: {df.shape[0]} linhas x {df.shape[1]} colunas\n")
 
-# Converter conta adicional para binário
-df['Possui_Conta_Adicional_Bin'] = df['Possui_Conta_Adicional'].map({'Sim': 1, 'Não': 0})
-
-print(f"\n✓ Features criadas com sucesso!")
-print(f"📊 Dataset atualizado: {df.shape[0]} linhas x {df.shape[1]} colunas\n")
-
-# ============================================================================
-# 4. ANÁLISE DEMOGRÁFICA - IDADE
-# ============================================================================
-print("="*80)
-print("📊 ANÁLISE DEMOGRÁFICA - IDADE")
-print("="*80)
-
-print("\n📈 Estatísticas de Idade:")
-print(f"  • Idade Média: {df['Idade'].mean():.1f} anos")
-print(f"  • Idade Mediana: {df['Idade'].median():.1f} anos")
-print(f"  • Idade Mínima: {df['Idade'].min():.0f} anos")
-print(f"  • Idade Máxima: {df['Idade'].max():.0f} anos")
-print(f"  • Desvio Padrão: {df['Idade'].std():.1f} anos")
-
-print("\n📊 Distribuição por Faixa Etária:")
-print(df['Faixa_Etaria'].value_counts().sort_index())
-
-# Visualização
-fig = make_subplots(
-    rows=2, cols=2,
-    subplot_titles=('Distribuição de Idade', 'Box Plot - Idade', 
-                    'Distribuição por Faixa Etária', 'Idade Média por Estado'),
-    specs=[[{'type': 'histogram'}, {'type': 'box'}],
-           [{'type': 'bar'}, {'type': 'bar'}]]
-)
-
-fig.add_trace(
-    go.Histogram(x=df['Idade'].dropna(), nbinsx=30, name='Idade',
-                marker_color='rgb(55, 83, 109)'),
-    row=1, col=1
-)
-
-fig.add_trace(
-    go.Box(y=df['Idade'].dropna(), name='Idade', marker_color='rgb(26, 118, 255)'),
-    row=1, col=2
-)
-
-faixa_etaria_count = df['Faixa_Etaria'].value_counts().sort_index()
-fig.add_trace(
-    go.Bar(x=faixa_etaria_count.index.astype(str), y=faixa_etaria_count.values,
-          marker_color='rgb(50, 171, 96)', name='Faixa Etária'),
-    row=2, col=1
-)
-
-idade_por_estado = df.groupby('Estado')['Idade'].mean().sort_values(ascending=False)
-fig.add_trace(
-    go.Bar(x=idade_por_estado.index, y=idade_por_estado.values,
-          marker_color='rgb(219, 64, 82)', name='Idade Média'),
-    row=2, col=2
-)
-
-fig.update_layout(height=800, showlegend=False, title_text="📊 Análise Completa - Idade dos Clientes")
-fig.write_html('analise_idade.html')
-print("\n✓ Gráfico salvo: analise_idade.html")
 
 # ============================================================================
-# 5. ANÁLISE DEMOGRÁFICA - RENDA
+# 4-6. ANÁLISE DEMOGRÁFICA - IDADE, RENDA E LOCALIZAÇÃO
 # ============================================================================
-print("\n" + "="*80)
-print("💰 ANÁLISE DEMOGRÁFICA - RENDA")
-print("="*80)
-
-print("\n💵 Estatísticas de Renda Anual:")
-print(f"  • Renda Média: R$ {df['Renda_Anual'].mean():,.2f}")
-print(f"  • Renda Mediana: R$ {df['Renda_Anual'].median():,.2f}")
-print(f"  • Renda Mínima: R$ {df['Renda_Anual'].min():,.2f}")
-print(f"  • Renda Máxima: R$ {df['Renda_Anual'].max():,.2f}")
-print(f"  • Desvio Padrão: R$ {df['Renda_Anual'].std():,.2f}")
-
-print("\n📊 Distribuição por Faixa de Renda:")
-print(df['Faixa_Renda'].value_counts().sort_index())
-
-# Visualização
-fig = make_subplots(
-    rows=2, cols=2,
-    subplot_titles=('Distribuição de Renda Anual', 'Box Plot - Renda', 
-                    'Distribuição por Faixa de Renda', 'Renda Média por Estado'),
-    specs=[[{'type': 'histogram'}, {'type': 'box'}],
-           [{'type': 'bar'}, {'type': 'bar'}]]
-)
-
-fig.add_trace(
-    go.Histogram(x=df['Renda_Anual'].dropna(), nbinsx=40, name='Renda',
-                marker_color='rgb(55, 128, 191)'),
-    row=1, col=1
-)
-
-fig.add_trace(
-    go.Box(y=df['Renda_Anual'].dropna(), name='Renda', marker_color='rgb(128, 0, 128)'),
-    row=1, col=2
-)
-
-faixa_renda_count = df['Faixa_Renda'].value_counts().sort_index()
-fig.add_trace(
-    go.Bar(x=faixa_renda_count.index.astype(str), y=faixa_renda_count.values,
-          marker_color='rgb(255, 144, 14)', name='Faixa Renda'),
-    row=2, col=1
-)
-
-renda_por_estado = df.groupby('Estado')['Renda_Anual'].mean().sort_values(ascending=False)
-fig.add_trace(
-    go.Bar(x=renda_por_estado.index, y=renda_por_estado.values,
-          marker_color='rgb(44, 160, 101)', name='Renda Média'),
-    row=2, col=2
-)
-
-fig.update_layout(height=800, showlegend=False, title_text="💰 Análise Completa - Renda dos Clientes")
-fig.write_html('analise_renda.html')
-print("\n✓ Gráfico salvo: analise_renda.html")
+def calcular_cubo(df, segmentacao, dimensoes=DIMENSOES_CUBO, medidas=VARIAVEIS_CLUSTER):
+    # Uma passada sobre os clientes; demografia e perfil saem do cubo por roll-up
+    df_cluster = segmentacao['df_cluster']
+    segmento = pd.Series(pd.NA, index=df.index, dtype='Int64', name='Segmento')
+    segmento[df_cluster.index] = df_cluster['Segmento']
+    return CuboAgregado.construir(df, list(dimensoes) + [segmento], medidas)
+
+
+def calcular_quantis(df, medidas=MEDIDAS_QUANTIS, erro=ERRO_QUANTIS):
+    # Resumos mescláveis: medianas e box plots sem ordenar as colunas
+    quantis = {}
+    for medida in medidas:
+        quantis[medida] = ResumoQuantis(erro)
+        quantis[medida].atualizar(df[medida].to_numpy('float64'))
+    return quantis
+
+
+def calcular_geografia(df, colunas=COLUNAS_GEOGRAFIA):
+    # Distintos e mais frequentes com memória limitada (sketches acima do limite exato)
+    geografia = ResumoGeografico(colunas)
+    geografia.atualizar(df)
+    return geografia
+
+
+def calcular_demografia(cubo, quantis, geografia):
+    idade = cubo.resumo('Idade')
+    renda = cubo.resumo('Renda_Anual')
+    por_estado = cubo.agregar(['Estado'])
+    estado_stats = pd.DataFrame({
+        'Estado': por_estado.linhas.index,
+        'Num_Clientes': por_estado.linhas.to_numpy(),
+        'Renda_Media': por_estado.media('Renda_Anual').to_numpy(),
+    })
+    return {
+        'idade': {
+            'media': idade['media'], 'mediana': quantis['Idade'].quantil(0.5),
+            'minimo': idade['minimo'], 'maximo': idade['maximo'], 'desvio': idade['desvio'],
+            'box': quantis['Idade'].resumo_box(),
+        },
+        'faixa_etaria_count': cubo.contagem_valores('Faixa_Etaria').sort_index(),
+        'idade_por_estado': por_estado.media('Idade').sort_values(ascending=False),
+        'renda': {
+            'media': renda['media'], 'mediana': quantis['Renda_Anual'].quantil(0.5),
+            'minimo': renda['minimo'], 'maximo': renda['maximo'], 'desvio': renda['desvio'],
+            'box': quantis['Renda_Anual'].resumo_box(),
+        },
+        'faixa_renda_count': cubo.contagem_valores('Faixa_Renda').sort_index(),
+        'renda_por_estado': por_estado.media('Renda_Anual').sort_values(ascending=False),
+        'num_estados': geografia.distintos('Estado'),
+        'num_cidades': geografia.distintos('Cidade'),
+        'geografia_exata': all(geografia.exato(c) for c in ('Estado', 'Cidade')),
+        'estado_count': geografia.contagens('Estado'),
+        'top_cidades': geografia.contagens('Cidade', 10),
+        'estado_stats': estado_stats,
+    }
+
+
+def relatorio_idade(df, demografia):
+    print("="*80)
+    print("📊 ANÁLISE DEMOGRÁFICA - IDADE")
+    print("="*80)
+
+    stats = demografia['idade']
+    print("\n📈 Estatísticas de Idade:")
+    print(f"  • Idade Média: {stats['media']:.1f} anos")
+    print(f"  • Idade Mediana: {stats['mediana']:.1f} anos")
+    print(f"  • Idade Mínima: {stats['minimo']:.0f} anos")
+    print(f"  • Idade Máxima: {stats['maximo']:.0f} anos")
+    print(f"  • Desvio Padrão: {stats['desvio']:.1f} anos")
+
+    print("\n📊 Distribuição por Faixa Etária:")
+    print(demografia['faixa_etaria_count'])
+
+    destino = agendar_figura('analise_idade.html', figura_idade, df['Idade'], demografia)
+    if destino:
+        print(f"\n✓ Gráfico salvo: {destino}")
+
+
+def figura_idade(idade, demografia):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=('Distribuição de Idade', 'Box Plot - Idade',
+                        'Distribuição por Faixa Etária', 'Idade Média por Estado'),
+        specs=[[{'type': 'histogram'}, {'type': 'box'}],
+               [{'type': 'bar'}, {'type': 'bar'}]]
+    )
+
+    fig.add_trace(
+        go.Histogram(x=idade.dropna(), nbinsx=30, name='Idade',
+                    marker_color='rgb(55, 83, 109)'),
+        row=1, col=1
+    )
+
+    fig.add_trace(
+        caixa(demografia['idade']['box'], 'Idade', marker_color='rgb(26, 118, 255)'),
+        row=1, col=2
+    )
+
+    faixa_etaria_count = demografia['faixa_etaria_count']
+    fig.add_trace(
+        go.Bar(x=faixa_etaria_count.index.astype(str), y=faixa_etaria_count.values,
+              marker_color='rgb(50, 171, 96)', name='Faixa Etária'),
+        row=2, col=1
+    )
+
+    idade_por_estado = demografia['idade_por_estado']
+    fig.add_trace(
+        go.Bar(x=idade_por_estado.index, y=idade_por_estado.values,
+              marker_color='rgb(219, 64, 82)', name='Idade Média'),
+        row=2, col=2
+    )
+
+    fig.update_layout(height=800, showlegend=False, title_text="📊 Análise Completa - Idade dos Clientes")
+    return fig
+
+
+def relatorio_renda(df, demografia):
+    print("\n" + "="*80)
+    print("💰 ANÁLISE DEMOGRÁFICA - RENDA")
+    print("="*80)
+
+    stats = demografia['renda']
+    print("\n💵 Estatísticas de Renda Anual:")
+    print(f"  • Renda Média: R$ {stats['media']:,.2f}")
+    print(f"  • Renda Mediana: R$ {stats['mediana']:,.2f}")
+    print(f"  • Renda Mínima: R$ {stats['minimo']:,.2f}")
+    print(f"  • Renda Máxima: R$ {stats['maximo']:,.2f}")
+    print(f"  • Desvio Padrão: R$ {stats['desvio']:,.2f}")
+
+    print("\n📊 Distribuição por Faixa de Renda:")
+    print(demografia['faixa_renda_count'])
+
+    destino = agendar_figura('analise_renda.html', figura_renda, df['Renda_Anual'], demografia)
+    if destino:
+        print(f"\n✓ Gráfico salvo: {destino}")
+
+
+def figura_renda(renda, demografia):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=('Distribuição de Renda Anual', 'Box Plot - Renda',
+                        'Distribuição por Faixa de Renda', 'Renda Média por Estado'),
+        specs=[[{'type': 'histogram'}, {'type': 'box'}],
+               [{'type': 'bar'}, {'type': 'bar'}]]
+    )
+
+    fig.add_trace(
+        go.Histogram(x=renda.dropna(), nbinsx=40, name='Renda',
+                    marker_color='rgb(55, 128, 191)'),
+        row=1, col=1
+    )
+
+    fig.add_trace(
+        caixa(demografia['renda']['box'], 'Renda', marker_color='rgb(128, 0, 128)'),
+        row=1, col=2
+    )
+
+    faixa_renda_count = demografia['faixa_renda_count']
+    fig.add_trace(
+        go.Bar(x=faixa_renda_count.index.astype(str), y=faixa_renda_count.values,
+              marker_color='rgb(255, 144, 14)', name='Faixa Renda'),
+        row=2, col=1
+    )
+
+    renda_por_estado = demografia['renda_por_estado']
+    fig.add_trace(
+        go.Bar(x=renda_por_estado.index, y=renda_por_estado.values,
+              marker_color='rgb(44, 160, 101)', name='Renda Média'),
+        row=2, col=2
+    )
+
+    fig.update_layout(height=800, showlegend=False, title_text="💰 Análise Completa - Renda dos Clientes")
+    return fig
+
+
+def relatorio_localizacao(demografia):
+    print("\n" + "="*80)
+    print("🗺️ ANÁLISE DEMOGRÁFICA - LOCALIZAÇÃO")
+    print("="*80)
+
+    print(f"\n🌎 Estatísticas Geográficas:")
+    print(f"  • Total de Estados: {demografia['num_estados']}")
+    print(f"  • Total de Cidades: {demografia['num_cidades']}")
+    if not demografia.get('geografia_exata', True):
+        print("  (base grande: distintos estimados por HyperLogLog e contagens por Space-Saving/Count-Min)")
+
+    print("\n📊 Top 5 Estados por número de clientes:")
+    estado_count = demografia['estado_count']
+    print(estado_count.head())
+
+    print("\n📊 Top 10 Cidades:")
+    print(demografia['top_cidades'])
+
+    destino = agendar_figura('analise_localizacao.html', figura_localizacao, demografia)
+    if destino:
+        print(f"\n✓ Gráfico salvo: {destino}")
+
+
+def figura_localizacao(demografia):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=('Top 10 Cidades', 'Distribuição por Estado',
+                        'Clientes por Estado (Pizza)', 'Renda Média vs Clientes por Estado'),
+        specs=[[{'type': 'bar'}, {'type': 'bar'}],
+               [{'type': 'pie'}, {'type': 'scatter'}]]
+    )
+
+    top_cidades = demografia['top_cidades']
+    estado_count = demografia['estado_count']
+    fig.add_trace(
+        go.Bar(y=top_cidades.index, x=top_cidades.values, orientation='h',
+              marker_color='rgb(158, 202, 225)', name='Cidades'),
+        row=1, col=1
+    )
+
+    fig.add_trace(
+        go.Bar(x=estado_count.index, y=estado_count.values,
+              marker_color='rgb(94, 204, 243)', name='Estados'),
+        row=1, col=2
+    )
+
+    fig.add_trace(
+        go.Pie(labels=estado_count.index, values=estado_count.values),
+        row=2, col=1
+    )
+
+    estado_stats = demografia['estado_stats']
+    fig.add_trace(
+        go.Scatter(x=estado_stats['Num_Clientes'], y=estado_stats['Renda_Media'],
+                  mode='markers+text', text=estado_stats['Estado'],
+                  textposition='top center',
+                  marker=dict(size=15, color='rgb(255, 127, 14)'),
+                  name='Estados'),
+        row=2, col=2
+    )
+
+    fig.update_layout(height=900, showlegend=False, title_text="🗺️ Análise Geográfica dos Clientes")
+    return fig
 
-# ============================================================================
-# 6. ANÁLISE DEMOGRÁFICA - LOCALIZAÇÃO
-# ============================================================================
-print("\n" + "="*80)
-print("🗺️ ANÁLISE DEMOGRÁFICA - LOCALIZAÇÃO")
-print("="*80)
-
-print(f"\n🌎 Estatísticas Geográficas:")
-print(f"  • Total de Estados: {df['Estado'].nunique()}")
-print(f"  • Total de Cidades: {df['Cidade'].nunique()}")
-
-print("\n📊 Top 5 Estados por número de clientes:")
-estado_count = df['Estado'].value_counts()
-print(estado_count.head())
-
-print("\n📊 Top 10 Cidades:")
-print(df['Cidade'].value_counts().head(10))
-
-# Visualização
-fig = make_subplots(
-    rows=2, cols=2,
-    subplot_titles=('Top 10 Cidades', 'Distribuição por Estado', 
-                    'Clientes por Estado (Pizza)', 'Renda Média vs Clientes por Estado'),
-    specs=[[{'type': 'bar'}, {'type': 'bar'}],
-           [{'type': 'pie'}, {'type': 'scatter'}]]
-)
-
-top_cidades = df['Cidade'].value_counts().head(10)
-fig.add_trace(
-    go.Bar(y=top_cidades.index, x=top_cidades.values, orientation='h',
-          marker_color='rgb(158, 202, 225)', name='Cidades'),
-    row=1, col=1
-)
-
-fig.add_trace(
-    go.Bar(x=estado_count.index, y=estado_count.values,
-          marker_color='rgb(94, 204, 243)', name='Estados'),
-    row=1, col=2
-)
-
-fig.add_trace(
-    go.Pie(labels=estado_count.index, values=estado_count.values),
-    row=2, col=1
-)
-
-estado_stats = df.groupby('Estado').agg({
-    'Cliente_ID': 'count',
-    'Renda_Anual': 'mean'
-}).reset_index()
-estado_stats.columns = ['Estado', 'Num_Clientes', 'Renda_Media']
-
-fig.add_trace(
-    go.Scatter(x=estado_stats['Num_Clientes'], y=estado_stats['Renda_Media'],
-              mode='markers+text', text=estado_stats['Estado'],
-              textposition='top center',
-              marker=dict(size=15, color='rgb(255, 127, 14)'),
-              name='Estados'),
-    row=2, col=2
-)
-
-fig.update_layout(height=900, showlegend=False, title_text="🗺️ Análise Geográfica dos Clientes")
-fig.write_html('analise_localizacao.html')
-print("\n✓ Gráfico salvo: analise_localizacao.html")
 
 # ============================================================================
 # 7. ANÁLISE DE CORRELAÇÃO
 # ============================================================================
-print("\n" + "="*80)
-print("🔗 ANÁLISE DE CORRELAÇÃO")
-print("="*80)
-
-correlation_vars = ['Idade', 'Renda_Anual', 'Numero_Cartoes', 
-                    'Possui_Conta_Adicional_Bin', 'Tempo_Cliente_Anos']
-corr_matrix = df[correlation_vars].corr()
-
-print("\n🔍 Principais Correlações:")
-corr_pairs = []
-for i in range(len(corr_matrix.columns)):
-    for j in range(i+1, len(corr_matrix.columns)):
-        corr_pairs.append((
-            corr_matrix.columns[i],
-            corr_matrix.columns[j],
-            corr_matrix.iloc[i, j]
-        ))
-corr_pairs_sorted = sorted(corr_pairs, key=lambda x: abs(x[2]), reverse=True)
-for var1, var2, corr in corr_pairs_sorted[:5]:
-    print(f"  • {var1} <-> {var2}: {corr:.3f}")
-
-# Visualização
-fig = go.Figure(data=go.Heatmap(
-    z=corr_matrix.values,
-    x=corr_matrix.columns,
-    y=corr_matrix.columns,
-    colorscale='RdBu',
-    zmid=0,
-    text=corr_matrix.values.round(2),
-    texttemplate='%{text}',
-    textfont={"size": 10},
-    colorbar=dict(title="Correlação")
-))
-
-fig.update_layout(
-    title='🔗 Matriz de Correlação entre Variáveis',
-    height=600,
-    xaxis_title='',
-    yaxis_title=''
-)
-fig.write_html('analise_correlacao.html')
-print("\n✓ Gráfico salvo: analise_correlacao.html")
+def calcular_correlacao(df, variaveis=VARIAVEIS_CORRELACAO, tamanho_bloco=None):
+    # Co-momentos mescláveis: a mesma conta serve para chunks, partes e grupos
+    comomentos = MatrizComomentos(variaveis)
+    comomentos.atualizar(df, tamanho_bloco)
+    return {'matriz': comomentos.pearson(), 'pares': comomentos.pares()}
+
+
+def relatorio_correlacao(correlacao):
+    print("\n" + "="*80)
+    print("🔗 ANÁLISE DE CORRELAÇÃO")
+    print("="*80)
+
+    print("\n🔍 Principais Correlações:")
+    for var1, var2, corr in correlacao['pares'][:5]:
+        print(f"  • {var1} <-> {var2}: {corr:.3f}")
+
+    destino = agendar_figura('analise_correlacao.html', figura_correlacao, correlacao['matriz'])
+    if destino:
+        print(f"\n✓ Gráfico salvo: {destino}")
+
+
+def figura_correlacao(corr_matrix):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(data=go.Heatmap(
+        z=corr_matrix.values,
+        x=corr_matrix.columns,
+        y=corr_matrix.columns,
+        colorscale='RdBu',
+        zmid=0,
+        text=corr_matrix.values.round(2),
+        texttemplate='%{text}',
+        textfont={"size": 10},
+        colorbar=dict(title="Correlação")
+    ))
+
+    fig.update_layout(
+        title='🔗 Matriz de Correlação entre Variáveis',
+        height=600,
+        xaxis_title='',
+        yaxis_title=''
+    )
+    return fig
+
 
 # ============================================================================
 # 8. SEGMENTAÇÃO - K-MEANS CLUSTERING
 # ============================================================================
-print("\n" + "="*80)
-print("🎯 SEGMENTAÇÃO DE CLIENTES - K-MEANS CLUSTERING")
-print("="*80)
-
-# Preparar dados para clustering
-df_cluster = df[['Idade', 'Renda_Anual', 'Numero_Cartoes', 
-                 'Possui_Conta_Adicional_Bin', 'Tempo_Cliente_Anos']].dropna()
-
-print(f"\n📊 Clientes com dados completos para clustering: {len(df_cluster):,}")
-
-# Padronizar os dados
-scaler = StandardScaler()
-df_scaled = scaler.fit_transform(df_cluster)
-
-# Método do cotovelo
-print("\n🔍 Determinando número ótimo de clusters...")
-inertias = []
-K_range = range(2, 11)
-
-for k in K_range:
-    kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-    kmeans.fit(df_scaled)
-    inertias.append(kmeans.inertia_)
-
-# Plotar método do cotovelo
-fig = go.Figure()
-fig.add_trace(go.Scatter(
-    x=list(K_range),
-    y=inertias,
-    mode='lines+markers',
-    marker=dict(size=10, color='rgb(55, 83, 109)'),
-    line=dict(color='rgb(55, 83, 109)', width=2)
-))
-
-fig.update_layout(
-    title='📈 Método do Cotovelo - Determinação do Número Ótimo de Clusters',
-    xaxis_title='Número de Clusters',
-    yaxis_title='Inércia (Within-Cluster Sum of Squares)',
-    height=500
-)
-fig.write_html('metodo_cotovelo.html')
-print("✓ Gráfico salvo: metodo_cotovelo.html")
-
-# Aplicar K-Means com 5 clusters
-n_clusters = 5
-kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-df_cluster['Segmento'] = kmeans.fit_predict(df_scaled)
-
-# Adicionar segmentos ao dataframe original
-df_with_segments = df.copy()
-df_with_segments.loc[df_cluster.index, 'Segmento'] = df_cluster['Segmento']
-
-print(f"\n✓ Segmentação concluída! {n_clusters} segmentos identificados.")
-print(f"\n📊 Distribuição de Clientes por Segmento:")
-segment_dist = df_cluster['Segmento'].value_counts().sort_index()
-for seg, count in segment_dist.items():
-    pct = (count / len(df_cluster)) * 100
-    print(f"  • Segmento {seg}: {count:,} clientes ({pct:.1f}%)")
+def matriz_cluster(df, variaveis=VARIAVEIS_CLUSTER, dtype='float64'):
+    """
+    Matriz (clientes x variáveis) em `dtype` das linhas completas e o índice
+    delas, alocada uma vez e preenchida coluna a coluna, sem o DataFrame
+    intermediário. Cada variável fica contígua, como em DataFrame.to_numpy().
+    """
+    completas = np.ones(len(df), dtype=bool)
+    for variavel in variaveis:
+        completas &= df[variavel].notna().to_numpy()
+    todas = completas.all()
+    matriz = np.empty((int(completas.sum()), len(variaveis)), dtype=dtype, order='F')
+    for j, variavel in enumerate(variaveis):
+        coluna = df[variavel].to_numpy()
+        matriz[:, j] = coluna if todas else coluna[completas]
+    return matriz, (df.index if todas else df.index[completas])
+
+
+def segmentar_clientes(df, variaveis=VARIAVEIS_CLUSTER, k_range=K_RANGE,
+                       n_clusters=N_CLUSTERS, random_state=RANDOM_STATE,
+                       dtype='float64', n_processos=None):
+    from sklearn.preprocessing import StandardScaler
+
+    # Preparar dados para clustering
+    matriz, indice = matriz_cluster(df, variaveis, dtype)
+
+    # Padronizar os dados (no lugar: a matriz já é uma cópia)
+    scaler = StandardScaler(copy=False)
+    df_scaled = scaler.fit_transform(matriz)
+
+    # Matriz publicada uma vez para os processos da varredura e da atribuição
+    with PoolMatriz(df_scaled, n_processos) as pool:
+        # Método do cotovelo: ajustes (k, semente) em paralelo
+        varredura = varrer_k(df_scaled, k_range, n_init=10, random_state=random_state, pool=pool)
+
+        # Reutilizar o ajuste vencedor do k escolhido (ou detectado no cotovelo)
+        n_clusters, kmeans, rotulos, distancias, automatico = escolher_modelo(
+            varredura, df_scaled, n_clusters, pool=pool)
+    # Só o Segmento das linhas completas; as variáveis continuam em `df`
+    df_cluster = pd.DataFrame({'Segmento': rotulos}, index=indice)
+
+    return {
+        'df_cluster': df_cluster,
+        'df_scaled': df_scaled,
+        'distancias': distancias,
+        'scaler': scaler,
+        'kmeans': kmeans,
+        'modelos': varredura['modelos'],
+        'variaveis': list(variaveis),
+        'k_range': varredura['k_range'],
+        'inertias': varredura['inertias'],
+        'n_clusters': n_clusters,
+        'k_automatico': automatico,
+    }
+
+
+def relatorio_segmentacao(segmentacao):
+    print("\n" + "="*80)
+    print("🎯 SEGMENTAÇÃO DE CLIENTES - K-MEANS CLUSTERING")
+    print("="*80)
+
+    df_cluster = segmentacao['df_cluster']
+    print(f"\n📊 Clientes com dados completos para clustering: {len(df_cluster):,}")
+    print("\n🔍 Determinando número ótimo de clusters...")
+
+    k_escolhido = segmentacao['n_clusters']
+    destino = agendar_figura('metodo_cotovelo.html', figura_cotovelo,
+                             segmentacao['k_range'], segmentacao['inertias'], k_escolhido)
+    if destino:
+        print(f"✓ Gráfico salvo: {destino}")
+
+    origem = 'detectado no cotovelo' if segmentacao['k_automatico'] else 'informado'
+    print(f"🎯 Número de clusters {origem}: k = {k_escolhido}")
+
+    print(f"\n✓ Segmentação concluída! {segmentacao['n_clusters']} segmentos identificados.")
+    print(f"\n📊 Distribuição de Clientes por Segmento:")
+    segment_dist = df_cluster['Segmento'].value_counts().sort_index()
+    for seg, count in segment_dist.items():
+        pct = (count / len(df_cluster)) * 100
+        print(f"  • Segmento {seg}: {count:,} clientes ({pct:.1f}%)")
+
+
+def figura_cotovelo(k_range, inertias, k_escolhido):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=k_range,
+        y=inertias,
+        mode='lines+markers',
+        marker=dict(size=10, color='rgb(55, 83, 109)'),
+        line=dict(color='rgb(55, 83, 109)', width=2)
+    ))
+    fig.add_trace(go.Scatter(
+        x=[k_escolhido],
+        y=[inertias[k_range.index(k_escolhido)]],
+        mode='markers',
+        marker=dict(size=16, color='rgb(219, 64, 82)', symbol='circle-open', line=dict(width=3)),
+        name=f'k = {k_escolhido}'
+    ))
+
+    fig.update_layout(
+        showlegend=False,
+        title='📈 Método do Cotovelo - Determinação do Número Ótimo de Clusters',
+        xaxis_title='Número de Clusters',
+        yaxis_title='Inércia (Within-Cluster Sum of Squares)',
+        height=500
+    )
+    return fig
+
+
+def calcular_avaliacao(segmentacao, tamanho_amostra=TAMANHO_AMOSTRA, n_amostras=N_AMOSTRAS,
+                       n_bootstrap=N_BOOTSTRAP, random_state=RANDOM_STATE, n_processos=None):
+    # Silhueta amostrada, Davies-Bouldin, Calinski-Harabasz e estabilidade de cada k
+    return avaliar_segmentacao(segmentacao, tamanho_amostra, n_amostras, n_bootstrap,
+                               random_state, n_processos)
+
 
 # ============================================================================
 # 9. VISUALIZAÇÃO DOS SEGMENTOS
 # ============================================================================
-print("\n" + "="*80)
-print("📊 VISUALIZAÇÃO DOS SEGMENTOS")
-print("="*80)
-
-# PCA para visualização 2D
-pca = PCA(n_components=2)
-df_pca = pca.fit_transform(df_scaled)
-df_cluster['PCA1'] = df_pca[:, 0]
-df_cluster['PCA2'] = df_pca[:, 1]
-
-fig = px.scatter(
-    df_cluster,
-    x='PCA1',
-    y='PCA2',
-    color='Segmento',
-    title='🎯 Visualização dos Segmentos (PCA 2D)',
-    labels={'PCA1': f'PC1 ({pca.explained_variance_ratio_[0]:.1%} variância)',
-            'PCA2': f'PC2 ({pca.explained_variance_ratio_[1]:.1%} variância)'},
-    color_continuous_scale='Viridis',
-    height=600
-)
-fig.update_traces(marker=dict(size=8, opacity=0.7))
-fig.write_html('segmentos_pca_2d.html')
-print("\n✓ Gráfico salvo: segmentos_pca_2d.html")
-
-# Visualização 3D
-fig = px.scatter_3d(
-    df_cluster,
-    x='Idade',
-    y='Renda_Anual',
-    z='Numero_Cartoes',
-    color='Segmento',
-    title='🎯 Visualização 3D dos Segmentos (Idade x Renda x Cartões)',
-    color_continuous_scale='Plasma',
-    height=700,
-    opacity=0.7
-)
-fig.update_traces(marker=dict(size=5))
-fig.write_html('segmentos_3d.html')
-print("✓ Gráfico salvo: segmentos_3d.html")
+def pca_em_blocos(matriz, n_componentes=2, tamanho_bloco=TAMANHO_BLOCO_PCA):
+    """
+    PCA pela matriz de covariância (variáveis x variáveis) acumulada em blocos
+    de linhas: uma passada, sem a cópia centrada da matriz. Os eixos têm o
+    sinal do sklearn (maior coordenada de cada eixo, em módulo, positiva).
+    """
+    n, d = matriz.shape
+    soma = np.zeros(d)
+    produtos = np.zeros((d, d))
+    for inicio in range(0, n, tamanho_bloco):
+        bloco = np.asarray(matriz[inicio:inicio + tamanho_bloco], dtype='float64')
+        soma += bloco.sum(axis=0)
+        produtos += bloco.T @ bloco
+    media = soma / n
+    autovalores, autovetores = np.linalg.eigh((produtos - n * np.outer(media, media)) / (n - 1))
+    ordem = np.argsort(autovalores)[::-1]
+    autovalores = np.clip(autovalores[ordem], 0, None)
+    componentes = autovetores[:, ordem].T
+    componentes *= np.sign(componentes[np.arange(d), np.abs(componentes).argmax(axis=1)])[:, None]
+    return {'componentes': componentes[:n_componentes], 'media': media,
+            'variancia': autovalores[:n_componentes] / autovalores.sum()}
+
+
+def calcular_pca(segmentacao, tamanho_bloco=TAMANHO_BLOCO_PCA):
+    """
+    Eixos, média e variância explicada da projeção PCA 2D (as coordenadas
+    são calculadas em graficos_segmentos).
+    """
+    # PCA para visualização 2D; em bases grandes, a covariância em blocos
+    matriz = segmentacao['df_scaled']
+    if len(matriz) > tamanho_bloco:
+        return pca_em_blocos(matriz, 2, tamanho_bloco)
+
+    from sklearn.decomposition import PCA
+
+    pca = PCA(n_components=2).fit(matriz)
+    return {'componentes': pca.components_.astype('float64'), 'media': pca.mean_.astype('float64'),
+            'variancia': pca.explained_variance_ratio_.astype('float64')}
+
+
+def projetar(matriz, projecao):
+    """Coordenadas de linhas padronizadas nos eixos da projeção: uma multiplicação de matrizes."""
+    componentes_t = projecao['componentes'].T
+    coordenadas = matriz @ componentes_t
+    coordenadas -= projecao['media'] @ componentes_t
+    return coordenadas
+
+
+def linhas_segmentadas(df, segmentacao, colunas):
+    """Colunas de `df` nas linhas segmentadas, com o Segmento (sem cópia se todas foram)."""
+    df_cluster = segmentacao['df_cluster']
+    linhas = df[colunas] if len(df_cluster) == len(df) else df.loc[df_cluster.index, colunas]
+    return linhas.assign(Segmento=df_cluster['Segmento'].to_numpy())
+
+
+def graficos_segmentos(df, segmentacao, projecao, modo_graficos='auto'):
+    print("\n" + "="*80)
+    print("📊 VISUALIZAÇÃO DOS SEGMENTOS")
+    print("="*80)
+
+    df_cluster = linhas_segmentadas(df, segmentacao, ['Idade', 'Renda_Anual', 'Numero_Cartoes'])
+    coordenadas = projetar(segmentacao['df_scaled'], projecao)
+    df_cluster['PCA1'] = coordenadas[:, 0]
+    df_cluster['PCA2'] = coordenadas[:, 1]
+
+    # Acima de LIMITE_PONTOS clientes, os pontos são agregados (ou amostrados)
+    modo = escolher_modo(len(df_cluster), modo_graficos)
+    destino = agendar_figura('segmentos_pca_2d.html', figura_segmentos_pca,
+                             df_cluster[['PCA1', 'PCA2', 'Segmento']], projecao['variancia'], modo)
+    print(f"\n✓ Gráfico salvo: {destino}")
+    if modo != 'exato':
+        print(f"   (modo {modo}: {len(df_cluster):,} clientes, limite do modo exato: {LIMITE_PONTOS:,} pontos)")
+
+    destino = agendar_figura('segmentos_3d.html', figura_segmentos_3d,
+                             df_cluster[['Idade', 'Renda_Anual', 'Numero_Cartoes', 'Segmento']], modo)
+    print(f"✓ Gráfico salvo: {destino}")
+
+
+def figura_segmentos_pca(df_cluster, variancia, modo):
+    fig, modo = dispersao(
+        df_cluster,
+        ['PCA1', 'PCA2'],
+        'Segmento',
+        modo=modo,
+        title='🎯 Visualização dos Segmentos (PCA 2D)',
+        labels={'PCA1': f'PC1 ({variancia[0]:.1%} variância)',
+                'PCA2': f'PC2 ({variancia[1]:.1%} variância)'},
+        color_continuous_scale='Viridis',
+        height=600
+    )
+    fig.update_traces(marker=dict(opacity=0.7) if modo == 'densidade' else dict(size=8, opacity=0.7))
+    return fig
+
+
+def figura_segmentos_3d(df_cluster, modo):
+    fig, modo = dispersao(
+        df_cluster,
+        ['Idade', 'Renda_Anual', 'Numero_Cartoes'],
+        'Segmento',
+        modo=modo,
+        title='🎯 Visualização 3D dos Segmentos (Idade x Renda x Cartões)',
+        color_continuous_scale='Plasma',
+        height=700,
+        opacity=0.7
+    )
+    if modo != 'densidade':
+        fig.update_traces(marker=dict(size=5))
+    return fig
+
 
 # ============================================================================
 # 10. PERFIL DETALHADO DOS SEGMENTOS
 # ============================================================================
-print("\n" + "="*80)
-print("📋 PERFIL DETALHADO DOS SEGMENTOS")
-print("="*80)
-
-segment_profile = df_cluster.groupby('Segmento').agg({
-    'Idade': ['mean', 'std'],
-    'Renda_Anual': ['mean', 'std'],
-    'Numero_Cartoes': ['mean'],
-    'Possui_Conta_Adicional_Bin': 'mean',
-    'Tempo_Cliente_Anos': 'mean'
-}).round(2)
-
-segment_profile.columns = ['Idade_Média', 'Idade_Desvio', 'Renda_Média', 'Renda_Desvio',
-                           'Cartões_Média', 'Pct_Conta_Adicional', 'Tempo_Médio_Anos']
-
-segment_profile['Num_Clientes'] = df_cluster['Segmento'].value_counts().sort_index()
-segment_profile['Pct_Total'] = (segment_profile['Num_Clientes'] / len(df_cluster) * 100).round(1)
-
-print("\n" + segment_profile.to_string())
-
-print("\n\n🎯 CARACTERIZAÇÃO DOS SEGMENTOS:\n")
-
-for seg in sorted(df_cluster['Segmento'].unique()):
-    seg_data = segment_profile.loc[seg]
-    
-    print(f"\n{'='*80}")
-    print(f"SEGMENTO {seg}")
-    print(f"{'='*80}")
-    print(f"👥 Tamanho: {seg_data['Num_Clientes']:,.0f} clientes ({seg_data['Pct_Total']:.1f}% do total)")
-    print(f"\n📊 Perfil Demográfico:")
-    print(f"   • Idade Média: {seg_data['Idade_Média']:.0f} anos (± {seg_data['Idade_Desvio']:.1f})")
-    print(f"   • Renda Média: R$ {seg_data['Renda_Média']:,.2f} (± R$ {seg_data['Renda_Desvio']:,.2f})")
-    print(f"   • Cartões por Cliente: {seg_data['Cartões_Média']:.1f} em média")
-    print(f"   • Conta Adicional: {seg_data['Pct_Conta_Adicional']*100:.1f}% possuem")
-    print(f"   • Tempo Médio como Cliente: {seg_data['Tempo_Médio_Anos']:.1f} anos")
-    
-    seg_geo = df_with_segments[df_with_segments['Segmento'] == seg]
-    top_estado = seg_geo['Estado'].mode()[0] if len(seg_geo) > 0 else 'N/A'
-    top_cidade = seg_geo['Cidade'].mode()[0] if len(seg_geo) > 0 else 'N/A'
-    print(f"\n🗺️ Localização:")
-    print(f"   • Estado predominante: {top_estado}")
-    print(f"   • Cidade predominante: {top_cidade}")
+def calcular_perfil(df, segmentacao, cubo, avaliacao=None, tamanho_bloco=None):
+    df_cluster = segmentacao['df_cluster']
+    por_segmento = cubo.agregar(['Segmento'])
+
+    segment_profile = pd.DataFrame({
+        'Idade_Média': por_segmento.media('Idade'),
+        'Idade_Desvio': por_segmento.desvio('Idade'),
+        'Renda_Média': por_segmento.media('Renda_Anual'),
+        'Renda_Desvio': por_segmento.desvio('Renda_Anual'),
+        'Cartões_Média': por_segmento.media('Numero_Cartoes'),
+        'Pct_Conta_Adicional': por_segmento.media('Possui_Conta_Adicional_Bin'),
+        'Tempo_Médio_Anos': por_segmento.media('Tempo_Cliente_Anos'),
+    }).round(2)
+    segment_profile.index = segment_profile.index.astype(df_cluster['Segmento'].dtype)
+
+    segment_profile['Num_Clientes'] = por_segmento.linhas.to_numpy()
+    segment_profile['Pct_Total'] = (segment_profile['Num_Clientes'] / len(df_cluster) * 100).round(1)
+    if avaliacao:
+        # Coesão de cada segmento do k escolhido, ao lado do tamanho
+        for coluna, valores in avaliacao['por_segmento'].items():
+            segment_profile[coluna] = valores.reindex(segment_profile.index).to_numpy()
+
+    # Adicionar segmentos ao dataframe original (cópia rasa: só a coluna nova
+    # é alocada; alinhada pelo índice, NaN nas linhas sem segmento)
+    df_with_segments = df.copy(deep=False)
+    df_with_segments['Segmento'] = df_cluster['Segmento'].astype('float64')
+
+    # Estados e cidades mais frequentes de cada segmento, a partir das
+    # células do cubo (empate: primeiro na ordem das categorias, como Series.mode)
+    top_localizacao = {}
+    for coluna in ('Estado', 'Cidade'):
+        contagens = cubo.agregar(['Segmento', coluna]).linhas
+        top_localizacao[coluna] = top_categorias(
+            contagens.index.get_level_values('Segmento'),
+            contagens.index.get_level_values(coluna), n=TOP_LOCALIZACAO, pesos=contagens.to_numpy())
+    principais = {coluna: top.xs(1, level='posicao')['valor'] for coluna, top in top_localizacao.items()}
+    localizacao = {int(seg): (estado, principais['Cidade'][seg])
+                   for seg, estado in principais['Estado'].items()}
+
+    # Correlações dentro de cada segmento, com o mesmo acumulador da matriz geral
+    comomentos = ComomentosGrupo(VARIAVEIS_CORRELACAO)
+    linhas = linhas_segmentadas(df, segmentacao, VARIAVEIS_CORRELACAO)
+    comomentos.atualizar(linhas['Segmento'], linhas, tamanho_bloco)
+    correlacoes = {int(seg): pares for seg, pares in comomentos.pares(1).items()}
+
+    return {
+        'segment_profile': segment_profile,
+        'df_with_segments': df_with_segments,
+        'localizacao': localizacao,
+        'top_localizacao': top_localizacao,
+        'correlacoes': correlacoes,
+        'avaliacao': avaliacao,
+    }
+
 
 # ============================================================================
 # 11. SUMÁRIO EXECUTIVO
 # ============================================================================
-print("\n\n" + "="*80)
-print("🎯 SUMÁRIO EXECUTIVO - SEGMENTAÇÃO DE CLIENTES PRICELESS BANK")
-print("="*80)
+def sumario_executivo(df, segmentacao, perfil):
+    df_cluster = segmentacao['df_cluster']
+    segment_profile = perfil['segment_profile']
+
+    print("\n\n" + "="*80)
+    print("🎯 SUMÁRIO EXECUTIVO - SEGMENTAÇÃO DE CLIENTES PRICELESS BANK")
+    print("="*80)
+
+    print(f"\n📊 VISÃO GERAL:")
+    print(f"   • Total de Clientes Analisados: {len(df_cluster):,}")
+    print(f"   • Número de Segmentos Identificados: {segmentacao['n_clusters']}")
+    print(f"   • Taxa de Dados Completos: {(len(df_cluster)/len(df)*100):.1f}%")
 
-print(f"\n📊 VISÃO GERAL:")
-print(f"   • Total de Clientes Analisados: {len(df_cluster):,}")
-print(f"   • Número de Segmentos Identificados: {n_clusters}")
-print(f"   • Taxa de Dados Completos: {(len(df_cluster)/len(df)*100):.1f}%")
+    print(f"\n💼 PRINCIPAIS ACHADOS:")
+    seg_maior_renda = segment_profile['Renda_Média'].idxmax()
+    print(f"   • Segmento de Maior Renda: Segmento {seg_maior_renda} (R$ {segment_profile.loc[seg_maior_renda, 'Renda_Média']:,.2f})")
 
-print(f"\n💼 PRINCIPAIS ACHADOS:")
-seg_maior_renda = segment_profile['Renda_Média'].idxmax()
-print(f"   • Segmento de Maior Renda: Segmento {seg_maior_renda} (R$ {segment_profile.loc[seg_maior_renda, 'Renda_Média']:,.2f})")
+    seg_maior_base = segment_profile['Num_Clientes'].idxmax()
+    print(f"   • Segmento com Maior Base: Segmento {seg_maior_base} ({segment_profile.loc[seg_maior_base, 'Num_Clientes']:,.0f} clientes)")
 
-seg_maior_base = segment_profile['Num_Clientes'].idxmax()
-print(f"   • Segmento com Maior Base: Segmento {seg_maior_base} ({segment_profile.loc[seg_maior_base, 'Num_Clientes']:,.0f} clientes)")
+    seg_mais_jovem = segment_profile['Idade_Média'].idxmin()
+    print(f"   • Segmento Mais Jovem: Segmento {seg_mais_jovem} ({segment_profile.loc[seg_mais_jovem, 'Idade_Média']:.0f} anos)")
 
-seg_mais_jovem = segment_profile['Idade_Média'].idxmin()
-print(f"   • Segmento Mais Jovem: Segmento {seg_mais_jovem} ({segment_profile.loc[seg_mais_jovem, 'Idade_Média']:.0f} anos)")
+    seg_mais_cartoes = segment_profile['Cartões_Média'].idxmax()
+    print(f"   • Segmento com Mais Cartões: Segmento {seg_mais_cartoes} ({segment_profile.loc[seg_mais_cartoes, 'Cartões_Média']:.1f} cartões/cliente)")
 
-seg_mais_cartoes = segment_profile['Cartões_Média'].idxmax()
-print(f"   • Segmento com Mais Cartões: Segmento {seg_mais_cartoes} ({segment_profile.loc[seg_mais_cartoes, 'Cartões_Média']:.1f} cartões/cliente)")
+    print(f"\n🎯 OPORTUNIDADES IDENTIFICADAS:")
+    print(f"   1. Cross-sell de cartões para segmentos com baixa penetração")
+    print(f"   2. Programas de retenção para segmentos com menor tempo médio")
+    print(f"   3. Produtos premium para segmentos de alta renda")
+    print(f"   4. Ofertas regionalizadas baseadas na concentração geográfica")
+    print(f"   5. Estratégias digitais para segmentos mais jovens")
 
-print(f"\n🎯 OPORTUNIDADES IDENTIFICADAS:")
-print(f"   1. Cross-sell de cartões para segmentos com baixa penetração")
-print(f"   2. Programas de retenção para segmentos com menor tempo médio")
-print(f"   3. Produtos premium para segmentos de alta renda")
-print(f"   4. Ofertas regionalizadas baseadas na concentração geográfica")
-print(f"   5. Estratégias digitais para segmentos mais jovens")
 
 # ============================================================================
 # 12. EXPORTAR RESULTADOS
 # ============================================================================
-print("\n" + "="*80)
-print("💾 EXPORTANDO RESULTADOS")
-print("="*80)
-
-output_file = 'clientes_segmentados.csv'
-df_with_segments.to_csv(output_file, index=False, encoding='utf-8-sig')
-print(f"\n✓ Arquivo exportado: {output_file}")
-
-profile_file = 'perfil_segmentos.csv'
-segment_profile.to_csv(profile_file, encoding='utf-8-sig')
-print(f"✓ Perfil dos segmentos exportado: {profile_file}")
-
-print("\n" + "="*80)
-print("✅ ANÁLISE COMPLETA!")
-print("="*80)
-print("\n📂 Arquivos gerados:")
-print("   • analise_idade.html")
-print("   • analise_renda.html")
-print("   • analise_localizacao.html")
-print("   • analise_correlacao.html")
-print("   • metodo_cotovelo.html")
-print("   • segmentos_pca_2d.html")
-print("   • segmentos_3d.html")
-print("   • clientes_segmentados.csv")
-print("   • perfil_segmentos.csv")
-print("\n🌐 Abra os arquivos .html no navegador para visualizar os gráficos interativos!")
-print("="*80)
+def exportar_resultados(perfil, output_file='clientes_segmentados.csv',
+                        profile_file='perfil_segmentos.csv', evaluation_file='avaliacao_segmentos.csv'):
+    perfil['df_with_segments'].to_csv(output_file, index=False, encoding='utf-8-sig')
+    perfil['segment_profile'].to_csv(profile_file, encoding='utf-8-sig')
+    perfil['avaliacao']['por_k'].to_csv(evaluation_file, encoding='utf-8-sig')
+    return [output_file, profile_file, evaluation_file]
+
+
+def modelo_de_treino(segmentacao, projecao=None):
+    # Scaler, centróides e configuração de features para pontuar clientes novos
+    return ModeloSegmentacao.de_treino(
+        segmentacao['scaler'], segmentacao['kmeans'].cluster_centers_,
+        segmentacao['variaveis'], config_features(DATA_REFERENCIA, FAIXAS, CONTA_ADICIONAL),
+        projecao=projecao,
+        inercia=float(segmentacao['kmeans'].inertia_),
+        n_treino=len(segmentacao['df_cluster']))
+
+
+def exportar_modelo(segmentacao, projecao=None, diretorio=DIRETORIO_MODELOS):
+    return modelo_de_treino(segmentacao, projecao).salvar(diretorio)
+
+
+def relatorio_exportacao(arquivos, caminho_modelo):
+    print("\n" + "="*80)
+    print("💾 EXPORTANDO RESULTADOS")
+    print("="*80)
+
+    output_file, profile_file, evaluation_file = arquivos
+    print(f"\n✓ Arquivo exportado: {output_file}")
+    print(f"✓ Perfil dos segmentos exportado: {profile_file}")
+    print(f"✓ Qualidade por k exportada: {evaluation_file}")
+    print(f"✓ Modelo de segmentação exportado: {caminho_modelo}")
+
+
+# ============================================================================
+# PIPELINE EM ETAPAS
+# ============================================================================
+def montar_etapas(caminho=ARQUIVO_CLIENTES, cache=None, n_clusters=N_CLUSTERS,
+                  k_range=K_RANGE, random_state=RANDOM_STATE, n_processos=None,
+                  output_file='clientes_segmentados.csv',
+                  profile_file='perfil_segmentos.csv', evaluation_file='avaliacao_segmentos.csv',
+                  economizar_memoria=False):
+    """
+    Monta as etapas nomeadas do pipeline, na ordem das seções do script.
+
+    Nenhuma etapa é executada aqui: cada uma é calculada (ou lida do cache)
+    apenas quando seu `resultado()` é pedido. Com `economizar_memoria`, o
+    k-means usa float32 e as correlações são acumuladas em blocos (ver
+    orcamento_memoria.py).
+    """
+    cache = cache if cache is not None else CacheEtapas()
+    tamanho_bloco = TAMANHO_BLOCO if economizar_memoria else None
+    etapas = {}
+    etapas['carregar'] = Etapa(cache, 'carregar', carregar_dados,
+                               parametros={'caminho': caminho},
+                               entradas=[caminho])
+    etapas['features'] = Etapa(cache, 'features', criar_features,
+                               dependencias=[etapas['carregar']],
+                               parametros={'data_referencia': DATA_REFERENCIA,
+                                           'faixas': FAIXAS,
+                                           'conta_adicional': CONTA_ADICIONAL})
+    etapas['correlacao'] = Etapa(cache, 'correlacao', calcular_correlacao,
+                                 dependencias=[etapas['features']],
+                                 parametros={'variaveis': VARIAVEIS_CORRELACAO,
+                                             'tamanho_bloco': tamanho_bloco})
+    etapas['kmeans'] = Etapa(cache, 'kmeans', segmentar_clientes,
+                             dependencias=[etapas['features']],
+                             parametros={'variaveis': VARIAVEIS_CLUSTER,
+                                         'k_range': list(k_range),
+                                         'n_clusters': n_clusters,
+                                         'random_state': random_state,
+                                         'dtype': 'float32' if economizar_memoria else 'float64'},
+                             opcoes={'n_processos': n_processos})
+    etapas['avaliacao'] = Etapa(cache, 'avaliacao', calcular_avaliacao,
+                                dependencias=[etapas['kmeans']],
+                                parametros={'tamanho_amostra': TAMANHO_AMOSTRA,
+                                            'n_amostras': N_AMOSTRAS,
+                                            'n_bootstrap': N_BOOTSTRAP,
+                                            'random_state': random_state},
+                                opcoes={'n_processos': n_processos})
+    etapas['cubo'] = Etapa(cache, 'cubo', calcular_cubo,
+                           dependencias=[etapas['features'], etapas['kmeans']],
+                           parametros={'dimensoes': DIMENSOES_CUBO,
+                                       'medidas': VARIAVEIS_CLUSTER})
+    etapas['quantis'] = Etapa(cache, 'quantis', calcular_quantis,
+                              dependencias=[etapas['features']],
+                              parametros={'medidas': MEDIDAS_QUANTIS, 'erro': ERRO_QUANTIS})
+    etapas['geografia'] = Etapa(cache, 'geografia', calcular_geografia,
+                                dependencias=[etapas['features']],
+                                parametros={'colunas': COLUNAS_GEOGRAFIA})
+    etapas['demografia'] = Etapa(cache, 'demografia', calcular_demografia,
+                                 dependencias=[etapas['cubo'], etapas['quantis'], etapas['geografia']])
+    etapas['pca'] = Etapa(cache, 'pca', calcular_pca,
+                          dependencias=[etapas['kmeans']],
+                          parametros={'tamanho_bloco': TAMANHO_BLOCO_PCA})
+    etapas['perfil'] = Etapa(cache, 'perfil', calcular_perfil,
+                             dependencias=[etapas['features'], etapas['kmeans'],
+                                           etapas['cubo'], etapas['avaliacao']],
+                             parametros={'tamanho_bloco': tamanho_bloco})
+    etapas['exportar'] = Etapa(cache, 'exportar', exportar_resultados,
+                               dependencias=[etapas['perfil']],
+                               parametros={'output_file': output_file,
+                                           'profile_file': profile_file,
+                                           'evaluation_file': evaluation_file},
+                               saidas=[output_file, profile_file, evaluation_file])
+    return etapas
+
+
+def etapas_relatorio(etapas, graficos=True):
+    """Etapas cujos resultados os relatórios usam (a PCA só com gráficos)."""
+    nomes = ['carregar', 'features', 'demografia', 'correlacao', 'kmeans', 'perfil', 'exportar']
+    return [etapas[nome] for nome in nomes + (['pca'] if graficos else [])]
+
+
+def executar_pipeline(caminho=ARQUIVO_CLIENTES, cache=None, modo_graficos='auto',
+                      modo_relatorio='compartilhado', processos_graficos=None, etapas=None,
+                      n_threads=None, liberar=False, **opcoes):
+    """
+    Executa todas as etapas e gera os relatórios e gráficos. As etapas
+    independentes são calculadas ao mesmo tempo em `n_threads` threads
+    (None: uma por núcleo; 1: sob demanda, em sequência) e os gráficos são
+    montados e gravados em um pool de `processos_graficos` processos (None:
+    um por núcleo) enquanto as etapas seguintes e as exportações rodam.
+    `etapas` já montadas (e talvez já calculadas) podem ser reaproveitadas.
+    Com `liberar`, cada etapa sai da memória depois do último consumo.
+    """
+    etapas = etapas or montar_etapas(caminho, cache=cache, **opcoes)
+    relatorio_html.configurar(modo_relatorio, titulo='Segmentação de Clientes - Priceless Bank',
+                              arquivo_painel='relatorio_segmentacao.html',
+                              n_processos=processos_graficos)
+    with AgendadorEtapas(etapas_relatorio(etapas, relatorio_html.graficos_ativos()), n_threads, liberar):
+        arquivos_html = _relatorios(etapas, modo_graficos)
+
+    print("\n" + "="*80)
+    print("✅ ANÁLISE COMPLETA!")
+    print("="*80)
+    print("\n📂 Arquivos gerados:")
+    for arquivo in arquivos_html:
+        print(f"   • {arquivo}")
+    print("   • clientes_segmentados.csv")
+    print("   • perfil_segmentos.csv")
+    print("   • avaliacao_segmentos.csv")
+    print(f"   • {DIRETORIO_MODELOS}/ (modelo para pontuar_clientes.py)")
+    if arquivos_html:
+        print("\n🌐 Abra os arquivos .html no navegador para visualizar os gráficos interativos!")
+    print("="*80)
+    return etapas
+
+
+def _relatorios(etapas, modo_graficos):
+    # Os relatórios seguem a ordem das seções; cada resultado() espera a sua etapa
+    relatorio_dados(etapas['carregar'].resultado())
+
+    df = etapas['features'].resultado()
+    relatorio_features(df)
+
+    demografia = etapas['demografia'].resultado()
+    relatorio_idade(df, demografia)
+    relatorio_renda(df, demografia)
+    relatorio_localizacao(demografia)
+
+    relatorio_correlacao(etapas['correlacao'].resultado())
+
+    segmentacao = etapas['kmeans'].resultado()
+    relatorio_segmentacao(segmentacao)
+
+    # A projeção PCA só serve aos gráficos: sem eles, a etapa nem é calculada
+    # (e o modelo é exportado sem ela)
+    projecao = None
+    if relatorio_html.graficos_ativos():
+        projecao = etapas['pca'].resultado()
+        graficos_segmentos(df, segmentacao, projecao, modo_graficos)
+
+    perfil = etapas['perfil'].resultado()
+    relatorio_perfil(perfil)
+
+    sumario_executivo(df, segmentacao, perfil)
+
+    arquivos = etapas['exportar'].resultado()
+    with instrumentacao.secao('exportar_modelo', categoria='exportar'):
+        caminho_modelo = exportar_modelo(segmentacao, projecao)
+    relatorio_exportacao(arquivos, caminho_modelo)
+    return relatorio_html.finalizar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Segmentação de clientes - Priceless Bank')
+    parser.add_argument('--arquivo', default=ARQUIVO_CLIENTES,
+                        help='CSV da base de clientes')
+    parser.add_argument('--dir-cache', default=DIRETORIO_CACHE,
+                        help='diretório do cache de etapas')
+    parser.add_argument('--sem-cache', action='store_true',
+                        help='recalcula todas as etapas sem ler nem gravar o cache')
+    parser.add_argument('--limpar-cache', action='store_true',
+                        help='apaga o cache de etapas antes de executar')
+    parser.add_argument('--k', type=int, default=N_CLUSTERS, choices=K_RANGE, metavar='K',
+                        help=f'número de segmentos, de {K_RANGE.start} a {K_RANGE.stop - 1} '
+                             '(padrão: detectado pelo cotovelo)')
+    parser.add_argument('--processos', type=int, default=None,
+                        help='processos da varredura de k e da atribuição dos segmentos (padrão: um por núcleo)')
+    parser.add_argument('--graficos', choices=MODOS, default='auto',
+                        help='dispersões exatas, agregadas em grade (densidade) ou amostradas '
+                             f'(padrão: exatas até {LIMITE_PONTOS:,} clientes)')
+    parser.add_argument('--relatorio', choices=MODOS_RELATORIO, default='compartilhado',
+                        help='um HTML por gráfico com plotly.js compartilhado (padrão), com plotly.js '
+                             'embutido em cada um (independente), painel único, painel em .html.gz (pacote) '
+                             'ou nenhum gráfico')
+    parser.add_argument('--processos-graficos', type=int, default=None,
+                        help='processos que montam e gravam os gráficos (padrão: um por núcleo)')
+    parser.add_argument('--sem-graficos', action='store_true',
+                        help='só relatórios em texto, CSVs e modelo, sem importar o plotly '
+                             '(o mesmo que --relatorio nenhum)')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='threads que calculam as etapas independentes ao mesmo tempo '
+                             '(padrão: uma por núcleo; 1: em sequência)')
+    parser.add_argument('--memoria-maxima', type=tamanho_memoria, default=None, metavar='TAMANHO',
+                        help='orçamento de memória (ex.: 800M, 4G): etapas em sequência, k-means em '
+                             'float32 e intermediários liberados logo após o uso; falha antes de ler '
+                             'a base se a estimativa passar do orçamento')
+    parser.add_argument('--instrumentacao', choices=MODOS_INSTRUMENTACAO, default='leve',
+                        help=f'medições por seção gravadas em {ARQUIVO_EXECUCAO} (padrão: leve; '
+                             'detalhada inclui o pico de memória de cada seção)')
+    parser.add_argument('--trace', action='store_true',
+                        help='grava também o trace das seções (formato do Chrome/Perfetto)')
+    args = parser.parse_args()
+    if args.sem_graficos:
+        args.relatorio = 'nenhum'
+
+    economizar_memoria = args.memoria_maxima is not None
+    if economizar_memoria:
+        # Com orçamento, nada roda em paralelo a menos que seja pedido
+        args.threads = args.threads or 1
+        args.processos = args.processos or 1
+        args.processos_graficos = args.processos_graficos or 1
+        processos = sum(n for n in (args.processos, args.processos_graficos) if n > 1)
+        try:
+            clientes, estimativa = verificar_orcamento(args.memoria_maxima, 'segmentacao',
+                                                       args.arquivo, processos)
+        except MemoryError as erro:
+            print(f"❌ {erro}")
+            sys.exit(1)
+        relatorio_orcamento(args.memoria_maxima, clientes, estimativa)
+
+    medicoes = instrumentacao.configurar(args.instrumentacao, nome='analise_segmentacao')
+    cache = CacheEtapas(args.dir_cache, ativo=not args.sem_cache)
+    if args.limpar_cache:
+        cache.limpar()
+    with instrumentacao.secao('analise_segmentacao'):
+        executar_pipeline(args.arquivo, cache=cache, modo_graficos=args.graficos,
+                          modo_relatorio=args.relatorio, processos_graficos=args.processos_graficos,
+                          n_threads=args.threads, liberar=economizar_memoria, n_clusters=args.k,
+                          n_processos=args.processos, economizar_memoria=economizar_memoria)
+    if economizar_memoria:
+        relatorio_pico(args.memoria_maxima)
+    arquivos_execucao = medicoes.gravar(ARQUIVO_EXECUCAO,
+                                        trace=args.trace and ARQUIVO_EXECUCAO.replace('.json', '.trace.json'))
+    if arquivos_execucao:
+        print("\n📈 Relatório de execução:")
+        for arquivo in arquivos_execucao:
+            print(f"   • {arquivo}")
+
+
+if __name__ == '__main__':
+    main()
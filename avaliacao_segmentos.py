@@ -0,0 +1,262 @@
+"""
+Avaliação da Segmentação
+Priceless Bank - Mastercard Challenge 2025
+
+Métricas de qualidade do K-Means para cada k da varredura, com custo
+limitado mesmo em bases grandes (a silhueta exata é O(n²)):
+
+- silhueta em `n_amostras` amostras de `tamanho_amostra` clientes,
+  estratificadas pelo segmento escolhido (alocação proporcional, com ao
+  menos dois clientes por segmento): média entre as amostras e IC 95% dessa
+  média (aproximação normal). Se a base cabe na amostra, a silhueta é exata.
+  As distâncias entre os clientes da amostra não dependem de k: são
+  calculadas uma vez por bloco de linhas e somadas por segmento de todos os
+  k de uma vez (uma multiplicação pelas indicadoras dos segmentos);
+- Davies-Bouldin e Calinski-Harabasz exatos, com uma passada em blocos de
+  linhas por k (contagem, soma e soma dos quadrados das distâncias ao
+  centróide de cada segmento). Os centróides são os do ajuste, que na
+  convergência são as médias dos segmentos. No k escolhido, as distâncias
+  da atribuição (varredura_k.atribuir) são reaproveitadas;
+- estabilidade: `n_bootstrap` reamostragens com reposição de uma amostra,
+  cada uma ajustada com uma semente própria e comparada ao ajuste da
+  varredura pelo índice de Rand ajustado (ARI) na amostra original
+  (1: mesma partição; perto de 0: partição ao acaso).
+
+As tarefas de todos os k (amostras, blocos e reamostragens) são
+distribuídas juntas entre os processos anexados à matriz padronizada
+(varredura_k.PoolMatriz).
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from varredura_k import TAMANHO_BLOCO_ATRIBUICAO, PoolMatriz, atribuir_lote
+
+TAMANHO_AMOSTRA = 4_000
+N_AMOSTRAS = 10
+N_BOOTSTRAP = 10
+MINIMO_POR_SEGMENTO = 2
+TAMANHO_BLOCO_SILHUETA = 500
+Z_95 = 1.959964
+
+
+def amostra_estratificada(rotulos, tamanho, rng, ordem=None):
+    """
+    Índices (em ordem) de uma amostra de cerca de `tamanho` linhas com a
+    proporção de cada segmento de `rotulos`. `ordem` (argsort estável dos
+    rótulos) pode ser reaproveitada entre amostras.
+    """
+    n = len(rotulos)
+    if tamanho >= n:
+        return np.arange(n)
+    ordem = np.argsort(rotulos, kind='stable') if ordem is None else ordem
+    contagens = np.bincount(rotulos)
+    cotas = np.minimum(contagens, np.maximum(np.round(contagens * tamanho / n).astype('int64'),
+                                             MINIMO_POR_SEGMENTO))
+    inicios = np.cumsum(contagens) - contagens
+    partes = [ordem[inicio + rng.choice(contagem, cota, replace=False)]
+              for inicio, contagem, cota in zip(inicios, contagens, cotas) if cota]
+    return np.sort(np.concatenate(partes))
+
+
+def somas_segmentos(rotulos, distancias, k):
+    """Contagem, soma e soma dos quadrados das distâncias ao centróide por segmento (3 x k)."""
+    distancias = np.asarray(distancias, dtype='float64')
+    return np.stack([np.bincount(rotulos, minlength=k).astype('float64'),
+                     np.bincount(rotulos, distancias, k),
+                     np.bincount(rotulos, distancias ** 2, k)])
+
+
+def davies_bouldin(somas, centroides):
+    contagens, soma_distancias, _ = somas
+    ocupados = contagens > 0
+    if ocupados.sum() < 2:
+        return np.nan
+    dispersao = soma_distancias[ocupados] / contagens[ocupados]
+    centroides = np.asarray(centroides, dtype='float64')[ocupados]
+    separacao = np.sqrt(((centroides[:, None, :] - centroides[None, :, :]) ** 2).sum(axis=2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        razao = (dispersao[:, None] + dispersao[None, :]) / separacao
+    np.fill_diagonal(razao, -np.inf)
+    return float(razao.max(axis=1).mean())
+
+
+def calinski_harabasz(somas, centroides, media):
+    contagens, _, soma_quadrados = somas
+    n, k = contagens.sum(), int((contagens > 0).sum())
+    dentro = soma_quadrados.sum()
+    if k < 2 or n <= k or dentro == 0:
+        return np.nan
+    entre = (contagens * ((np.asarray(centroides, dtype='float64') - media) ** 2).sum(axis=1)).sum()
+    return float(entre * (n - k) / (dentro * (k - 1)))
+
+
+def silhueta_amostras(somas, rotulos):
+    """
+    Silhueta de cada ponto a partir de `somas` (pontos x segmentos: soma das
+    distâncias do ponto aos pontos de cada segmento), como em sklearn.
+    """
+    contagens = np.bincount(rotulos, minlength=somas.shape[1])
+    linhas = np.arange(len(rotulos))
+    vizinhos = contagens[rotulos] - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = somas[linhas, rotulos] / np.maximum(vizinhos, 1)
+        medias = np.where(contagens > 0, somas / contagens, np.inf)
+        medias[linhas, rotulos] = np.inf
+        b = medias.min(axis=1)
+        valores = np.nan_to_num((b - a) / np.maximum(a, b))
+    valores[vizinhos == 0] = 0.0
+    return valores
+
+
+# Tarefas dos processos: recebem a matriz padronizada (compartilhada) primeiro
+def _executar(matriz, funcao, *argumentos):
+    return funcao(matriz, *argumentos)
+
+
+def _silhuetas(matriz, indices, modelos):
+    from sklearn.metrics.pairwise import euclidean_distances
+
+    amostra = matriz[indices]
+    m = len(amostra)
+    rotulos = [modelo.predict(amostra) for modelo in modelos]
+    # Indicadoras dos segmentos de todos os k lado a lado
+    deslocamentos = np.cumsum([0] + [modelo.n_clusters for modelo in modelos])
+    indicadoras = np.zeros((m, deslocamentos[-1]))
+    for r, deslocamento in zip(rotulos, deslocamentos):
+        indicadoras[np.arange(m), deslocamento + r] = 1.0
+    somas = np.empty_like(indicadoras)
+    for inicio in range(0, m, TAMANHO_BLOCO_SILHUETA):
+        distancias = euclidean_distances(amostra[inicio:inicio + TAMANHO_BLOCO_SILHUETA], amostra)
+        distancias[np.arange(len(distancias)), np.arange(inicio, inicio + len(distancias))] = 0.0
+        somas[inicio:inicio + len(distancias)] = distancias @ indicadoras
+
+    resultados = []
+    for modelo, r, deslocamento in zip(modelos, rotulos, deslocamentos):
+        k = modelo.n_clusters
+        if not 2 <= len(np.unique(r)) < m:
+            resultados.append((np.nan, np.zeros(k), np.zeros(k)))
+            continue
+        valores = silhueta_amostras(somas[:, deslocamento:deslocamento + k], r)
+        resultados.append((float(valores.mean()), np.bincount(r, valores, k), np.bincount(r, minlength=k)))
+    return resultados
+
+
+def _somas_bloco(matriz, inicio, fim, modelo):
+    rotulos, distancias = atribuir_lote(matriz[inicio:fim], modelo)
+    return somas_segmentos(rotulos, distancias, modelo.n_clusters)
+
+
+def _estabilidade(matriz, indices, modelo, semente):
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import adjusted_rand_score
+
+    amostra = matriz[indices]
+    reamostra = amostra[np.random.default_rng(semente).integers(len(amostra), size=len(amostra))]
+    ajuste = KMeans(n_clusters=modelo.n_clusters, n_init=1, random_state=semente).fit(reamostra)
+    return float(adjusted_rand_score(modelo.predict(amostra), ajuste.predict(amostra)))
+
+
+def _sem_rotulos(modelo):
+    # Cada tarefa recebe o modelo por pickling: sem os rótulos da base inteira
+    if not hasattr(modelo, 'labels_'):
+        return modelo
+    modelo = copy.copy(modelo)
+    del modelo.labels_
+    return modelo
+
+
+def _intervalo_media(valores):
+    valores = np.asarray(valores, dtype='float64')
+    valores = valores[~np.isnan(valores)]
+    if len(valores) == 0:
+        return np.nan, np.nan, np.nan
+    media = valores.mean()
+    meia_largura = Z_95 * valores.std(ddof=1) / np.sqrt(len(valores)) if len(valores) > 1 else 0.0
+    return media, media - meia_largura, media + meia_largura
+
+
+def avaliar_segmentacao(segmentacao, tamanho_amostra=TAMANHO_AMOSTRA, n_amostras=N_AMOSTRAS,
+                        n_bootstrap=N_BOOTSTRAP, random_state=42, n_processos=None,
+                        tamanho_bloco=TAMANHO_BLOCO_ATRIBUICAO):
+    """
+    Métricas de cada k da varredura (`por_k`) e silhueta e distância média
+    ao centróide de cada segmento do k escolhido (`por_segmento`).
+    """
+    matriz = segmentacao['df_scaled']
+    rotulos = segmentacao['df_cluster']['Segmento'].to_numpy()
+    n_clusters = segmentacao['n_clusters']
+    modelos = {k: _sem_rotulos(modelo) for k, modelo in segmentacao['modelos'].items()}
+    n = len(matriz)
+
+    rng = np.random.default_rng(random_state)
+    exata = n <= tamanho_amostra
+    ordem = None if exata else np.argsort(rotulos, kind='stable')
+    amostras = [amostra_estratificada(rotulos, tamanho_amostra, rng, ordem)
+                for _ in range(1 if exata else n_amostras)]
+    sementes = [int(s) for s in rng.integers(np.iinfo(np.int32).max, size=n_bootstrap)]
+    blocos = [(inicio, min(inicio + tamanho_bloco, n)) for inicio in range(0, n, tamanho_bloco)]
+
+    # Uma tarefa de silhueta por amostra, com todos os k
+    tarefas = [(None, _silhuetas, indices, list(modelos.values())) for indices in amostras]
+    for k, modelo in modelos.items():
+        tarefas += [(k, _estabilidade, amostras[0], modelo, semente) for semente in sementes]
+        if k != n_clusters:
+            tarefas += [(k, _somas_bloco, inicio, fim, modelo) for inicio, fim in blocos]
+    with PoolMatriz(matriz, n_processos) as pool:
+        resultados = pool.executar(_executar, [tarefa[1:] for tarefa in tarefas])
+
+    silhuetas, estabilidades = {}, {}
+    somas = {n_clusters: somas_segmentos(rotulos, segmentacao['distancias'], n_clusters)}
+    por_segmento = np.zeros((2, n_clusters))
+    for (k, funcao, *_), resultado in zip(tarefas, resultados):
+        if funcao is _silhuetas:
+            for k, (media_amostra, *segmentos) in zip(modelos, resultado):
+                silhuetas.setdefault(k, []).append(media_amostra)
+                if k == n_clusters:
+                    por_segmento += segmentos
+        elif funcao is _estabilidade:
+            estabilidades.setdefault(k, []).append(resultado)
+        else:
+            somas[k] = somas[k] + resultado if k in somas else resultado
+
+    media = matriz.mean(axis=0, dtype='float64')
+    linhas = []
+    for k, inercia in zip(segmentacao['k_range'], segmentacao['inertias']):
+        silhueta, silhueta_inf, silhueta_sup = _intervalo_media(silhuetas[k])
+        centroides = modelos[k].cluster_centers_
+        linhas.append({
+            'k': k,
+            'Inércia': inercia,
+            'Silhueta': silhueta,
+            'Silhueta_IC_Inf': silhueta_inf,
+            'Silhueta_IC_Sup': silhueta_sup,
+            'Davies_Bouldin': davies_bouldin(somas[k], centroides),
+            'Calinski_Harabasz': calinski_harabasz(somas[k], centroides, media),
+            'Estabilidade_ARI': np.mean(estabilidades[k]),
+            'Estabilidade_P2.5': np.percentile(estabilidades[k], 2.5),
+            'Estabilidade_P97.5': np.percentile(estabilidades[k], 97.5),
+        })
+    por_k = pd.DataFrame(linhas).set_index('k').round(4)
+    por_k[['Inércia', 'Calinski_Harabasz']] = por_k[['Inércia', 'Calinski_Harabasz']].round(2)
+
+    contagens, soma_distancias, _ = somas[n_clusters]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        por_segmento = pd.DataFrame({
+            'Silhueta_Média': por_segmento[0] / por_segmento[1],
+            'Distância_Média_Centróide': soma_distancias / contagens,
+        }).round(3)
+    por_segmento.index = por_segmento.index.astype(rotulos.dtype)
+    por_segmento.index.name = 'Segmento'
+
+    return {
+        'por_k': por_k,
+        'por_segmento': por_segmento,
+        'n_clusters': n_clusters,
+        'exata': exata,
+        'tamanho_amostra': len(amostras[0]),
+        'n_amostras': len(amostras),
+        'n_bootstrap': n_bootstrap,
+    }
@@ -0,0 +1,244 @@
+"""
+Base Colunar Tipada
+Priceless Bank - Mastercard Challenge 2025
+
+Converte Base_clientes.csv e Base_cartoes.csv, uma única vez, em um
+diretório de colunas .npy com tipos compactos (categorias como códigos
+inteiros, Numero_Cartoes int8, valores monetários float32 e datas já
+convertidas para datetime64). As leituras seguintes abrem apenas as colunas
+pedidas, mapeadas em memória, sem parsing de CSV.
+
+A conversão é refeita automaticamente quando o CSV de origem muda. O
+esquema de um CSV com outro nome (uma cópia, uma base sintética) é
+reconhecido pelas colunas do cabeçalho.
+
+Uso:
+    python base_colunar.py Base_clientes.csv Base_cartoes.csv
+"""
+
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+from cache_etapas import hash_arquivo
+
+VERSAO_FORMATO = 1
+TAMANHO_CHUNK = 1_000_000
+ARQUIVO_CLIENTES = 'Base_clientes.csv'
+
+# Tipos por coluna: dtype numpy, 'category' ou ('data', formato)
+ESQUEMA_CLIENTES = {
+    'Cliente_ID': 'int64',
+    'Data_Nascimento': ('data', '%d/%m/%Y'),
+    'Renda_Anual': 'float32',
+    'Data_Criacao_Conta': ('data', '%Y-%m-%d'),
+    'Numero_Cartoes': 'int8',
+    'Cidade': 'category',
+    'Estado': 'category',
+    'Possui_Conta_Adicional': 'category',
+}
+
+ESQUEMA_CARTOES = {
+    'ID_Cartao': 'int64',
+    'Produto_Mastercard': 'category',
+    'Tipo_Cartao': 'category',
+    'Data_Emissao': ('data', '%Y-%m-%d %H:%M:%S'),
+    'Data_Ativacao': ('data', '%Y-%m-%d %H:%M:%S'),
+    'Data_Validade': ('data', '%Y-%m-%d'),
+    'Limite_Cartao': 'float32',
+}
+
+ESQUEMAS = {
+    ARQUIVO_CLIENTES: ESQUEMA_CLIENTES,
+    'Base_cartoes.csv': ESQUEMA_CARTOES,
+}
+
+
+def diretorio_colunar(caminho_csv):
+    return os.path.splitext(caminho_csv)[0] + '.colunar'
+
+
+def _esquema_para(caminho_csv, esquema):
+    if esquema is not None:
+        return esquema
+    nome = os.path.basename(caminho_csv)
+    if nome in ESQUEMAS:
+        return ESQUEMAS[nome]
+    # Outro nome: o esquema cujas colunas estão todas no cabeçalho
+    cabecalho = set(pd.read_csv(caminho_csv, nrows=0).columns)
+    for candidato in ESQUEMAS.values():
+        if set(candidato) <= cabecalho:
+            return candidato
+    raise ValueError(f"Esquema desconhecido para {nome}; informe o parâmetro 'esquema'")
+
+
+def _dtype_codigos(num_categorias):
+    for dtype in (np.int8, np.int16, np.int32):
+        if num_categorias < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _dtype_coluna(tipo):
+    if isinstance(tipo, tuple):
+        return np.dtype('datetime64[s]')
+    return np.dtype(tipo)
+
+
+def _ler_meta(diretorio):
+    try:
+        with open(os.path.join(diretorio, 'meta.json'), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar_meta(diretorio, meta):
+    with open(os.path.join(diretorio, 'meta.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump(meta, arquivo, ensure_ascii=False, indent=1)
+
+
+def converter_csv(caminho_csv, esquema=None, tamanho_chunk=TAMANHO_CHUNK):
+    """
+    Converte o CSV para o formato colunar em duas passadas por chunks:
+    a primeira conta as linhas e coleta as categorias, a segunda preenche
+    os arquivos .npy já com o tamanho final.
+    """
+    esquema = _esquema_para(caminho_csv, esquema)
+    destino = diretorio_colunar(caminho_csv)
+    temporario = destino + '.tmp'
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+
+    colunas = list(esquema)
+    categoricas = [c for c in colunas if esquema[c] == 'category']
+    textos = {c: str for c in colunas if esquema[c] == 'category' or isinstance(esquema[c], tuple)}
+
+    # Passada 1: número de linhas e categorias distintas
+    num_linhas = 0
+    valores = {c: set() for c in categoricas}
+    for chunk in pd.read_csv(caminho_csv, usecols=[colunas[0]] + categoricas,
+                             dtype=textos, chunksize=tamanho_chunk):
+        num_linhas += len(chunk)
+        for c in categoricas:
+            valores[c].update(chunk[c].dropna().unique())
+    categorias = {c: sorted(valores[c]) for c in categoricas}
+
+    # Passada 2: preencher as colunas tipadas
+    saidas = {}
+    for c in colunas:
+        if c in categorias:
+            dtype = _dtype_codigos(len(categorias[c]))
+        else:
+            dtype = _dtype_coluna(esquema[c])
+        saidas[c] = np.lib.format.open_memmap(os.path.join(temporario, f'{c}.npy'),
+                                              mode='w+', dtype=dtype, shape=(num_linhas,))
+
+    inicio = 0
+    for chunk in pd.read_csv(caminho_csv, usecols=colunas, dtype=textos, chunksize=tamanho_chunk):
+        fim = inicio + len(chunk)
+        for c in colunas:
+            tipo = esquema[c]
+            if tipo == 'category':
+                valores_chunk = pd.Categorical(chunk[c], categories=categorias[c]).codes
+            elif isinstance(tipo, tuple):
+                valores_chunk = pd.to_datetime(chunk[c], format=tipo[1], errors='coerce').to_numpy('datetime64[s]')
+            else:
+                coluna = chunk[c]
+                if np.dtype(tipo).kind in 'iu' and coluna.isna().any():
+                    raise ValueError(f"Coluna inteira {c} possui valores ausentes em {caminho_csv}")
+                valores_chunk = coluna.to_numpy(dtype=tipo)
+            saidas[c][inicio:fim] = valores_chunk
+        inicio = fim
+
+    for array in saidas.values():
+        array.flush()
+    del saidas
+
+    stat = os.stat(caminho_csv)
+    _gravar_meta(temporario, {
+        'versao': VERSAO_FORMATO,
+        'origem': {'tamanho': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                   'sha256': hash_arquivo(caminho_csv)},
+        'linhas': num_linhas,
+        'colunas': colunas,
+        'tipos': {c: list(t) if isinstance(t, tuple) else t for c, t in esquema.items()},
+        'categorias': categorias,
+    })
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(temporario, destino)
+    return destino
+
+
+def garantir_base(caminho_csv, esquema=None):
+    """Converte o CSV se o diretório colunar não existir ou estiver desatualizado."""
+    esquema = _esquema_para(caminho_csv, esquema)
+    destino = diretorio_colunar(caminho_csv)
+    meta = _ler_meta(destino)
+    tipos = {c: list(t) if isinstance(t, tuple) else t for c, t in esquema.items()}
+    if meta is None or meta.get('versao') != VERSAO_FORMATO or meta.get('tipos') != tipos:
+        converter_csv(caminho_csv, esquema)
+        return destino
+
+    stat = os.stat(caminho_csv)
+    origem = meta['origem']
+    if (origem['tamanho'], origem['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+        return destino
+    if hash_arquivo(caminho_csv) == origem['sha256']:
+        # Só o mtime mudou: o conteúdo é o mesmo
+        origem['tamanho'], origem['mtime_ns'] = stat.st_size, stat.st_mtime_ns
+        _gravar_meta(destino, meta)
+        return destino
+    converter_csv(caminho_csv, esquema)
+    return destino
+
+
+def linhas_convertidas(caminho_csv):
+    """Linhas da base colunar, se ela já existe e corresponde ao CSV atual (senão None)."""
+    meta = _ler_meta(diretorio_colunar(caminho_csv))
+    if meta is None or meta.get('versao') != VERSAO_FORMATO:
+        return None
+    stat = os.stat(caminho_csv)
+    if (meta['origem']['tamanho'], meta['origem']['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+        return None
+    return meta['linhas']
+
+
+def carregar_base(caminho_csv, colunas=None, esquema=None):
+    """
+    Carrega as colunas pedidas a partir da base colunar (convertendo o CSV
+    na primeira vez). Os arrays são mapeados em memória e somente leitura.
+    """
+    destino = garantir_base(caminho_csv, esquema)
+    meta = _ler_meta(destino)
+    colunas = meta['colunas'] if colunas is None else list(colunas)
+
+    dados = {}
+    for c in colunas:
+        if c not in meta['colunas']:
+            raise KeyError(f"Coluna {c} não existe em {caminho_csv}")
+        array = np.load(os.path.join(destino, f'{c}.npy'), mmap_mode='r')
+        if c in meta['categorias']:
+            dtype = pd.CategoricalDtype(meta['categorias'][c])
+            dados[c] = pd.Categorical.from_codes(array, dtype=dtype, validate=False)
+        else:
+            dados[c] = array
+    return pd.DataFrame(dados, copy=False)
+
+
+
+def carregar_clientes(caminho=ARQUIVO_CLIENTES, colunas=None):
+    """carregar_base de uma base de clientes, qualquer que seja o nome do arquivo."""
+    return carregar_base(caminho, colunas, ESQUEMA_CLIENTES)
+
+
+if __name__ == '__main__':
+    for caminho in sys.argv[1:] or list(ESQUEMAS):
+        print(f"🔄 Convertendo {caminho}...")
+        destino = converter_csv(caminho)
+        meta = _ler_meta(destino)
+        print(f"✓ {meta['linhas']:,} linhas gravadas em {destino}")
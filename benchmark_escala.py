@@ -0,0 +1,253 @@
+"""
+Benchmark em Escala
+Priceless Bank - Mastercard Challenge 2025
+
+Mede tempo e memória de cada etapa dos dois scripts em bases sintéticas
+(dados_sinteticos.py) de 10 mil a 100 milhões de clientes e grava os
+resultados em JSON, para comparar versões e detectar regressões.
+
+Cada combinação de script e escala roda em um processo separado, em um
+diretório de trabalho próprio, para que a memória de uma não contamine a
+outra. As medições são as seções da instrumentação (instrumentacao.py), no
+modo detalhado, somadas por nome:
+
+- segundos de relógio (total e próprio) e de CPU;
+- pico de memória alocada durante a seção (tracemalloc, que também vê os
+  arrays do numpy e do pandas; --sem-tracemalloc usa o modo leve e reduz o
+  custo da medição);
+- RSS máximo do processo até o fim da seção;
+- linhas processadas.
+
+Os ajustes da varredura de k rodam em processos de trabalho e entram só
+com tempo e CPU. Os gráficos são gerados no próprio processo. Em máquinas
+com mais de um núcleo, as etapas independentes rodam ao mesmo tempo
+(agendador_etapas.py): o total se aproxima do caminho crítico e o pico de
+memória de uma etapa inclui o das que correm junto. As bases de cada escala
+são geradas uma vez e reaproveitadas.
+
+Uso:
+    python benchmark_escala.py [--escalas 10k 1m 10m 100m]
+                               [--scripts segmentacao renda renda_streaming completa]
+                               [--comparar benchmarks/resultados/<anterior>.json] [--tolerancia 0.2]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import instrumentacao
+from dados_sinteticos import ESCALAS, gravar_bases, numero_linhas
+
+SCRIPTS = ('segmentacao', 'renda', 'renda_streaming', 'completa')
+ESCALAS_PADRAO = ('10k', '1m')
+DIRETORIO_BENCHMARK = 'benchmarks'
+TOLERANCIA = 0.2
+# Diferenças abaixo destes valores não contam como regressão
+MINIMOS = {'segundos': 0.05, 'pico_memoria_mb': 1.0}
+
+
+def resumir(relatorio):
+    """Seções do relatório de instrumentação somadas por nome, na ordem da primeira ocorrência."""
+    resumo = {}
+    for secao in relatorio['secoes']:
+        atual = resumo.setdefault(secao['nome'], {
+            'etapa': secao['nome'], 'categoria': secao['categoria'], 'ocorrencias': 0,
+            'segundos': 0.0, 'segundos_proprios': 0.0, 'cpu_segundos': 0.0,
+            'pico_memoria_mb': None, 'rss_maximo_mb': None, 'linhas': None})
+        atual['ocorrencias'] += 1
+        for medida in ('segundos', 'segundos_proprios', 'cpu_segundos'):
+            atual[medida] += secao[medida]
+        for medida in ('pico_memoria_mb', 'rss_maximo_mb', 'linhas'):
+            if secao.get(medida) is not None:
+                atual[medida] = max(atual[medida] or 0, secao[medida])
+    for atual in resumo.values():
+        for medida in ('segundos', 'segundos_proprios', 'cpu_segundos'):
+            atual[medida] = round(atual[medida], 4)
+        for medida in ('pico_memoria_mb', 'rss_maximo_mb'):
+            if atual[medida] is not None:
+                atual[medida] = round(atual[medida], 2)
+    return list(resumo.values())
+
+
+def medir_script(script, arquivo, tracemalloc_ativo=True):
+    """Mede as seções de um script sobre `arquivo` no processo atual (saída em texto descartada)."""
+    import analise_completa
+    import analise_renda_idade
+    import analise_segmentacao
+    import relatorio_html
+    from cache_etapas import CacheEtapas
+
+    medicoes = instrumentacao.configurar('detalhada' if tracemalloc_ativo else 'leve', nome=script)
+    with contextlib.redirect_stdout(io.StringIO()), instrumentacao.secao('total'):
+        if script == 'segmentacao':
+            analise_segmentacao.executar_pipeline(arquivo, CacheEtapas(ativo=False), processos_graficos=1)
+        elif script == 'completa':
+            analise_completa.executar(arquivo, CacheEtapas(ativo=False), processos_graficos=1)
+        elif script == 'renda_streaming':
+            analise_renda_idade.executar_streaming(arquivo)
+        else:
+            relatorio_html.configurar('compartilhado', n_processos=1)
+            analise_renda_idade.executar_em_memoria(arquivo)
+            relatorio_html.finalizar()
+    medicoes.encerrar()
+    return resumir(medicoes.relatorio())
+
+
+def _versao():
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=diretorio,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        alterado = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                  cwd=diretorio, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-alterado' if alterado else '')
+
+
+def _ambiente():
+    import plotly
+    import sklearn
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'plotly': plotly.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def preparar_dados(escala, diretorio):
+    """Base de clientes da escala, gerada na primeira vez (retorna caminho e segundos gastos)."""
+    caminho = os.path.join(diretorio, 'Base_clientes.csv')
+    if os.path.exists(caminho):
+        return caminho, 0.0
+    inicio = time.perf_counter()
+    gravar_bases(diretorio, numero_linhas(escala), cartoes_por_cliente=0)
+    return caminho, time.perf_counter() - inicio
+
+
+def executar_benchmark(escalas=ESCALAS_PADRAO, scripts=SCRIPTS, diretorio=DIRETORIO_BENCHMARK,
+                       tracemalloc_ativo=True):
+    resultados = []
+    for escala in escalas:
+        arquivo, segundos = preparar_dados(escala, os.path.join(diretorio, 'dados', escala))
+        arquivo = os.path.abspath(arquivo)
+        if segundos:
+            print(f"✓ Base {escala} gerada em {segundos:.1f}s")
+        for script in scripts:
+            trabalho = os.path.join(diretorio, 'trabalho', escala, script)
+            os.makedirs(trabalho, exist_ok=True)
+            saida = os.path.join(trabalho, 'medicoes.json')
+            comando = [sys.executable, os.path.abspath(__file__), '--medir', script, arquivo, saida]
+            if not tracemalloc_ativo:
+                comando.append('--sem-tracemalloc')
+            print(f"⏱️  {script} em {escala} ({numero_linhas(escala):,} clientes)...")
+            inicio = time.perf_counter()
+            subprocess.run(comando, cwd=trabalho, check=True)
+            with open(saida, encoding='utf-8') as arquivo_medicoes:
+                medicoes = json.load(arquivo_medicoes)
+            print(f"   ✓ {time.perf_counter() - inicio:.1f}s")
+            resultados.extend({'script': script, 'escala': escala, 'clientes': numero_linhas(escala), **m}
+                              for m in medicoes)
+    return {
+        'versao': _versao(),
+        'criado_em': datetime.now().isoformat(timespec='seconds'),
+        'tracemalloc': tracemalloc_ativo,
+        'ambiente': _ambiente(),
+        'resultados': resultados,
+    }
+
+
+def comparar(atual, anterior, tolerancia=TOLERANCIA):
+    """Etapas que ficaram mais lentas ou usaram mais memória que na execução anterior."""
+    referencia = {(r['script'], r['escala'], r['etapa']): r for r in anterior['resultados']}
+    regressoes = []
+    for registro in atual['resultados']:
+        antes = referencia.get((registro['script'], registro['escala'], registro['etapa']))
+        if antes is None:
+            continue
+        for medida, minimo in MINIMOS.items():
+            novo, velho = registro.get(medida), antes.get(medida)
+            if novo is None or velho is None:
+                continue
+            if novo - velho > max(minimo, tolerancia * velho):
+                regressoes.append({'script': registro['script'], 'escala': registro['escala'],
+                                   'etapa': registro['etapa'], 'medida': medida,
+                                   'anterior': velho, 'atual': novo})
+    return regressoes
+
+
+def relatorio(resultado):
+    tabela = pd.DataFrame(resultado['resultados'])
+    for (script, escala), linhas in tabela.groupby(['script', 'escala'], sort=False):
+        print(f"\n📊 {script} — {escala} ({linhas['clientes'].iloc[0]:,} clientes)")
+        colunas = ['etapa', 'ocorrencias', 'segundos', 'segundos_proprios', 'cpu_segundos',
+                   'pico_memoria_mb', 'rss_maximo_mb', 'linhas']
+        print(linhas[colunas].to_string(index=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dos scripts em bases sintéticas')
+    parser.add_argument('--escalas', nargs='+', default=list(ESCALAS_PADRAO),
+                        help=f"escalas ({', '.join(ESCALAS)}) ou números de clientes "
+                             f"(padrão: {' '.join(ESCALAS_PADRAO)})")
+    parser.add_argument('--scripts', nargs='+', choices=SCRIPTS, default=list(SCRIPTS))
+    parser.add_argument('--diretorio', default=DIRETORIO_BENCHMARK,
+                        help='bases geradas, diretórios de trabalho e resultados')
+    parser.add_argument('--saida', default=None,
+                        help='JSON de resultados (padrão: <diretorio>/resultados/benchmark-<data>-<versão>.json)')
+    parser.add_argument('--comparar', default=None, help='JSON de uma execução anterior')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA,
+                        help='aumento relativo aceito antes de apontar regressão (padrão: 0.2)')
+    parser.add_argument('--sem-tracemalloc', action='store_true',
+                        help='não mede o pico de memória por etapa (medição mais barata)')
+    parser.add_argument('--medir', nargs=3, metavar=('SCRIPT', 'ARQUIVO', 'SAIDA'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        script, arquivo, saida = args.medir
+        medicoes = medir_script(script, arquivo, not args.sem_tracemalloc)
+        with open(saida, 'w', encoding='utf-8') as arquivo_saida:
+            json.dump(medicoes, arquivo_saida, indent=2)
+        return
+
+    resultado = executar_benchmark(args.escalas, args.scripts, args.diretorio, not args.sem_tracemalloc)
+    relatorio(resultado)
+
+    saida = args.saida or os.path.join(
+        args.diretorio, 'resultados',
+        f"benchmark-{datetime.now():%Y%m%d-%H%M%S}-{resultado['versao'] or 'sem-versao'}.json")
+    os.makedirs(os.path.dirname(saida) or '.', exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+    print(f"\n✓ Resultados salvos: {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            regressoes = comparar(resultado, json.load(arquivo), args.tolerancia)
+        if not regressoes:
+            print(f"✓ Nenhuma regressão acima de {args.tolerancia:.0%} em relação a {args.comparar}")
+            return
+        print(f"\n⚠️  {len(regressoes)} regressão(ões) em relação a {args.comparar}:")
+        for r in regressoes:
+            print(f"   • {r['script']}/{r['escala']}/{r['etapa']} {r['medida']}: "
+                  f"{r['anterior']} → {r['atual']}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
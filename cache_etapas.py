@@ -0,0 +1,361 @@
+"""
+Cache de Etapas em Disco
+Priceless Bank - Mastercard Challenge 2025
+
+Cada etapa do pipeline grava seu resultado em disco, indexado por um hash
+do conteúdo dos arquivos de entrada, dos parâmetros, do código da etapa e
+das chaves das etapas de que ela depende. Assim, uma etapa só é recalculada
+quando algo acima dela mudou.
+
+O código de uma etapa é o da sua função e o de tudo do projeto (funções,
+classes e constantes dos módulos deste diretório) que ela alcança pelos
+nomes que usa, direta ou indiretamente: mudar detectar_cotovelo em
+varredura_k.py invalida o k-means, mas mudar o título de um gráfico ou um
+script de benchmark não invalida nenhuma etapa.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import threading
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+
+import instrumentacao
+from instrumentacao import contar_linhas
+
+DIRETORIO_CACHE = '.cache_etapas'
+VERSAO_CACHE = 1
+
+
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    """SHA-256 do conteúdo de um arquivo, lido em blocos."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+DIRETORIO_PROJETO = os.path.dirname(os.path.abspath(__file__))
+_ESCALARES = (type(None), bool, int, float, complex, str, bytes, date)
+
+
+def _arquivo_do_projeto(modulo):
+    arquivo = getattr(modulo, '__file__', None)
+    return arquivo is not None and os.path.dirname(os.path.abspath(arquivo)) == DIRETORIO_PROJETO
+
+
+def _do_projeto(objeto):
+    # Funções e classes definidas em um módulo do projeto (inclusive o __main__)
+    return ((inspect.isfunction(objeto) or inspect.isclass(objeto))
+            and _arquivo_do_projeto(sys.modules.get(objeto.__module__)))
+
+
+def _rotulo(objeto):
+    # Nome do arquivo, e não do módulo: o script tem a mesma chave rodando como __main__ ou importado
+    return f"{os.path.basename(sys.modules[objeto.__module__].__file__)}:{objeto.__qualname__}"
+
+
+def _nomes(codigo):
+    """Nomes globais e atributos usados por um code object e pelos aninhados (lambdas, funções internas)."""
+    nomes = set(codigo.co_names)
+    for constante in codigo.co_consts:
+        if inspect.iscode(constante):
+            nomes |= _nomes(constante)
+    return nomes
+
+
+def _descrever(valor, pendentes):
+    """
+    Texto estável de uma constante global. Funções e classes do projeto
+    dentro dela entram na fila `pendentes`; objetos de outras bibliotecas
+    entram só pelo tipo.
+    """
+    if _do_projeto(valor):
+        pendentes.append(valor)
+        return _rotulo(valor)
+    if isinstance(valor, _ESCALARES):
+        return repr(valor)
+    if isinstance(valor, (list, tuple)):
+        return f"{type(valor).__name__}({[_descrever(v, pendentes) for v in valor]})"
+    if isinstance(valor, (set, frozenset)):
+        return f"{type(valor).__name__}({sorted(_descrever(v, pendentes) for v in valor)})"
+    if isinstance(valor, dict):
+        return f"dict({[(_descrever(k, pendentes), _descrever(v, pendentes)) for k, v in valor.items()]})"
+    if isinstance(valor, np.ndarray):
+        return f"ndarray({valor.dtype.str}, {valor.shape}, {hashlib.sha256(valor.tobytes()).hexdigest()})"
+    return f"<{type(valor).__module__}.{type(valor).__qualname__}>"
+
+
+@lru_cache(maxsize=None)
+def _hash_codigo(funcao):
+    """
+    SHA-256 do código de `funcao` e de tudo do projeto que ela alcança:
+    funções e classes chamadas (e, recursivamente, o que elas chamam) e o
+    valor das constantes globais que usam. Módulos do projeto usados como
+    `modulo.nome` contribuem só com os nomes usados.
+    """
+    partes = {}
+    pendentes = [inspect.unwrap(funcao)]
+    while pendentes:
+        objeto = pendentes.pop()
+        rotulo = _rotulo(objeto) if _do_projeto(objeto) else getattr(objeto, '__qualname__', repr(objeto))
+        if rotulo in partes:
+            continue
+        try:
+            partes[rotulo] = inspect.getsource(objeto)
+        except (OSError, TypeError):
+            partes[rotulo] = rotulo
+        if inspect.isclass(objeto):
+            for membro in vars(objeto).values():
+                membro = getattr(membro, '__func__', membro)    # staticmethod, classmethod
+                membros = ([membro.fget, membro.fset] if isinstance(membro, property) else [membro])
+                pendentes.extend(m for m in membros if inspect.isfunction(m))
+            continue
+        if not inspect.isfunction(objeto):
+            continue
+        nomes = _nomes(objeto.__code__)
+        globais = objeto.__globals__
+        for nome in sorted(nomes):
+            if nome not in globais:
+                continue
+            valor = globais[nome]
+            if inspect.ismodule(valor):
+                if _arquivo_do_projeto(valor):
+                    for atributo in sorted(nomes):
+                        if hasattr(valor, atributo):
+                            partes[f'{_rotulo_modulo(valor)}.{atributo}'] = _descrever(
+                                getattr(valor, atributo), pendentes)
+            elif not inspect.isbuiltin(valor):
+                descricao = _descrever(valor, pendentes)
+                if _do_projeto(valor) or not descricao.startswith('<'):
+                    partes[f'{rotulo}/{nome}'] = descricao
+    texto = json.dumps(partes, sort_keys=True)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def _rotulo_modulo(modulo):
+    return os.path.basename(modulo.__file__)
+
+
+class CacheEtapas:
+    """Armazena resultados de etapas como arquivos pickle em um diretório."""
+
+    def __init__(self, diretorio=DIRETORIO_CACHE, ativo=True):
+        self.diretorio = diretorio
+        self.ativo = ativo
+        self._hashes = {}
+
+    def hash_entrada(self, caminho):
+        # O hash do conteúdo é memorizado por (tamanho, mtime) para não reler
+        # arquivos grandes a cada execução.
+        stat = os.stat(caminho)
+        assinatura = [stat.st_size, stat.st_mtime_ns]
+        caminho_abs = os.path.abspath(caminho)
+        if not self._hashes and self.ativo:
+            self._hashes = self._ler_indice_hashes()
+        memo = self._hashes.get(caminho_abs)
+        if memo is not None and memo[:2] == assinatura:
+            return memo[2]
+        digest = hash_arquivo(caminho)
+        self._hashes[caminho_abs] = assinatura + [digest]
+        if self.ativo:
+            self._gravar_indice_hashes()
+        return digest
+
+    def _caminho_indice(self):
+        return os.path.join(self.diretorio, 'hashes.json')
+
+    def _ler_indice_hashes(self):
+        try:
+            with open(self._caminho_indice(), encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except (OSError, ValueError):
+            return {}
+
+    def _gravar_indice_hashes(self):
+        os.makedirs(self.diretorio, exist_ok=True)
+        with open(self._caminho_indice(), 'w', encoding='utf-8') as arquivo:
+            json.dump(self._hashes, arquivo)
+
+    def caminho(self, nome, chave):
+        return os.path.join(self.diretorio, f'{nome}-{chave[:16]}.pkl')
+
+    def contem(self, nome, chave):
+        return self.ativo and os.path.exists(self.caminho(nome, chave))
+
+    def ler(self, nome, chave):
+        with open(self.caminho(nome, chave), 'rb') as arquivo:
+            return pickle.load(arquivo)
+
+    def gravar(self, nome, chave, resultado):
+        if not self.ativo:
+            return
+        os.makedirs(self.diretorio, exist_ok=True)
+        destino = self.caminho(nome, chave)
+        temporario = destino + '.tmp'
+        with open(temporario, 'wb') as arquivo:
+            pickle.dump(resultado, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, destino)
+
+    def _caminho_saidas(self, nome, chave):
+        return os.path.join(self.diretorio, f'{nome}-{chave[:16]}.saidas.json')
+
+    def gravar_saidas(self, nome, chave, saidas):
+        """Registra o hash dos arquivos gerados pela etapa com esta chave."""
+        if not self.ativo:
+            return
+        with open(self._caminho_saidas(nome, chave), 'w', encoding='utf-8') as arquivo:
+            json.dump({s: self.hash_entrada(s) for s in saidas}, arquivo)
+
+    def saidas_conferem(self, nome, chave, saidas):
+        """
+        Os arquivos gerados ainda existem com o conteúdo gravado por esta
+        chave (e não, por exemplo, por uma execução com outros parâmetros).
+        """
+        try:
+            with open(self._caminho_saidas(nome, chave), encoding='utf-8') as arquivo:
+                registro = json.load(arquivo)
+        except (OSError, ValueError):
+            return False
+        return all(os.path.exists(s) and registro.get(s) == self.hash_entrada(s) for s in saidas)
+
+    def limpar(self):
+        if not os.path.isdir(self.diretorio):
+            return
+        for nome in os.listdir(self.diretorio):
+            if nome.endswith(('.pkl', '.saidas.json')):
+                os.remove(os.path.join(self.diretorio, nome))
+
+
+class Etapa:
+    """
+    Etapa nomeada do pipeline.
+
+    A chave é calculada sem executar nada (apenas hashes de entradas,
+    parâmetros, código da etapa e chaves das dependências); o resultado só é
+    calculado, ou lido do cache, quando `resultado()` é chamado.
+    Etapas com `saidas` só são consideradas em cache se os arquivos
+    gerados ainda existirem com o conteúdo gravado por esta chave. `opcoes` são repassadas à função mas não entram
+    na chave (não alteram o resultado, como o número de processos).
+
+    calcular() pode ser chamado de várias threads (ver agendador_etapas.py):
+    cada etapa é calculada uma única vez e as demais chamadas esperam por
+    ela. Os avisos de reaproveitamento do cache só são impressos em
+    resultado(), na thread que consome a etapa, para manter a ordem da saída.
+
+    Com reter(n), a etapa guarda o resultado em memória só até ser consumida
+    n vezes (pelas etapas que dependem dela ou pelo primeiro resultado());
+    depois o descarta, e um novo pedido o recalcula ou relê do cache.
+    """
+
+    def __init__(self, cache, nome, funcao, dependencias=(), parametros=None,
+                 entradas=(), saidas=(), opcoes=None):
+        self.cache = cache
+        self.nome = nome
+        self.funcao = funcao
+        self.dependencias = list(dependencias)
+        self.parametros = dict(parametros or {})
+        self.entradas = list(entradas)
+        self.saidas = list(saidas)
+        self.opcoes = dict(opcoes or {})
+        self._chave = None
+        self._resultado = None
+        self._calculado = False
+        self._erro = None
+        self._reutilizada = False
+        self._avisada = False
+        self._consumidores = None
+        self._entregue = False
+        self._trava = threading.Lock()
+
+    @property
+    def chave(self):
+        if self._chave is None:
+            descricao = {
+                'versao': VERSAO_CACHE,
+                'etapa': self.nome,
+                'codigo': _hash_codigo(self.funcao),
+                'parametros': self.parametros,
+                'entradas': [self.cache.hash_entrada(c) for c in self.entradas],
+                'dependencias': [d.chave for d in self.dependencias],
+            }
+            texto = json.dumps(descricao, sort_keys=True, default=str)
+            self._chave = hashlib.sha256(texto.encode('utf-8')).hexdigest()
+        return self._chave
+
+    def em_cache(self):
+        # Com o cache desligado, nem a chave (hash das entradas) é calculada
+        return (self.cache.ativo and self.cache.contem(self.nome, self.chave)
+                and (not self.saidas or self.cache.saidas_conferem(self.nome, self.chave, self.saidas)))
+
+    def calcular(self):
+        """Calcula (ou lê do cache) o resultado, sem imprimir nada."""
+        with self._trava:
+            if self._erro is not None:
+                raise self._erro
+            if not self._calculado:
+                try:
+                    self._calcular()
+                except Exception as erro:
+                    self._erro = erro
+                    raise
+                self._calculado = True
+        return self._resultado
+
+    def _calcular(self):
+        if self.em_cache():
+            with instrumentacao.secao(self.nome, categoria='cache'):
+                self._resultado = self.cache.ler(self.nome, self.chave)
+            self._reutilizada = True
+            return
+        argumentos = [d.calcular() for d in self.dependencias]
+        # Só o cálculo da etapa: as dependências já foram medidas nas suas seções
+        with instrumentacao.secao(self.nome, linhas=contar_linhas(*argumentos),
+                                  categoria='etapa') as secao:
+            self._resultado = self.funcao(*argumentos, **self.parametros, **self.opcoes)
+            if secao and secao['linhas'] is None:
+                secao['linhas'] = contar_linhas(self._resultado)
+        del argumentos
+        for dependencia in self.dependencias:
+            dependencia._consumir()
+        if self.cache.ativo:
+            self.cache.gravar(self.nome, self.chave, self._resultado)
+            if self.saidas:
+                self.cache.gravar_saidas(self.nome, self.chave, self.saidas)
+
+    def reter(self, consumidores):
+        """Descarta o resultado da memória depois de `consumidores` consumos."""
+        with self._trava:
+            self._consumidores = consumidores
+
+    def _consumir(self):
+        with self._trava:
+            if self._consumidores is None:
+                return
+            self._consumidores -= 1
+            if self._consumidores <= 0:
+                self._consumidores = None
+                self._resultado = None
+                self._calculado = False
+
+    def _avisar(self):
+        for dependencia in self.dependencias:
+            dependencia._avisar()
+        if self._reutilizada and not self._avisada:
+            self._avisada = True
+            print(f"♻️  Etapa '{self.nome}' reutilizada do cache")
+
+    def resultado(self):
+        resultado = self.calcular()
+        self._avisar()
+        if not self._entregue:
+            self._entregue = True
+            self._consumir()
+        return resultado
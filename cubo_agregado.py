@@ -0,0 +1,116 @@
+"""
+Cubo de Agregados
+Priceless Bank - Mastercard Challenge 2025
+
+Estatísticas suficientes (contagem, soma, M2, mínimo e máximo) de um
+conjunto de medidas para cada combinação observada de um conjunto de
+dimensões (Estado, Cidade, faixas, Segmento, Idade...), calculadas em uma
+única passada sobre os clientes. As tabelas dos relatórios saem do cubo por
+agregação das células (roll-up), sem reler a base.
+
+Como em estatisticas_streaming, o cubo guarda M2 (soma dos quadrados dos
+desvios) em vez da soma de quadrados bruta, e o roll-up combina as células
+pela fórmula de Chan. Combinações com chave ausente (por exemplo, clientes
+sem segmento) são mantidas no cubo e entram nos totais, mas não viram grupo
+ao agregar por aquela dimensão, como no groupby do pandas.
+"""
+
+import numpy as np
+import pandas as pd
+
+import instrumentacao
+
+
+class CuboAgregado:
+    """Células de estatísticas por combinação de dimensões."""
+
+    def __init__(self, dimensoes, linhas, n, soma, m2, minimo, maximo):
+        self.dimensoes = list(dimensoes)
+        self.linhas = linhas    # clientes por célula
+        self.n = n              # valores não nulos de cada medida
+        self.soma = soma
+        self.m2 = m2
+        self.minimo = minimo
+        self.maximo = maximo
+
+    @classmethod
+    def construir(cls, df, dimensoes, medidas):
+        """
+        Monta o cubo em uma passada. `dimensoes` são nomes de colunas de `df`
+        ou Series nomeadas alinhadas a ele (por exemplo, os rótulos de
+        segmento calculados à parte).
+        """
+        chaves = [df[d] if isinstance(d, str) else d for d in dimensoes]
+        # Uma coluna usada como chave sai do resultado do groupby; dimensões
+        # que também são medidas (Idade) entram como cópia
+        chaves = [c.copy() if c.name in medidas else c for c in chaves]
+        with instrumentacao.secao(f"cubo.construir[{','.join(str(c.name) for c in chaves)}]",
+                                  linhas=len(df), categoria='groupby'):
+            grupos = df[list(medidas)].groupby(chaves, observed=True, dropna=False)
+            n = grupos.count()
+            return cls([c.name for c in chaves], grupos.size(), n, grupos.sum(),
+                       (grupos.var(ddof=0) * n).fillna(0.0), grupos.min(), grupos.max())
+
+    def _agrupar(self, tabela, dimensoes):
+        if dimensoes:
+            return tabela.groupby(level=dimensoes, observed=True)
+        return tabela.groupby(np.zeros(len(tabela), dtype='int8'))
+
+    def agregar(self, dimensoes=()):
+        """Roll-up do cubo para `dimensoes` (vazio: total geral em uma célula)."""
+        dimensoes = list(dimensoes)
+        with instrumentacao.secao(f"cubo.agregar[{','.join(dimensoes)}]", linhas=len(self.linhas),
+                                  categoria='groupby'):
+            return self._agregar(dimensoes)
+
+    def _agregar(self, dimensoes):
+        n = self._agrupar(self.n, dimensoes).sum()
+        soma = self._agrupar(self.soma, dimensoes).sum()
+
+        # M2 do grupo = soma dos M2 das células + n·(média da célula - média do grupo)²
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media_celula = self.soma / self.n
+            media_grupo = (self._agrupar(self.soma, dimensoes).transform('sum')
+                           / self._agrupar(self.n, dimensoes).transform('sum'))
+        entre_celulas = (self.n * (media_celula - media_grupo) ** 2).fillna(0.0)
+        m2 = self._agrupar(self.m2, dimensoes).sum() + self._agrupar(entre_celulas, dimensoes).sum()
+
+        return CuboAgregado(dimensoes, self._agrupar(self.linhas, dimensoes).sum(), n, soma, m2,
+                            self._agrupar(self.minimo, dimensoes).min(),
+                            self._agrupar(self.maximo, dimensoes).max())
+
+    def contagem(self, medida=None):
+        """Clientes por célula ou, com `medida`, valores não nulos dela."""
+        return self.linhas if medida is None else self.n[medida]
+
+    def media(self, medida):
+        return self.soma[medida] / self.n[medida]
+
+    def desvio(self, medida, ddof=1):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.m2[medida] / (self.n[medida] - ddof).where(self.n[medida] > ddof))
+
+    def resumo(self, medida):
+        """Contagem, média, desvio, mínimo e máximo de uma medida no cubo inteiro."""
+        total = self.agregar()
+        return {
+            'n': int(total.n[medida].iloc[0]),
+            'media': total.media(medida).iloc[0],
+            'desvio': total.desvio(medida).iloc[0],
+            'minimo': total.minimo[medida].iloc[0],
+            'maximo': total.maximo[medida].iloc[0],
+        }
+
+    def contagem_valores(self, dimensao):
+        """
+        Clientes por valor de uma dimensão, como Series.value_counts(): em
+        ordem decrescente e, para dimensões categóricas, com todas as
+        categorias (inclusive as sem clientes).
+        """
+        contagens = self.agregar([dimensao]).linhas
+        if isinstance(contagens.index.dtype, pd.CategoricalDtype):
+            categorias = contagens.index.dtype.categories
+            contagens = pd.Series(
+                contagens.reindex(categorias, fill_value=0).to_numpy(),
+                index=pd.CategoricalIndex(categorias, dtype=contagens.index.dtype, name=dimensao))
+        return contagens.rename('count').sort_values(ascending=False)
@@ -0,0 +1,235 @@
+"""
+Bases Sintéticas de Clientes e Cartões
+Priceless Bank - Mastercard Challenge 2025
+
+Gera Base_clientes.csv e Base_cartoes.csv sintéticas, com as mesmas colunas
+e formatos das bases reais e distribuições ajustadas à amostra de 1.960
+clientes, para medir os scripts em escala sem usar dados de clientes:
+
+- Renda_Anual: múltiplos de R$ 100 entre R$ 20.000 e R$ 149.900, com 13%
+  dos valores ausentes;
+- Data_Nascimento: idades em torno de 49 anos (de 18 a 75), no formato
+  dd/mm/aaaa; Data_Criacao_Conta entre 2023 e 2024;
+- Estado/Cidade: os 6 estados da amostra com suas participações ou, com
+  geografia='brasil', as 27 UFs com peso próximo ao da população; com
+  mais de uma cidade por estado, a capital concentra os clientes e as
+  demais seguem uma distribuição de Zipf;
+- Numero_Cartoes e Possui_Conta_Adicional (21% "Sim") com as frequências
+  da amostra;
+- cartões (cerca de 2 por cliente): produto, tipo, emissão, ativação (11%
+  nunca ativados, com a data 1900-01-01 e sem validade), validade de 5 anos
+  e limite por produto.
+
+A geração é feita em chunks, com memória constante, e é determinística para
+uma mesma semente.
+
+Uso:
+    python dados_sinteticos.py 1m --diretorio dados_sinteticos/1m [--geografia brasil]
+                               [--cidades-por-estado 50] [--semente 42]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+ESCALAS = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000, '100m': 100_000_000}
+TAMANHO_CHUNK = 1_000_000
+SEMENTE = 42
+
+# Participação de cada estado na amostra e nas UFs (população, aproximada)
+ESTADOS_AMOSTRA = {
+    'SP': ('São Paulo', 0.177), 'MG': ('Belo Horizonte', 0.172), 'RS': ('Porto Alegre', 0.167),
+    'BA': ('Salvador', 0.164), 'PR': ('Curitiba', 0.162), 'RJ': ('Rio de Janeiro', 0.158),
+}
+ESTADOS_BRASIL = {
+    'SP': ('São Paulo', 21.9), 'MG': ('Belo Horizonte', 10.0), 'RJ': ('Rio de Janeiro', 7.9),
+    'BA': ('Salvador', 6.9), 'PR': ('Curitiba', 5.6), 'RS': ('Porto Alegre', 5.3),
+    'PE': ('Recife', 4.5), 'CE': ('Fortaleza', 4.4), 'PA': ('Belém', 4.0),
+    'SC': ('Florianópolis', 3.7), 'GO': ('Goiânia', 3.5), 'MA': ('São Luís', 3.3),
+    'AM': ('Manaus', 1.9), 'ES': ('Vitória', 1.9), 'PB': ('João Pessoa', 1.9),
+    'MT': ('Cuiabá', 1.8), 'RN': ('Natal', 1.6), 'PI': ('Teresina', 1.6),
+    'AL': ('Maceió', 1.5), 'DF': ('Brasília', 1.4), 'MS': ('Campo Grande', 1.4),
+    'SE': ('Aracaju', 1.1), 'RO': ('Porto Velho', 0.8), 'TO': ('Palmas', 0.7),
+    'AC': ('Rio Branco', 0.4), 'AP': ('Macapá', 0.4), 'RR': ('Boa Vista', 0.3),
+}
+GEOGRAFIAS = {'amostra': ESTADOS_AMOSTRA, 'brasil': ESTADOS_BRASIL}
+EXPOENTE_ZIPF = 1.1
+
+RENDA_MINIMA, RENDA_MAXIMA, FRACAO_RENDA_AUSENTE = 20_000, 149_900, 0.13
+IDADE_MEDIA, IDADE_DESVIO, IDADE_MINIMA, IDADE_MAXIMA = 49.1, 12.1, 18, 75
+DATA_REFERENCIA = np.datetime64('2025-01-01')
+CRIACAO_CONTA = (np.datetime64('2023-01-02'), np.datetime64('2024-12-31'))
+NUMERO_CARTOES = {1: 0.265, 2: 0.224, 3: 0.240, 4: 0.271}
+FRACAO_CONTA_ADICIONAL = 0.212
+
+CARTOES_POR_CLIENTE = 2.04
+# Produto: (participação, limite médio, desvio, limite máximo); débito sem limite
+PRODUTOS = {
+    'Platinum': (0.307, 19_800, 8_500, 38_000),
+    'Black': (0.237, 26_200, 12_500, 52_000),
+    'Gold': (0.201, 14_300, 6_800, 28_000),
+    'Maestro/Debit': (0.151, 0, 0, 0),
+    'Standard': (0.104, 9_800, 6_000, 22_000),
+}
+EMISSAO = (np.datetime64('2020-01-12T00:00:00'), np.datetime64('2024-12-30T23:59:59'))
+FRACAO_NAO_ATIVADOS = 0.112
+NUNCA_ATIVADO = '1900-01-01 00:00:00'
+VALIDADE_DIAS = 1826
+
+
+def _escolher(rng, opcoes, n):
+    """Sorteia n valores de um dicionário valor -> peso."""
+    valores = np.array(list(opcoes), dtype=object)
+    pesos = np.array(list(opcoes.values()), dtype='float64')
+    return valores[rng.choice(len(valores), size=n, p=pesos / pesos.sum())]
+
+
+def _datas_uniformes(rng, inicio, fim, n, unidade='D'):
+    inicio, fim = inicio.astype(f'datetime64[{unidade}]'), fim.astype(f'datetime64[{unidade}]')
+    return inicio + rng.integers(0, (fim - inicio).astype('int64') + 1, size=n)
+
+
+def _texto_data(datas):
+    return pd.Series(np.datetime_as_string(datas, unit='D'))
+
+
+def _texto_data_hora(datas):
+    return pd.Series(np.datetime_as_string(datas, unit='s')).str.replace('T', ' ', regex=False)
+
+
+def distribuicao_cidades(geografia='amostra', cidades_por_estado=1):
+    """(Estado, Cidade) -> participação; a capital é a mais frequente de cada estado."""
+    estados = GEOGRAFIAS[geografia]
+    total = sum(peso for _, peso in estados.values())
+    pesos_zipf = 1 / np.arange(1, cidades_por_estado + 1) ** EXPOENTE_ZIPF
+    pesos_zipf /= pesos_zipf.sum()
+    distribuicao = {}
+    for estado, (capital, peso) in estados.items():
+        for i, peso_cidade in enumerate(pesos_zipf):
+            cidade = capital if i == 0 else f"{estado} Município {i:04d}"
+            distribuicao[(estado, cidade)] = peso / total * peso_cidade
+    return distribuicao
+
+
+def gerar_clientes(n, rng, primeiro_id=1000, cidades=None):
+    """Chunk de `n` clientes no esquema de Base_clientes.csv, com IDs a partir de `primeiro_id`."""
+    cidades = cidades or distribuicao_cidades()
+    locais = list(cidades)
+    local = rng.choice(len(locais), size=n, p=np.array(list(cidades.values())) / sum(cidades.values()))
+    estados = np.array([e for e, _ in locais], dtype=object)
+    nomes = np.array([c for _, c in locais], dtype=object)
+
+    renda = rng.integers(RENDA_MINIMA // 100, RENDA_MAXIMA // 100 + 1, size=n) * 100.0
+    renda[rng.random(n) < FRACAO_RENDA_AUSENTE] = np.nan
+
+    idade = np.clip(rng.normal(IDADE_MEDIA, IDADE_DESVIO, n), IDADE_MINIMA, IDADE_MAXIMA)
+    nascimento = DATA_REFERENCIA - (idade * 365.2425).astype('int64').astype('timedelta64[D]')
+    nascimento = _texto_data(nascimento)
+
+    return pd.DataFrame({
+        'Cliente_ID': primeiro_id + rng.permutation(n),
+        'Data_Nascimento': nascimento.str[8:10] + '/' + nascimento.str[5:7] + '/' + nascimento.str[:4],
+        'Renda_Anual': renda,
+        'Data_Criacao_Conta': _texto_data(_datas_uniformes(rng, *CRIACAO_CONTA, n)),
+        'Numero_Cartoes': _escolher(rng, NUMERO_CARTOES, n).astype('int64'),
+        'Cidade': nomes[local],
+        'Estado': estados[local],
+        'Possui_Conta_Adicional': np.where(rng.random(n) < FRACAO_CONTA_ADICIONAL, 'Sim', 'Não'),
+    })
+
+
+def gerar_cartoes(n, rng, primeiro_id=10_000_000):
+    """Chunk de `n` cartões no esquema de Base_cartoes.csv."""
+    nomes = np.array(list(PRODUTOS), dtype=object)
+    tabela = np.array(list(PRODUTOS.values()), dtype='float64')
+    codigo = rng.choice(len(nomes), size=n, p=tabela[:, 0] / tabela[:, 0].sum())
+    produto = nomes[codigo]
+    debito = produto == 'Maestro/Debit'
+
+    emissao = _datas_uniformes(rng, *EMISSAO, n, unidade='s')
+    # Ativação no mesmo dia em 3% dos casos, em até 3 semanas na maioria e até 80 dias na cauda
+    dias = np.where(rng.random(n) < 0.9, rng.integers(0, 23, n), rng.integers(23, 81, n))
+    dias[rng.random(n) < 0.03] = 0
+    ativacao = emissao + (dias * 86_400).astype('timedelta64[s]')
+    ativado = rng.random(n) >= FRACAO_NAO_ATIVADOS
+    validade = ativacao.astype('datetime64[D]') + np.timedelta64(VALIDADE_DIAS, 'D')
+
+    media, desvio, maximo = tabela[codigo, 1], tabela[codigo, 2], tabela[codigo, 3]
+    limite = np.clip(rng.normal(media, desvio), 500, np.maximum(maximo, 500))
+    limite = np.where(limite < 1000, np.round(limite, -2), np.round(limite, -3))
+    limite[debito] = 0.0
+
+    return pd.DataFrame({
+        'ID_Cartao': primeiro_id + rng.permutation(n),
+        'Produto_Mastercard': produto,
+        'Tipo_Cartao': np.where(debito, 'Débito', 'Crédito'),
+        'Data_Emissao': _texto_data_hora(emissao),
+        'Data_Ativacao': _texto_data_hora(ativacao).where(ativado, NUNCA_ATIVADO),
+        'Data_Validade': _texto_data(validade).where(ativado),
+        'Limite_Cartao': limite,
+    })
+
+
+def _gravar(arquivo, total, gerar, rng, tamanho_chunk, primeiro_id):
+    temporario = arquivo + '.tmp'
+    for inicio in range(0, total, tamanho_chunk):
+        n = min(tamanho_chunk, total - inicio)
+        gerar(n, rng, primeiro_id + inicio).to_csv(temporario, mode='w' if inicio == 0 else 'a',
+                                                   header=inicio == 0, index=False)
+    os.replace(temporario, arquivo)
+
+
+def gravar_bases(diretorio, n_clientes, semente=SEMENTE, geografia='amostra', cidades_por_estado=1,
+                 cartoes_por_cliente=CARTOES_POR_CLIENTE, tamanho_chunk=TAMANHO_CHUNK):
+    """
+    Grava Base_clientes.csv e Base_cartoes.csv (se cartoes_por_cliente > 0)
+    em `diretorio` e retorna os caminhos. Cada chunk tem IDs próprios,
+    embaralhados dentro do chunk.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    rng = np.random.default_rng(semente)
+    cidades = distribuicao_cidades(geografia, cidades_por_estado)
+    clientes = os.path.join(diretorio, 'Base_clientes.csv')
+    cartoes = os.path.join(diretorio, 'Base_cartoes.csv')
+    _gravar(clientes, n_clientes, lambda n, r, i: gerar_clientes(n, r, i, cidades),
+            rng, tamanho_chunk, 1000)
+    if not cartoes_por_cliente:
+        return [clientes]
+    _gravar(cartoes, int(round(n_clientes * cartoes_por_cliente)), gerar_cartoes,
+            rng, tamanho_chunk, 10_000_000)
+    return [clientes, cartoes]
+
+
+def numero_linhas(escala):
+    """Linhas de uma escala ('10k', '1m', ...) ou de um número informado diretamente."""
+    return ESCALAS[escala] if escala in ESCALAS else int(escala)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera bases sintéticas de clientes e cartões')
+    parser.add_argument('escala', help=f"número de clientes ou uma das escalas {', '.join(ESCALAS)}")
+    parser.add_argument('--diretorio', default=None,
+                        help='diretório de saída (padrão: dados_sinteticos/<escala>)')
+    parser.add_argument('--geografia', choices=GEOGRAFIAS, default='amostra',
+                        help='estados da amostra (padrão) ou as 27 UFs')
+    parser.add_argument('--cidades-por-estado', type=int, default=1,
+                        help='cidades por estado, além da capital quando maior que 1')
+    parser.add_argument('--semente', type=int, default=SEMENTE)
+    parser.add_argument('--tamanho-chunk', type=int, default=TAMANHO_CHUNK)
+    args = parser.parse_args()
+
+    n = numero_linhas(args.escala)
+    diretorio = args.diretorio or os.path.join('dados_sinteticos', args.escala)
+    inicio = time.perf_counter()
+    arquivos = gravar_bases(diretorio, n, args.semente, args.geografia, args.cidades_por_estado,
+                            tamanho_chunk=args.tamanho_chunk)
+    print(f"✓ {n:,} clientes gerados em {time.perf_counter() - inicio:.1f}s")
+    for arquivo in arquivos:
+        print(f"✓ Arquivo salvo: {arquivo} ({os.path.getsize(arquivo) / 2**20:,.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+"""
+Estatísticas Mescláveis para Processamento em Chunks
+Priceless Bank - Mastercard Challenge 2025
+
+Acumuladores que recebem a base em pedaços e podem ser mesclados entre si,
+de modo que o resultado final não depende de como as linhas foram
+divididas. A memória usada depende do número de grupos (e do tamanho dos
+resumos de quantis), nunca do número de linhas.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _mesclar_momentos(n_a, media_a, m2_a, n_b, media_b, m2_b):
+    # Fórmula de Chan et al. para combinar médias e somas de quadrados dos desvios
+    n = n_a + n_b
+    delta = media_b - media_a
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = np.where(n > 0, media_a + delta * n_b / n, 0.0)
+        m2 = m2_a + m2_b + np.where(n > 0, delta ** 2 * n_a * n_b / n, 0.0)
+    return n, media, m2
+
+
+class EstatisticasGrupo:
+    """
+    Contagem, soma e soma dos quadrados dos desvios (M2) de uma medida por
+    grupo. Guardar M2 em vez da soma de quadrados bruta evita o
+    cancelamento numérico da fórmula E[x²] - E[x]².
+    """
+
+    def __init__(self):
+        self.tabela = pd.DataFrame({'n': pd.Series(dtype='int64'),
+                                    'soma': pd.Series(dtype='float64'),
+                                    'm2': pd.Series(dtype='float64')})
+
+    @staticmethod
+    def _parcial(chaves, valores):
+        validos = valores.notna()
+        valores = valores[validos]
+        if isinstance(chaves, list):
+            chaves = [c[validos] for c in chaves]
+        else:
+            chaves = chaves[validos]
+        grupos = valores.groupby(chaves, observed=True, sort=False)
+        media = grupos.transform('mean')
+        return pd.DataFrame({
+            'n': grupos.size(),
+            'soma': grupos.sum(),
+            'm2': ((valores - media) ** 2).groupby(chaves, observed=True, sort=False).sum(),
+        })
+
+    def atualizar(self, chaves, valores):
+        self.mesclar_tabela(self._parcial(chaves, valores))
+
+    def remover(self, chaves, valores):
+        """
+        Retira valores já contabilizados. A mesma fórmula de mesclagem vale
+        com contagem, soma e M2 negativos; grupos que ficam vazios saem da
+        tabela.
+        """
+        parcial = self._parcial(chaves, valores)
+        if parcial.empty:
+            return
+        self.mesclar_tabela(-parcial)
+        self.tabela['m2'] = self.tabela['m2'].clip(lower=0.0)
+        self.tabela = self.tabela[self.tabela['n'] > 0]
+
+    def mesclar(self, outra):
+        self.mesclar_tabela(outra.tabela)
+
+    def mesclar_tabela(self, parcial):
+        if self.tabela.empty:
+            self.tabela = parcial.copy()
+            return
+        a, b = self.tabela.align(parcial, join='outer', fill_value=0)
+        n_a = a['n'].to_numpy('float64')
+        n_b = b['n'].to_numpy('float64')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media_a = np.where(n_a != 0, a['soma'] / n_a, 0.0)
+            media_b = np.where(n_b != 0, b['soma'] / n_b, 0.0)
+        _, _, m2 = _mesclar_momentos(n_a, media_a, a['m2'].to_numpy(),
+                                     n_b, media_b, b['m2'].to_numpy())
+        self.tabela = pd.DataFrame({
+            'n': (a['n'] + b['n']).astype('int64'),
+            'soma': a['soma'] + b['soma'],
+            'm2': m2,
+        }, index=a.index)
+
+    def contagem(self):
+        return self.tabela['n']
+
+    def media(self):
+        return self.tabela['soma'] / self.tabela['n']
+
+    def desvio(self, ddof=1):
+        return np.sqrt(self.tabela['m2'] / (self.tabela['n'] - ddof))
+
+
+# Erro de posição dos resumos de quantis, como fração do número de valores,
+# e número de centróides até o qual eles ainda são exatos
+ERRO_QUANTIS = 0.001
+LIMITE_EXATO = 4096
+
+
+class ResumoQuantis:
+    """
+    Resumo mesclável de quantis de uma medida (t-digest com fusão em lote).
+
+    Guarda centróides (valor, peso) ordenados, mais o mínimo e o máximo
+    exatos. Cada valor distinto começa como um centróide exato; enquanto
+    houver até `limite_exato` centróides, os quantis são exatos, com a mesma
+    interpolação linear do numpy/pandas. Acima disso, os centróides vizinhos
+    são fundidos pela escala arco-seno do t-digest, que mantém o erro de
+    posição em até cerca de erro·n no meio da distribuição e bem menor nas
+    caudas, com memória da ordem de 1/erro centróides.
+    """
+
+    def __init__(self, erro=ERRO_QUANTIS, limite_exato=LIMITE_EXATO):
+        self.erro = erro
+        self.limite_exato = limite_exato
+        self.valores = np.empty(0, dtype='float64')
+        self.pesos = np.empty(0, dtype='int64')
+        self.exatos = np.empty(0, dtype=bool)    # centróide com um único valor distinto
+        self.minimo = np.inf
+        self.maximo = -np.inf
+
+    @property
+    def n(self):
+        return int(self.pesos.sum())
+
+    def atualizar(self, valores):
+        valores = np.asarray(valores, dtype='float64')
+        valores = valores[~np.isnan(valores)]
+        if len(valores) == 0:
+            return
+        distintos, contagens = np.unique(valores, return_counts=True)
+        self._juntar(distintos, contagens, np.ones(len(distintos), dtype=bool),
+                     distintos[0], distintos[-1])
+
+    def mesclar(self, outro):
+        self._juntar(outro.valores, outro.pesos, outro.exatos, outro.minimo, outro.maximo)
+
+    def _juntar(self, valores, pesos, exatos, minimo, maximo):
+        valores = np.concatenate([self.valores, valores])
+        pesos = np.concatenate([self.pesos, pesos])
+        exatos = np.concatenate([self.exatos, exatos])
+        # Por valor; no empate, os exatos primeiro, para fundir os de mesmo valor
+        ordem = np.lexsort((~exatos, valores))
+        valores, pesos, exatos = valores[ordem], pesos[ordem], exatos[ordem]
+        repetido = np.r_[False, (valores[1:] == valores[:-1]) & exatos[1:] & exatos[:-1]]
+        if repetido.any():
+            centroide = np.cumsum(~repetido) - 1
+            pesos = np.bincount(centroide, weights=pesos).astype('int64')
+            valores, exatos = valores[~repetido], exatos[~repetido]
+        self.valores, self.pesos, self.exatos = valores, pesos, exatos
+        self.minimo = min(self.minimo, minimo)
+        self.maximo = max(self.maximo, maximo)
+        if len(self.valores) > self.limite_exato:
+            self._comprimir()
+
+    def _comprimir(self):
+        # Escala k1 do t-digest: k = δ/2π·asin(2q - 1). Cada unidade de k
+        # cobre no máximo n·π/δ valores; com δ = π/(2·erro), um centróide
+        # tem até 2·erro·n valores e o erro de posição fica em erro·n
+        delta = np.pi / (2 * self.erro)
+        acumulado = np.cumsum(self.pesos)
+        q_inicio = (acumulado - self.pesos) / acumulado[-1]
+        k = np.floor(delta / (2 * np.pi) * np.arcsin(np.clip(2 * q_inicio - 1, -1, 1)))
+        _, centroide, fundidos = np.unique(k, return_inverse=True, return_counts=True)
+        pesos = np.bincount(centroide, weights=self.pesos)
+        self.valores = np.bincount(centroide, weights=self.valores * self.pesos) / pesos
+        self.pesos = pesos.astype('int64')
+        self.exatos = (fundidos == 1) & np.bincount(centroide, weights=self.exatos).astype(bool)
+
+    def quantil(self, q):
+        """Quantil (ou quantis, para uma lista de q) com interpolação linear."""
+        n = self.n
+        if n == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        # Cada centróide exato ocupa as posições [início, fim] com o mesmo
+        # valor; um fundido é representado pela média na posição central
+        inicio = np.cumsum(self.pesos) - self.pesos
+        fim = inicio + self.pesos - 1
+        centro = (inicio + fim) / 2
+        posicoes = np.column_stack([np.where(self.exatos, inicio, centro),
+                                    np.where(self.exatos, fim, centro)]).ravel()
+        posicoes = np.r_[0, posicoes, n - 1]
+        valores = np.r_[self.minimo, np.repeat(self.valores, 2), self.maximo]
+        manter = np.r_[True, np.diff(posicoes) > 0]
+        resultado = np.interp((n - 1) * np.asarray(q, dtype='float64'),
+                              posicoes[manter], valores[manter])
+        return resultado if np.ndim(q) else float(resultado)
+
+    def resumo_box(self):
+        """Quartis e limites dos bigodes (1,5·IQR, sem passar dos extremos) para um box plot."""
+        q1, mediana, q3 = self.quantil([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        return {
+            'q1': q1, 'mediana': mediana, 'q3': q3,
+            'limite_inferior': max(self.minimo, q1 - 1.5 * iqr),
+            'limite_superior': min(self.maximo, q3 + 1.5 * iqr),
+            'minimo': self.minimo, 'maximo': self.maximo,
+        }
+
+
+class QuantisGrupo:
+    """
+    Um ResumoQuantis por grupo. Recebe a base em chunks ou em partes
+    calculadas em paralelo (mesclar) e responde medianas, percentis e
+    resumos de box plot sem guardar as linhas.
+    """
+
+    def __init__(self, erro=ERRO_QUANTIS, limite_exato=LIMITE_EXATO):
+        self.erro = erro
+        self.limite_exato = limite_exato
+        self.resumos = {}
+
+    def atualizar(self, chaves, valores):
+        for grupo, parte in valores.groupby(chaves, observed=True, sort=False):
+            if grupo not in self.resumos:
+                self.resumos[grupo] = ResumoQuantis(self.erro, self.limite_exato)
+            self.resumos[grupo].atualizar(parte.to_numpy('float64'))
+
+    def mesclar(self, outra):
+        for grupo, resumo in outra.resumos.items():
+            if grupo not in self.resumos:
+                self.resumos[grupo] = ResumoQuantis(self.erro, self.limite_exato)
+            self.resumos[grupo].mesclar(resumo)
+
+    def _grupos(self):
+        return sorted(self.resumos)
+
+    def quantil(self, q):
+        """Quantil `q` de cada grupo (Series indexada pelo grupo)."""
+        grupos = self._grupos()
+        return pd.Series([self.resumos[g].quantil(q) for g in grupos],
+                         index=pd.Index(grupos, tupleize_cols=True), dtype='float64')
+
+    def resumo_box(self):
+        """Quartis e limites de box plot de cada grupo (uma linha por grupo)."""
+        grupos = self._grupos()
+        return pd.DataFrame([self.resumos[g].resumo_box() for g in grupos],
+                            index=pd.Index(grupos, tupleize_cols=True))
+
+
+class MatrizComomentos:
+    """
+    Co-momentos de um conjunto de variáveis, para a matriz de Pearson.
+
+    Como DataFrame.corr(), cada par usa as linhas em que as duas variáveis
+    estão preenchidas. Por isso os acumuladores são matrizes p x p: para o
+    par (i, j), `n[i, j]` linhas, `media[i, j]` e `m2[i, j]` da variável i
+    nessas linhas e o co-momento `c[i, j]`. Cada chunk é reduzido com alguns
+    produtos de matrizes sobre os valores deslocados pela média do chunk
+    (sem o cancelamento de E[xy] - E[x]E[y]) e os chunks se combinam pela
+    fórmula de Chan, par a par.
+    """
+
+    def __init__(self, variaveis):
+        self.variaveis = list(variaveis)
+        p = len(self.variaveis)
+        self.n = np.zeros((p, p), dtype='int64')
+        self.media = np.zeros((p, p))
+        self.m2 = np.zeros((p, p))
+        self.c = np.zeros((p, p))
+
+    def atualizar(self, df, tamanho_bloco=None):
+        """
+        Acrescenta as linhas de `df` (as colunas de `variaveis`); com
+        `tamanho_bloco`, bloco a bloco, com temporários do tamanho do bloco.
+        """
+        if tamanho_bloco and len(df) > tamanho_bloco:
+            for inicio in range(0, len(df), tamanho_bloco):
+                self.atualizar(df.iloc[inicio:inicio + tamanho_bloco])
+            return
+        valores = df[self.variaveis].to_numpy('float64')
+        if len(valores) == 0:
+            return
+        validos = ~np.isnan(valores)
+        pesos = validos.astype('float64')
+        contagem = validos.sum(axis=0)
+        deslocamento = np.divide(np.where(validos, valores, 0.0).sum(axis=0), contagem,
+                                 out=np.zeros(len(contagem)), where=contagem > 0)
+        x = np.where(validos, valores - deslocamento, 0.0)
+
+        parcial = MatrizComomentos(self.variaveis)
+        n = pesos.T @ pesos
+        soma = x.T @ pesos              # soma[i, j]: x_i nas linhas com i e j preenchidas
+        quadrados = (x * x).T @ pesos
+        produtos = x.T @ x
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = np.where(n > 0, soma / n, 0.0)
+        parcial.n = n.astype('int64')
+        parcial.media = media + deslocamento[:, None]
+        parcial.m2 = np.maximum(quadrados - soma * media, 0.0)
+        parcial.c = produtos - soma * media.T
+        self.mesclar(parcial)
+
+    def mesclar(self, outra):
+        n = self.n + outra.n
+        delta = outra.media - self.media
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fator = np.where(n > 0, self.n * outra.n / n, 0.0)
+            self.media = np.where(n > 0, self.media + delta * outra.n / n, 0.0)
+        self.m2 = self.m2 + outra.m2 + delta ** 2 * fator
+        self.c = self.c + outra.c + delta * delta.T * fator
+        self.n = n
+
+    def pearson(self):
+        """Matriz de correlação (NaN para pares com menos de 2 linhas ou variância nula)."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r = np.clip(self.c / np.sqrt(self.m2 * self.m2.T), -1.0, 1.0)
+        r[self.n < 2] = np.nan
+        diagonal = np.diag_indices_from(r)
+        r[diagonal] = np.where(np.isnan(r[diagonal]), np.nan, 1.0)
+        return pd.DataFrame(r, index=self.variaveis, columns=self.variaveis)
+
+    def pares(self, n=None):
+        """
+        Pares (var1, var2, r) em ordem decrescente de |r|, sem os indefinidos;
+        empates na ordem da matriz.
+        """
+        r = self.pearson().to_numpy()
+        i, j = np.triu_indices(len(self.variaveis), k=1)
+        valores = r[i, j]
+        definidos = ~np.isnan(valores)
+        i, j, valores = i[definidos], j[definidos], valores[definidos]
+        ordem = np.argsort(-np.abs(valores), kind='stable')[:n]
+        return [(self.variaveis[a], self.variaveis[b], float(valores[k]))
+                for a, b, k in zip(i[ordem], j[ordem], ordem)]
+
+
+class ComomentosGrupo:
+    """Uma MatrizComomentos por grupo (por exemplo, por Estado ou Segmento)."""
+
+    def __init__(self, variaveis):
+        self.variaveis = list(variaveis)
+        self.matrizes = {}
+
+    def atualizar(self, chaves, df, tamanho_bloco=None):
+        if tamanho_bloco and len(df) > tamanho_bloco:
+            # As linhas de cada grupo são copiadas pelo groupby: em blocos, só as do bloco
+            for inicio in range(0, len(df), tamanho_bloco):
+                fim = inicio + tamanho_bloco
+                self.atualizar(chaves[inicio:fim], df.iloc[inicio:fim])
+            return
+        for grupo, linhas in df.groupby(chaves, observed=True, sort=False):
+            if grupo not in self.matrizes:
+                self.matrizes[grupo] = MatrizComomentos(self.variaveis)
+            self.matrizes[grupo].atualizar(linhas)
+
+    def mesclar(self, outra):
+        for grupo, matriz in outra.matrizes.items():
+            if grupo not in self.matrizes:
+                self.matrizes[grupo] = MatrizComomentos(self.variaveis)
+            self.matrizes[grupo].mesclar(matriz)
+
+    def pearson(self, grupo):
+        return self.matrizes[grupo].pearson()
+
+    def pares(self, n=None):
+        """Pares mais correlacionados de cada grupo, em ordem de grupo."""
+        return {grupo: self.matrizes[grupo].pares(n) for grupo in sorted(self.matrizes)}
+
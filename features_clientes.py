@@ -0,0 +1,121 @@
+"""
+Engenharia de Features dos Clientes
+Priceless Bank - Mastercard Challenge 2025
+
+Cálculo único e vetorizado das features derivadas usadas por
+analise_segmentacao.py, analise_renda_idade.py e pelos scripts que pontuam
+clientes com o modelo salvo: Idade, Tempo_Cliente_Anos, faixas etárias (6
+e 10 faixas), faixa de renda e conta adicional binária.
+
+As datas em texto são convertidas com formato fixo e uma única vez por
+valor distinto (milhões de clientes têm poucos milhares de datas
+distintas); idade e tempo de cliente saem de contagens inteiras de dias.
+As faixas são atribuídas por busca binária nos limites, com a mesma
+semântica de pd.cut (intervalos fechados à direita).
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+DATA_REFERENCIA = datetime(2025, 10, 3)
+FORMATO_NASCIMENTO = '%d/%m/%Y'
+FORMATO_CRIACAO_CONTA = '%Y-%m-%d'
+DIAS_POR_ANO = 365.25
+
+# Faixas: (coluna de origem, limites, rótulos)
+FAIXA_ETARIA = ('Idade', [0, 25, 35, 45, 55, 65, 100],
+                ['18-25', '26-35', '36-45', '46-55', '56-65', '65+'])
+FAIXA_ETARIA_DETALHADA = ('Idade', [0, 25, 30, 35, 40, 45, 50, 55, 60, 65, 100],
+                          ['18-25', '26-30', '31-35', '36-40', '41-45',
+                           '46-50', '51-55', '56-60', '61-65', '65+'])
+FAIXA_RENDA = ('Renda_Anual', [0, 30000, 50000, 80000, 120000, float('inf')],
+               ['Até 30k', '30k-50k', '50k-80k', '80k-120k', 'Acima 120k'])
+FAIXAS = {
+    'Faixa_Etaria': FAIXA_ETARIA,
+    'Faixa_Etaria_Detalhada': FAIXA_ETARIA_DETALHADA,
+    'Faixa_Renda': FAIXA_RENDA,
+}
+FAIXAS_SEGMENTACAO = {'Faixa_Etaria': FAIXA_ETARIA, 'Faixa_Renda': FAIXA_RENDA}
+CONTA_ADICIONAL = {'Sim': 1, 'Não': 0}
+# Features do K-Means, na ordem das colunas da matriz e do modelo salvo
+VARIAVEIS_CLUSTER = ['Idade', 'Renda_Anual', 'Numero_Cartoes',
+                     'Possui_Conta_Adicional_Bin', 'Tempo_Cliente_Anos']
+
+
+def converter_datas(valores, formato):
+    """
+    Converte uma coluna de datas para datetime64. Texto é convertido uma vez
+    por valor distinto; colunas já em datetime64 (base colunar) passam direto.
+    """
+    if pd.api.types.is_datetime64_any_dtype(valores):
+        return valores
+    codigos, unicos = pd.factorize(valores)
+    datas = pd.DatetimeIndex(pd.to_datetime(unicos, format=formato, errors='coerce'))
+    return pd.Series(datas.take(codigos, allow_fill=True), index=valores.index, name=valores.name)
+
+
+def dias_desde(datas, data_referencia=DATA_REFERENCIA):
+    """Dias inteiros de cada data até a referência (float64, NaN onde a data falta)."""
+    dias = np.datetime64(data_referencia, 'D') - datas.to_numpy().astype('datetime64[D]')
+    resultado = dias.astype('int64').astype('float64')
+    resultado[np.isnat(dias)] = np.nan
+    return resultado
+
+
+def classificar(valores, bins, labels):
+    """Faixa de cada valor, equivalente a pd.cut(valores, bins, labels=labels)."""
+    limites = np.asarray(bins, dtype='float64')
+    codigos = np.searchsorted(limites, np.asarray(valores, dtype='float64'), side='left') - 1
+    # Abaixo (ou no) primeiro limite, acima do último e NaN ficam sem faixa
+    codigos[(codigos < 0) | (codigos >= len(labels))] = -1
+    return pd.Categorical.from_codes(codigos, categories=labels, ordered=True)
+
+
+def mapear_binario(valores, mapa):
+    """Series.map(mapa) resolvido uma vez por valor distinto."""
+    codigos, unicos = pd.factorize(valores)
+    tabela = np.array([mapa.get(u, np.nan) for u in unicos] + [np.nan], dtype='float64')
+    resultado = tabela[codigos]
+    if not np.isnan(resultado).any():
+        return resultado.astype('int64')
+    return resultado
+
+
+def calcular_features(df, data_referencia=DATA_REFERENCIA, faixas=FAIXAS,
+                      conta_adicional=CONTA_ADICIONAL):
+    """
+    Acrescenta a `df`, no lugar, as features cujas colunas de origem estão
+    presentes: Idade (Data_Nascimento), Tempo_Cliente_Anos
+    (Data_Criacao_Conta), cada faixa de `faixas` e
+    Possui_Conta_Adicional_Bin. As datas ficam em datetime64 e a renda, que a
+    base colunar guarda em float32, em float64.
+    """
+    if 'Renda_Anual' in df:
+        df['Renda_Anual'] = df['Renda_Anual'].astype('float64')
+
+    if 'Data_Nascimento' in df:
+        df['Data_Nascimento'] = converter_datas(df['Data_Nascimento'], FORMATO_NASCIMENTO)
+        df['Idade'] = np.round(dias_desde(df['Data_Nascimento'], data_referencia) / DIAS_POR_ANO, 0)
+
+    if 'Data_Criacao_Conta' in df:
+        df['Data_Criacao_Conta'] = converter_datas(df['Data_Criacao_Conta'], FORMATO_CRIACAO_CONTA)
+        df['Tempo_Cliente_Anos'] = np.round(
+            dias_desde(df['Data_Criacao_Conta'], data_referencia) / DIAS_POR_ANO, 2)
+
+    for nome, (coluna, bins, labels) in faixas.items():
+        if coluna in df:
+            df[nome] = classificar(df[coluna], bins, labels)
+
+    if 'Possui_Conta_Adicional' in df:
+        df['Possui_Conta_Adicional_Bin'] = mapear_binario(df['Possui_Conta_Adicional'], conta_adicional)
+    return df
+
+
+def criar_features(df_clientes, data_referencia=DATA_REFERENCIA, faixas=FAIXAS_SEGMENTACAO,
+                   conta_adicional=CONTA_ADICIONAL):
+    """Features da segmentação, sem alterar `df_clientes` (ver calcular_features)."""
+    # As features só substituem ou acrescentam colunas: uma cópia rasa basta
+    # para não alterar a base carregada, sem duplicar as colunas originais
+    return calcular_features(df_clientes.copy(deep=False), data_referencia, faixas, conta_adicional)
@@ -0,0 +1,75 @@
+"""
+Frequências Categóricas por Grupo
+Priceless Bank - Mastercard Challenge 2025
+
+Os N valores mais frequentes de uma coluna categórica (Estado, Cidade...)
+dentro de cada grupo (Segmento, Faixa_Renda, Estado...), com contagem e
+participação no grupo, em uma passada sobre códigos inteiros de categoria:
+cada par (grupo, valor) vira um único inteiro, contado com bincount, e uma
+ordenação lexicográfica põe cada grupo em ordem decrescente de contagem.
+
+Empates ficam com o menor valor na ordem das categorias (ou na ordem
+crescente, para colunas não categóricas), como Series.mode(). Com `pesos`,
+as linhas já podem ser contagens agregadas, por exemplo células de um
+CuboAgregado.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Acima deste número de pares (grupo, valor) possíveis, a contagem usa
+# np.unique nos pares observados em vez de um vetor denso
+LIMITE_DENSO = 1 << 24
+
+
+def _codigos(chave):
+    categorias = pd.Categorical(chave)
+    return categorias.codes.astype('int64'), categorias.categories
+
+
+def top_categorias(grupos, valores, n=1, pesos=None):
+    """
+    Os `n` valores mais frequentes de `valores` em cada grupo de `grupos`.
+
+    Retorna um DataFrame indexado por (grupo, posicao), com posicao a partir
+    de 1, e colunas valor, contagem e participacao (fração do grupo).
+    Linhas com grupo ou valor ausente são ignoradas.
+    """
+    codigos_grupo, categorias_grupo = _codigos(grupos)
+    codigos_valor, categorias_valor = _codigos(valores)
+    n_valores = max(len(categorias_valor), 1)
+
+    validos = (codigos_grupo >= 0) & (codigos_valor >= 0)
+    pares = codigos_grupo[validos] * n_valores + codigos_valor[validos]
+    pesos = None if pesos is None else np.asarray(pesos)[validos]
+
+    if len(categorias_grupo) * n_valores <= LIMITE_DENSO:
+        contagens = np.bincount(pares, weights=pesos, minlength=len(categorias_grupo) * n_valores)
+        celulas = np.flatnonzero(contagens)
+        contagens = contagens[celulas]
+    else:
+        celulas, inverso = np.unique(pares, return_inverse=True)
+        contagens = np.bincount(inverso, weights=pesos)
+    if pesos is None or np.issubdtype(pesos.dtype, np.integer):
+        contagens = contagens.astype('int64')
+
+    grupo, valor = np.divmod(celulas, n_valores)
+    total_grupo = np.bincount(grupo, weights=contagens, minlength=len(categorias_grupo))
+
+    # Grupo crescente, contagem decrescente, código de valor crescente
+    ordem = np.lexsort((valor, -contagens, grupo))
+    grupo, valor, contagens = grupo[ordem], valor[ordem], contagens[ordem]
+    inicio_grupo = np.flatnonzero(np.r_[True, grupo[1:] != grupo[:-1]])
+    tamanho_grupo = np.diff(np.r_[inicio_grupo, len(grupo)])
+    posicao = np.arange(len(grupo)) - np.repeat(inicio_grupo, tamanho_grupo) + 1
+
+    manter = posicao <= n
+    grupo, valor, contagens, posicao = grupo[manter], valor[manter], contagens[manter], posicao[manter]
+    indice = pd.MultiIndex.from_arrays(
+        [categorias_grupo.take(grupo), posicao],
+        names=[getattr(grupos, 'name', None) or 'grupo', 'posicao'])
+    return pd.DataFrame({
+        'valor': categorias_valor.take(valor),
+        'contagem': contagens,
+        'participacao': contagens / total_grupo[grupo],
+    }, index=indice)
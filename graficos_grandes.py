@@ -0,0 +1,175 @@
+"""
+Gráficos de Dispersão para Bases Grandes
+Priceless Bank - Mastercard Challenge 2025
+
+px.scatter e px.scatter_3d gravam cada cliente como um ponto no HTML; com
+milhões de clientes o arquivo passa de centenas de MB. Acima de um limite de
+pontos, os gráficos passam a ser agregados antes de chegar ao plotly:
+
+- densidade: os eixos são divididos em uma grade e cada célula ocupada vira
+  um ponto no centróide dos seus clientes, com tamanho pela quantidade, cor
+  pelo grupo predominante e, no hover, clientes, participação do grupo
+  predominante e médias das medidas pedidas;
+- amostra: amostra estratificada por grupo, proporcional ao tamanho de cada
+  um, que mantém todos os pontos extremos de cada grupo (fora dos quantis
+  0,1% e 99,9% em algum eixo); o hover mostra quantos clientes cada ponto
+  representa.
+
+Abaixo do limite (modo exato), o plotly recebe os dados sem alteração.
+
+Box plots são desenhados a partir de resumos de quantis (caixa), sem enviar
+os valores ao plotly em nenhum modo.
+
+O plotly só é importado quando um gráfico é montado, para que execuções sem
+gráficos não paguem a importação.
+"""
+
+import numpy as np
+import pandas as pd
+
+from frequencias_categoricas import top_categorias
+
+MODOS = ('auto', 'exato', 'densidade', 'amostra')
+LIMITE_PONTOS = 100_000
+BINS_GRADE = {2: 200, 3: 40}
+QUANTIL_EXTREMO = 0.001
+
+
+def escolher_modo(n_pontos, modo='auto', limite=LIMITE_PONTOS):
+    if modo not in MODOS:
+        raise ValueError(f"Modo de gráfico inválido: {modo!r} (esperado: {', '.join(MODOS)})")
+    if modo == 'auto':
+        return 'exato' if n_pontos <= limite else 'densidade'
+    return modo
+
+
+def agregar_em_grade(df, eixos, grupo, bins, medidas=()):
+    """Uma linha por célula ocupada da grade sobre `eixos`."""
+    valores = df[list(eixos)].to_numpy('float64')
+    validos = ~np.isnan(valores).any(axis=1)
+    valores = valores[validos]
+    grupos = df[grupo][validos]
+
+    celula = np.zeros(len(valores), dtype='int64')
+    for i in range(len(eixos)):
+        limites = np.histogram_bin_edges(valores[:, i], bins=bins)
+        indice = np.clip(np.searchsorted(limites, valores[:, i], side='right') - 1, 0, bins - 1)
+        celula = celula * bins + indice
+    _, celula, clientes = np.unique(celula, return_inverse=True, return_counts=True)
+
+    dados = {}
+    for i, eixo in enumerate(eixos):
+        dados[eixo] = np.bincount(celula, weights=valores[:, i]) / clientes
+    for medida in medidas:
+        coluna = df[medida][validos].to_numpy('float64')
+        presentes = ~np.isnan(coluna)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dados[medida] = (np.bincount(celula[presentes], weights=coluna[presentes], minlength=len(clientes))
+                             / np.bincount(celula[presentes], minlength=len(clientes)))
+    dados['Clientes'] = clientes
+
+    predominante = top_categorias(pd.Series(celula, name='celula'), grupos, n=1).droplevel('posicao')
+    resultado = pd.DataFrame(dados)
+    resultado[grupo] = predominante['valor'].reindex(resultado.index).to_numpy()
+    resultado['Participacao'] = predominante['participacao'].reindex(resultado.index).to_numpy()
+    if isinstance(df[grupo].dtype, pd.CategoricalDtype):
+        resultado[grupo] = pd.Categorical(resultado[grupo], dtype=df[grupo].dtype)
+    return resultado
+
+
+def amostra_estratificada(df, eixos, grupo, tamanho, random_state=42, quantil_extremo=QUANTIL_EXTREMO):
+    """
+    Até `tamanho` clientes: extremos de cada grupo (no máximo um quinto da
+    amostra) e, do restante, uma cota de cada grupo proporcional ao seu
+    tamanho. A coluna Representa indica quantos clientes cada ponto vale.
+    """
+    rng = np.random.default_rng(random_state)
+    codigos, _ = pd.factorize(df[grupo])
+    n_grupos = codigos.max() + 1
+    valores = df[list(eixos)]
+
+    grupos = valores.groupby(codigos)
+    inferior = grupos.quantile(quantil_extremo).reindex(range(n_grupos)).to_numpy()
+    superior = grupos.quantile(1 - quantil_extremo).reindex(range(n_grupos)).to_numpy()
+    posicao_grupo = np.maximum(codigos, 0)
+    matriz = valores.to_numpy('float64')
+    extremo = ((matriz < inferior[posicao_grupo]) | (matriz > superior[posicao_grupo])).any(axis=1)
+    extremo &= codigos >= 0
+
+    # Posição aleatória de cada cliente dentro do seu grupo (e do seu tipo)
+    prioridade = rng.random(len(df))
+    ordem = np.lexsort((prioridade, extremo, codigos))
+    chave = codigos[ordem] * 2 + extremo[ordem]
+    inicio = np.flatnonzero(np.r_[True, chave[1:] != chave[:-1]])
+    posicao = np.empty(len(df), dtype='int64')
+    posicao[ordem] = np.arange(len(df)) - np.repeat(inicio, np.diff(np.r_[inicio, len(df)]))
+
+    validos = codigos >= 0
+    total_extremos = np.bincount(codigos[extremo], minlength=n_grupos)
+    total_comuns = np.bincount(codigos[validos & ~extremo], minlength=n_grupos)
+    cota_extremos = np.ceil(total_extremos * min(1.0, (tamanho // 5) / max(total_extremos.sum(), 1)))
+    restante = tamanho - cota_extremos.sum()
+    cota_comuns = np.maximum(1, np.round(total_comuns * restante / max(total_comuns.sum(), 1)))
+    cota_comuns = np.minimum(cota_comuns, total_comuns)
+
+    cota = np.where(extremo, cota_extremos[posicao_grupo], cota_comuns[posicao_grupo])
+    manter = validos & (posicao < cota)
+    amostra = df[manter].copy()
+
+    total = np.where(extremo, total_extremos[posicao_grupo], total_comuns[posicao_grupo])[manter]
+    amostra['Representa'] = total / cota[manter]
+    amostra['Extremo'] = extremo[manter]
+    return amostra
+
+
+def dispersao(df, eixos, cor, modo='auto', limite=LIMITE_PONTOS, medidas=(), bins=None,
+              random_state=42, **kwargs):
+    """
+    px.scatter (2 eixos) ou px.scatter_3d (3 eixos) colorido por `cor`.
+
+    No modo exato, `df` e `kwargs` chegam ao plotly sem alteração. Nos
+    agregados, `size` e `hover_data` dão lugar à quantidade de clientes e
+    às médias de `medidas`. Retorna (figura, modo usado).
+    """
+    import plotly.express as px
+
+    modo = escolher_modo(len(df), modo, limite)
+    plotar = px.scatter if len(eixos) == 2 else px.scatter_3d
+    coordenadas = dict(zip('xyz', eixos))
+    if modo == 'exato':
+        return plotar(df, **coordenadas, color=cor, **kwargs), modo
+
+    kwargs.pop('size', None)
+    kwargs.pop('hover_data', None)
+    if modo == 'densidade':
+        dados = agregar_em_grade(df, eixos, cor, bins or BINS_GRADE[len(eixos)], medidas)
+        hover = {'Clientes': ':,', 'Participacao': ':.1%', **{m: ':,.2f' for m in medidas}}
+        fig = plotar(dados, **coordenadas, color=cor, size='Clientes', hover_data=hover, **kwargs)
+        descricao = f"{len(df):,} clientes agregados em {len(dados):,} células"
+    else:
+        dados = amostra_estratificada(df, eixos, cor, limite, random_state)
+        fig = plotar(dados, **coordenadas, color=cor,
+                     hover_data={'Representa': ':,.0f', 'Extremo': True, **{m: True for m in medidas}},
+                     **kwargs)
+        descricao = f"amostra estratificada de {len(dados):,} de {len(df):,} clientes"
+    fig.update_layout(title_text=f"{fig.layout.title.text}<br><sup>{descricao}</sup>")
+    return fig, modo
+
+
+def caixa(resumo, nome, media=None, desvio=None, **kwargs):
+    """
+    go.Box de uma caixa só, com quartis e bigodes pré-calculados (por exemplo,
+    ResumoQuantis.resumo_box()). Com `media` e `desvio`, mostra média e ±1 desvio.
+    """
+    import plotly.graph_objects as go
+
+    estatisticas = dict(q1=[resumo['q1']], median=[resumo['mediana']], q3=[resumo['q3']],
+                        lowerfence=[resumo['limite_inferior']], upperfence=[resumo['limite_superior']])
+    if media is not None:
+        estatisticas['mean'] = [media]
+        if desvio is not None:
+            estatisticas['sd'] = [desvio]
+            kwargs.setdefault('boxmean', 'sd')
+        else:
+            kwargs.setdefault('boxmean', True)
+    return go.Box(x=[nome], name=nome, **estatisticas, **kwargs)
@@ -0,0 +1,245 @@
+"""
+Instrumentação das Execuções
+Priceless Bank - Mastercard Challenge 2025
+
+Mede cada seção de uma execução (carga, features, cada etapa e agregação,
+a varredura de k com cada ajuste, cada gráfico e cada exportação) e grava
+um relatório em JSON ao lado das saídas, com um trace opcional no formato
+de eventos do Chrome (abre no Perfetto, no chrome://tracing ou no
+speedscope, como flamegraph).
+
+Modos:
+
+- leve (padrão): relógio, CPU do processo, RSS atual e máximo e linhas;
+  custa alguns microssegundos por seção e pode ficar sempre ligado;
+- detalhada: também o pico de memória alocada em cada seção (tracemalloc,
+  que vê os arrays do numpy e do pandas), com custo bem maior;
+- desligada: as seções não registram nada.
+
+Seções podem ser aninhadas; cada uma registra o tempo total e o próprio
+(sem as subseções da mesma thread). Seções abertas em threads diferentes
+(etapas agendadas em paralelo, ver agendador_etapas.py) têm pilhas
+separadas e aparecem em linhas próprias do trace; no modo detalhado, o pico
+de memória de uma seção inclui o que as outras threads alocaram no mesmo
+intervalo. Trechos medidos em processos de trabalho (ajustes da varredura,
+gráficos) entram com o pid do processo; o relógio monotônico usado é o
+mesmo para todos os processos da máquina.
+
+Uso:
+    import instrumentacao
+    instrumentacao.configurar('leve')
+    with instrumentacao.secao('carregar') as secao:
+        df = carregar_dados()
+        secao['linhas'] = len(df)
+    instrumentacao.atual().gravar('execucao.json', trace='execucao.trace.json')
+"""
+
+import json
+import os
+import platform
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:     # Windows: sem RSS máximo
+    resource = None
+
+MODOS_INSTRUMENTACAO = ('leve', 'detalhada', 'desligada')
+_PAGINA = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_atual_mb():
+    try:
+        with open('/proc/self/statm', 'rb') as statm:
+            return int(statm.read().split()[1]) * _PAGINA / 2**20
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def rss_maximo_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if platform.system() == 'Darwin' else rss / 2**10
+
+
+def medir(funcao, *args, **kwargs):
+    """
+    Executa `funcao` e retorna (resultado, medição) com início (relógio
+    monotônico), segundos, CPU e pid; para trechos que rodam em outro processo.
+    """
+    inicio, cpu = time.perf_counter(), time.process_time()
+    resultado = funcao(*args, **kwargs)
+    return resultado, {'inicio': inicio, 'segundos': time.perf_counter() - inicio,
+                       'cpu_segundos': time.process_time() - cpu, 'pid': os.getpid()}
+
+
+def contar_linhas(*valores):
+    """Linhas do primeiro DataFrame, Series ou array entre os valores (None se não houver)."""
+    for valor in valores:
+        if hasattr(valor, 'shape') and getattr(valor, 'ndim', 0) >= 1:
+            return int(valor.shape[0])
+    return None
+
+
+class Instrumentacao:
+    """Registro das seções de uma execução."""
+
+    def __init__(self, modo='leve', nome='execucao'):
+        if modo not in MODOS_INSTRUMENTACAO:
+            raise ValueError(f"Modo de instrumentação inválido: {modo!r} "
+                             f"(esperado: {', '.join(MODOS_INSTRUMENTACAO)})")
+        self.modo = modo
+        self.nome = nome
+        self.secoes = []
+        self._local = threading.local()
+        self.inicio = time.perf_counter()
+        self.criado_em = datetime.now().isoformat(timespec='seconds')
+        self._tracemalloc = modo == 'detalhada' and not tracemalloc.is_tracing()
+        if self._tracemalloc:
+            tracemalloc.start()
+
+    @property
+    def ativa(self):
+        return self.modo != 'desligada'
+
+    @property
+    def _pilha(self):
+        """Seções abertas na thread atual."""
+        if not hasattr(self._local, 'pilha'):
+            self._local.pilha = []
+        return self._local.pilha
+
+    def secao(self, nome, linhas=None, categoria='secao'):
+        """
+        Context manager que mede o bloco; devolve o registro da seção, em que
+        `linhas` (ou outros campos) podem ser preenchidos durante o bloco.
+        """
+        if not self.ativa:
+            return nullcontext({})
+        return self._secao(nome, linhas, categoria)
+
+    @contextmanager
+    def _secao(self, nome, linhas, categoria):
+        registro = {'nome': nome, 'categoria': categoria, 'linhas': linhas,
+                    'profundidade': len(self._pilha), 'pid': os.getpid(),
+                    'tid': threading.get_native_id()}
+        self.secoes.append(registro)
+        if self.modo == 'detalhada':
+            atual, pico = tracemalloc.get_traced_memory()
+            if self._pilha:
+                # O pico até aqui pertence à seção de fora; a subseção começa do zero
+                self._pilha[-1]['_pico'] = max(self._pilha[-1]['_pico'], pico)
+            tracemalloc.reset_peak()
+            registro['_base'] = registro['_pico'] = atual
+        registro['_filhos'] = 0.0
+        self._pilha.append(registro)
+        cpu = time.process_time()
+        registro['_inicio'] = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            fim = time.perf_counter()
+            registro['cpu_segundos'] = time.process_time() - cpu
+            self._pilha.pop()
+            inicio = registro.pop('_inicio')
+            segundos = fim - inicio
+            registro['inicio'] = inicio - self.inicio
+            registro['segundos'] = segundos
+            registro['segundos_proprios'] = segundos - registro.pop('_filhos')
+            registro['rss_mb'] = rss_atual_mb()
+            registro['rss_maximo_mb'] = rss_maximo_mb()
+            if self._pilha:
+                self._pilha[-1]['_filhos'] += segundos
+            if self.modo == 'detalhada':
+                pico = max(registro.pop('_pico'), tracemalloc.get_traced_memory()[1])
+                registro['pico_memoria_mb'] = (pico - registro.pop('_base')) / 2**20
+                if self._pilha:
+                    self._pilha[-1]['_pico'] = max(self._pilha[-1]['_pico'], pico)
+                tracemalloc.reset_peak()
+
+    def registrar(self, nome, medicao, categoria='secao', linhas=None):
+        """Acrescenta um trecho já medido por medir(), possivelmente em outro processo."""
+        if not self.ativa:
+            return
+        self.secoes.append({
+            'nome': nome, 'categoria': categoria, 'linhas': linhas,
+            'profundidade': len(self._pilha), 'pid': medicao['pid'],
+            'inicio': medicao['inicio'] - self.inicio, 'segundos': medicao['segundos'],
+            'segundos_proprios': medicao['segundos'], 'cpu_segundos': medicao['cpu_segundos'],
+        })
+
+    def relatorio(self):
+        """Dicionário do relatório: seções na ordem de início e totais da execução."""
+        secoes = sorted((s for s in self.secoes if 'segundos' in s), key=lambda s: s['inicio'])
+        return {
+            'nome': self.nome,
+            'modo': self.modo,
+            'criado_em': self.criado_em,
+            'pid': os.getpid(),
+            'segundos': time.perf_counter() - self.inicio,
+            'cpu_segundos': time.process_time(),
+            'rss_maximo_mb': rss_maximo_mb(),
+            'secoes': [{chave: valor for chave, valor in s.items() if not chave.startswith('_')}
+                       for s in secoes],
+        }
+
+    def trace(self):
+        """Eventos no formato do Chrome (trace event format), em microssegundos."""
+        relatorio = self.relatorio()
+        eventos = [{'name': 'process_name', 'ph': 'M', 'pid': relatorio['pid'], 'tid': relatorio['pid'],
+                    'args': {'name': self.nome}}]
+        for secao in relatorio['secoes']:
+            argumentos = {chave: valor for chave, valor in secao.items()
+                          if chave not in ('nome', 'categoria', 'inicio', 'segundos', 'pid', 'tid')
+                          and valor is not None}
+            eventos.append({'name': secao['nome'], 'cat': secao['categoria'], 'ph': 'X',
+                            'ts': round(secao['inicio'] * 1e6, 1), 'dur': round(secao['segundos'] * 1e6, 1),
+                            'pid': relatorio['pid'], 'tid': secao.get('tid', secao['pid']),
+                            'args': argumentos})
+        return {'traceEvents': eventos, 'displayTimeUnit': 'ms'}
+
+    def gravar(self, arquivo, trace=None):
+        """Grava o relatório em JSON (e o trace, se pedido); retorna os arquivos gravados."""
+        if not self.ativa:
+            return []
+        with open(arquivo, 'w', encoding='utf-8') as saida:
+            json.dump(self.relatorio(), saida, indent=2, ensure_ascii=False)
+        arquivos = [arquivo]
+        if trace:
+            with open(trace, 'w', encoding='utf-8') as saida:
+                json.dump(self.trace(), saida, ensure_ascii=False)
+            arquivos.append(trace)
+        return arquivos
+
+    def encerrar(self):
+        if self._tracemalloc:
+            tracemalloc.stop()
+            self._tracemalloc = False
+
+
+_atual = Instrumentacao('desligada')
+
+
+def configurar(modo='leve', nome='execucao'):
+    """Define a instrumentação usada pelas funções de módulo nesta execução."""
+    global _atual
+    _atual.encerrar()
+    _atual = Instrumentacao(modo, nome)
+    return _atual
+
+
+def atual():
+    return _atual
+
+
+def secao(nome, linhas=None, categoria='secao'):
+    return _atual.secao(nome, linhas, categoria)
+
+
+def registrar(nome, medicao, categoria='secao', linhas=None):
+    _atual.registrar(nome, medicao, categoria, linhas)
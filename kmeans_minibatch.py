@@ -0,0 +1,194 @@
+"""
+Segmentação Mini-Batch Fora da Memória
+Priceless Bank - Mastercard Challenge 2025
+
+Alternativa ao K-Means exato de analise_segmentacao.py para bases que não
+cabem em memória. A base é lida do disco em chunks, várias vezes:
+
+1. StandardScaler.partial_fit acumula médias e variâncias correntes, e uma
+   amostra aleatória de tamanho fixo é mantida ao longo da leitura;
+2. MiniBatchKMeans.partial_fit treina em lotes, por algumas épocas,
+   partindo dos centróides do K-Means exato sobre a amostra;
+3. uma última passada atribui o Segmento de cada cliente e grava o
+   resultado em disco, chunk a chunk.
+
+O relatório de qualidade compara, na amostra, a inércia dos centróides
+mini-batch com a do K-Means exato.
+
+Uso:
+    python kmeans_minibatch.py [--arquivo Base_clientes.csv] [--k K] [--epocas N] [--salvar-modelo]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+
+from base_colunar import ARQUIVO_CLIENTES
+from features_clientes import (CONTA_ADICIONAL, DATA_REFERENCIA, FAIXAS_SEGMENTACAO,
+                               VARIAVEIS_CLUSTER, criar_features)
+from modelo_segmentacao import ModeloSegmentacao, config_features
+from varredura_k import K_RANGE, N_CLUSTERS, RANDOM_STATE, escolher_modelo, varrer_k
+
+TAMANHO_CHUNK = 100_000
+TAMANHO_LOTE = 4096
+TAMANHO_AMOSTRA = 20_000
+EPOCAS = 3
+
+
+def ler_features(caminho, tamanho_chunk, variaveis=VARIAVEIS_CLUSTER):
+    """Gera (Cliente_ID, matriz de features) por chunk; linhas incompletas viram NaN."""
+    for chunk in pd.read_csv(caminho, chunksize=tamanho_chunk):
+        df = criar_features(chunk)
+        yield df['Cliente_ID'].to_numpy(), df[variaveis].to_numpy('float64')
+
+
+class AmostraAleatoria:
+    """
+    Amostra uniforme de tamanho fixo sobre um fluxo de linhas: cada linha
+    recebe uma prioridade aleatória e ficam as de menor prioridade.
+    """
+
+    def __init__(self, tamanho, random_state=RANDOM_STATE):
+        self.tamanho = tamanho
+        self.rng = np.random.default_rng(random_state)
+        self.linhas = None
+        self.prioridades = np.empty(0)
+
+    def atualizar(self, linhas):
+        prioridades = self.rng.random(len(linhas))
+        if self.linhas is None:
+            self.linhas, self.prioridades = linhas, prioridades
+        else:
+            self.linhas = np.concatenate([self.linhas, linhas])
+            self.prioridades = np.concatenate([self.prioridades, prioridades])
+        if len(self.linhas) > self.tamanho:
+            manter = np.argpartition(self.prioridades, self.tamanho)[:self.tamanho]
+            self.linhas, self.prioridades = self.linhas[manter], self.prioridades[manter]
+
+
+def segmentar_minibatch(caminho=ARQUIVO_CLIENTES, n_clusters=N_CLUSTERS, k_range=K_RANGE,
+                        tamanho_chunk=TAMANHO_CHUNK, tamanho_lote=TAMANHO_LOTE,
+                        tamanho_amostra=TAMANHO_AMOSTRA, epocas=EPOCAS,
+                        random_state=RANDOM_STATE, arquivo_saida='clientes_segmentados_minibatch.csv',
+                        n_processos=None):
+    # Passada 1: estatísticas do StandardScaler e amostra aleatória
+    scaler = StandardScaler()
+    amostra = AmostraAleatoria(tamanho_amostra, random_state)
+    total = completos = 0
+    for _, matriz in ler_features(caminho, tamanho_chunk):
+        total += len(matriz)
+        matriz = matriz[~np.isnan(matriz).any(axis=1)]
+        completos += len(matriz)
+        if len(matriz):
+            scaler.partial_fit(matriz)
+            amostra.atualizar(matriz)
+    if completos == 0:
+        raise ValueError(f"Nenhum cliente com dados completos em {caminho}")
+
+    # K-Means exato na amostra: escolhe k (se não informado) e inicializa o mini-batch
+    amostra_escalada = scaler.transform(amostra.linhas)
+    varredura = varrer_k(amostra_escalada, k_range if n_clusters is None else [n_clusters],
+                         random_state=random_state, n_processos=n_processos)
+    n_clusters, exato, _, _, _ = escolher_modelo(varredura, amostra_escalada, n_clusters)
+
+    # Passadas 2..N: treino em lotes
+    modelo = MiniBatchKMeans(n_clusters=n_clusters, init=exato.cluster_centers_, n_init=1,
+                             batch_size=tamanho_lote, random_state=random_state)
+    for _ in range(epocas):
+        for _, matriz in ler_features(caminho, tamanho_chunk):
+            matriz = matriz[~np.isnan(matriz).any(axis=1)]
+            for inicio in range(0, len(matriz), tamanho_lote):
+                lote = matriz[inicio:inicio + tamanho_lote]
+                if len(lote) >= n_clusters:
+                    modelo.partial_fit(scaler.transform(lote))
+
+    # Última passada: rótulos gravados em disco e inércia total
+    inercia = 0.0
+    primeiro = True
+    for ids, matriz in ler_features(caminho, tamanho_chunk):
+        completos_chunk = ~np.isnan(matriz).any(axis=1)
+        segmento = pd.array(np.full(len(ids), pd.NA), dtype='Int64')
+        if completos_chunk.any():
+            escalada = scaler.transform(matriz[completos_chunk])
+            segmento[completos_chunk] = modelo.predict(escalada)
+            inercia -= modelo.score(escalada)
+        pd.DataFrame({'Cliente_ID': ids, 'Segmento': segmento}).to_csv(
+            arquivo_saida, mode='w' if primeiro else 'a', header=primeiro, index=False)
+        primeiro = False
+
+    qualidade = {
+        'tamanho_amostra': len(amostra_escalada),
+        'inercia_exata_amostra': exato.inertia_,
+        'inercia_minibatch_amostra': -modelo.score(amostra_escalada),
+    }
+    qualidade['razao'] = qualidade['inercia_minibatch_amostra'] / qualidade['inercia_exata_amostra']
+
+    return {
+        'total': total,
+        'completos': completos,
+        'n_clusters': n_clusters,
+        'scaler': scaler,
+        'kmeans': modelo,
+        'inercia': inercia,
+        'qualidade': qualidade,
+        'arquivo_saida': arquivo_saida,
+    }
+
+
+def relatorio_minibatch(resultado):
+    print("\n" + "="*80)
+    print("🎯 SEGMENTAÇÃO MINI-BATCH (FORA DA MEMÓRIA)")
+    print("="*80)
+
+    print(f"\n📊 Clientes lidos: {resultado['total']:,}")
+    print(f"📊 Clientes com dados completos: {resultado['completos']:,}")
+    print(f"🎯 Segmentos: {resultado['n_clusters']}")
+    print(f"📉 Inércia total: {resultado['inercia']:,.2f}")
+
+    qualidade = resultado['qualidade']
+    print(f"\n🔍 Qualidade (amostra de {qualidade['tamanho_amostra']:,} clientes):")
+    print(f"   • Inércia K-Means exato: {qualidade['inercia_exata_amostra']:,.2f}")
+    print(f"   • Inércia mini-batch: {qualidade['inercia_minibatch_amostra']:,.2f}")
+    print(f"   • Razão mini-batch / exato: {qualidade['razao']:.4f}")
+
+    print(f"\n✓ Segmentos exportados: {resultado['arquivo_saida']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Segmentação mini-batch fora da memória')
+    parser.add_argument('--arquivo', default=ARQUIVO_CLIENTES, help='CSV da base de clientes')
+    parser.add_argument('--saida', default='clientes_segmentados_minibatch.csv',
+                        help='CSV de saída com Cliente_ID e Segmento')
+    parser.add_argument('--k', type=int, default=N_CLUSTERS, choices=K_RANGE, metavar='K',
+                        help=f'número de segmentos, de {K_RANGE.start} a {K_RANGE.stop - 1} '
+                             '(padrão: cotovelo na amostra)')
+    parser.add_argument('--epocas', type=int, default=EPOCAS, help='passadas de treino')
+    parser.add_argument('--tamanho-chunk', type=int, default=TAMANHO_CHUNK)
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE)
+    parser.add_argument('--tamanho-amostra', type=int, default=TAMANHO_AMOSTRA)
+    parser.add_argument('--processos', type=int, default=None)
+    parser.add_argument('--salvar-modelo', action='store_true',
+                        help='exporta scaler e centróides para pontuar_clientes.py')
+    args = parser.parse_args()
+
+    resultado = segmentar_minibatch(args.arquivo, n_clusters=args.k,
+                                    tamanho_chunk=args.tamanho_chunk,
+                                    tamanho_lote=args.tamanho_lote,
+                                    tamanho_amostra=args.tamanho_amostra,
+                                    epocas=args.epocas, arquivo_saida=args.saida,
+                                    n_processos=args.processos)
+    relatorio_minibatch(resultado)
+
+    if args.salvar_modelo:
+        modelo = ModeloSegmentacao.de_treino(
+            resultado['scaler'], resultado['kmeans'].cluster_centers_, VARIAVEIS_CLUSTER,
+            config_features(DATA_REFERENCIA, FAIXAS_SEGMENTACAO, CONTA_ADICIONAL),
+            inercia=resultado['inercia'], n_treino=resultado['completos'], modo='minibatch')
+        print(f"✓ Modelo de segmentação exportado: {modelo.salvar()}")
+
+
+if __name__ == '__main__':
+    main()
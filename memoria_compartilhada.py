@@ -0,0 +1,102 @@
+"""
+Matrizes em Memória Compartilhada
+Priceless Bank - Mastercard Challenge 2025
+
+Publica uma matriz numpy uma única vez em memória compartilhada para que
+processos de trabalho a acessem sem cópia nem pickling. O processo que
+publica é o dono do bloco e o libera ao sair do `with`; os processos de
+trabalho apenas se anexam, em modo somente leitura, ou com escrita nos
+blocos de saída (rótulos, distâncias), que o dono lê ao final.
+
+Se o bloco não couber em /dev/shm (em contêineres, o padrão é de 64 MB e
+escrever além do limite derruba o processo), ele vira um arquivo mapeado em
+memória no diretório temporário: os processos compartilham as mesmas
+páginas pelo cache do sistema de arquivos, também sem cópia.
+"""
+
+import os
+import shutil
+import tempfile
+from multiprocessing import shared_memory
+
+import numpy as np
+
+DIRETORIO_MEMORIA = '/dev/shm'
+
+
+def _cabe_na_memoria(n_bytes):
+    # Sem /dev/shm (macOS, Windows), o limite não é visível: usa a memória compartilhada
+    if not os.path.isdir(DIRETORIO_MEMORIA):
+        return True
+    return n_bytes < shutil.disk_usage(DIRETORIO_MEMORIA).free
+
+
+class MatrizCompartilhada:
+    """Matriz (vazia) em um bloco de memória compartilhada nomeado ou em um arquivo mapeado."""
+
+    def __init__(self, forma, dtype, diretorio=None):
+        dtype = np.dtype(dtype)
+        forma = tuple(forma)
+        n_bytes = int(np.prod(forma)) * dtype.itemsize
+        self._bloco = self._arquivo = None
+        if diretorio is None and _cabe_na_memoria(n_bytes):
+            self._bloco = shared_memory.SharedMemory(create=True, size=max(n_bytes, 1))
+            self.array = np.ndarray(forma, dtype=dtype, buffer=self._bloco.buf)
+            self.descritor = ('memoria', self._bloco.name, forma, dtype.str)
+        else:
+            descritor, self._arquivo = tempfile.mkstemp(prefix='matriz-', suffix='.npy', dir=diretorio)
+            os.close(descritor)
+            self.array = np.lib.format.open_memmap(self._arquivo, mode='w+', dtype=dtype, shape=forma)
+            self.descritor = ('arquivo', self._arquivo, forma, dtype.str)
+
+    @classmethod
+    def publicar(cls, matriz, diretorio=None):
+        """Cópia de `matriz` (em ordem C) em um bloco novo."""
+        matriz = np.asarray(matriz)
+        compartilhada = cls(matriz.shape, matriz.dtype, diretorio)
+        compartilhada.array[...] = matriz
+        return compartilhada
+
+    def fechar(self):
+        if self._bloco is not None:
+            del self.array
+            self._bloco.close()
+            self._bloco.unlink()
+            self._bloco = None
+        elif self._arquivo is not None:
+            del self.array
+            os.remove(self._arquivo)
+            self._arquivo = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+class _BlocoArquivo:
+    # O mapeamento do arquivo vive com o próprio array: não há o que fechar
+    def close(self):
+        pass
+
+
+def anexar(descritor, escrita=False):
+    """
+    Abre, em um processo de trabalho, a matriz publicada por
+    MatrizCompartilhada. Retorna (bloco, array), somente leitura a menos que
+    `escrita`; o bloco deve ser mantido vivo enquanto o array for usado e
+    fechado (bloco.close()) só depois de o array ser descartado.
+    """
+    tipo, nome, forma, dtype = descritor
+    if tipo == 'arquivo':
+        return _BlocoArquivo(), np.load(nome, mmap_mode='r+' if escrita else 'r')
+    try:
+        bloco = shared_memory.SharedMemory(name=nome, track=False)
+    except TypeError:
+        # Python < 3.13: processos do multiprocessing compartilham o
+        # resource_tracker do pai, então o registro repetido é inofensivo
+        bloco = shared_memory.SharedMemory(name=nome)
+    array = np.ndarray(forma, dtype=np.dtype(dtype), buffer=bloco.buf)
+    array.flags.writeable = escrita
+    return bloco, array
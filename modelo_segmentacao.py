@@ -0,0 +1,196 @@
+"""
+Modelo de Segmentação Persistido
+Priceless Bank - Mastercard Challenge 2025
+
+Guarda o StandardScaler, os centróides do K-Means, a lista de features e a
+configuração de faixas e datas usada no treino como um artefato versionado
+(.npz sem pickle). O artefato permite segmentar clientes novos sem
+retreinar: a atribuição é feita em lotes vetorizados, com a distância ao
+centróide mais próximo calculada em float32.
+
+O artefato também pode guardar a projeção PCA 2D do gráfico de segmentos
+(eixos, média e variância explicada). Com o scaler embutido nos eixos,
+projetar clientes novos é uma multiplicação de matrizes por lote, e os
+gráficos refeitos a partir do artefato não reajustam a decomposição. A
+projeção é gravada com a sua versão (VERSAO_PROJECAO); uma projeção de
+outra versão, ou de um artefato sem versão, é descartada na leitura, e o
+artefato é regravado quando a projeção exportada muda.
+
+Os artefatos ficam em modelos/segmentacao-<id>.npz, onde o id é derivado
+do conteúdo da segmentação (a projeção, que só serve aos gráficos, não
+entra); modelos/ATUAL aponta para o último modelo exportado.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+VERSAO_FORMATO = 1
+VERSAO_PROJECAO = 1
+DIRETORIO_MODELOS = 'modelos'
+ARQUIVO_ATUAL = 'ATUAL'
+
+
+class ModeloSegmentacao:
+    """Scaler + centróides + configuração de features de um treino."""
+
+    def __init__(self, media, escala, centroides, variaveis, config, meta=None, projecao=None):
+        self.media = np.asarray(media, dtype='float64')
+        self.escala = np.asarray(escala, dtype='float64')
+        self.centroides = np.asarray(centroides, dtype='float64')
+        self.variaveis = list(variaveis)
+        self.config = dict(config)
+        self.meta = dict(meta or {})
+        # Projeção PCA: 'componentes' (eixos x variáveis), 'media' e 'variancia' (razão explicada)
+        self.projecao = ({chave: np.asarray(valor, dtype='float64') for chave, valor in projecao.items()}
+                         if projecao is not None else None)
+        self._preparar()
+
+    def _preparar(self):
+        # Tudo que a atribuição usa é pré-calculado uma vez, em float32:
+        # x_padronizado = x * a + b e distância² = ||c||² - 2·x·c (+ ||x||²)
+        self._a = (1.0 / self.escala).astype('float32')
+        self._b = (-self.media / self.escala).astype('float32')
+        self._centroides_t = np.ascontiguousarray(self.centroides.T.astype('float32'))
+        self._normas = (self.centroides.astype('float32') ** 2).sum(axis=1)
+        if self.projecao is not None:
+            # coordenadas = (x_padronizado - média PCA) · Cᵀ = x · (Cᵀ / escala) + deslocamento
+            componentes_t = self.projecao['componentes'].T
+            self._eixos = (componentes_t / self.escala[:, None]).astype('float32')
+            self._deslocamento = ((-self.media / self.escala - self.projecao['media'])
+                                  @ componentes_t).astype('float32')
+
+    @property
+    def n_clusters(self):
+        return len(self.centroides)
+
+    @classmethod
+    def de_treino(cls, scaler, centroides, variaveis, config, projecao=None, **meta):
+        return cls(scaler.mean_, scaler.scale_, centroides, variaveis, config, meta, projecao)
+
+    def identificador(self):
+        h = hashlib.sha256()
+        for array in (self.media, self.escala, self.centroides):
+            h.update(np.ascontiguousarray(array).tobytes())
+        h.update(json.dumps([self.variaveis, self.config], sort_keys=True, default=str).encode('utf-8'))
+        return h.hexdigest()[:12]
+
+    def atribuir(self, matriz, tamanho_lote=1_000_000):
+        """
+        Segmento (centróide mais próximo) de cada linha de uma matriz de
+        features brutas, na ordem de `variaveis`. Linhas com NaN recebem -1.
+        """
+        matriz = np.asarray(matriz)
+        rotulos = np.full(len(matriz), -1, dtype='int32')
+        for inicio in range(0, len(matriz), tamanho_lote):
+            lote = np.asarray(matriz[inicio:inicio + tamanho_lote], dtype='float32')
+            lote = lote * self._a + self._b
+            distancias = self._normas - 2.0 * (lote @ self._centroides_t)
+            segmento = distancias.argmin(axis=1).astype('int32')
+            segmento[np.isnan(lote).any(axis=1)] = -1
+            rotulos[inicio:inicio + len(lote)] = segmento
+        return rotulos
+
+    def projetar(self, matriz, tamanho_lote=1_000_000):
+        """
+        Coordenadas (linhas x eixos, float32) de uma matriz de features brutas
+        na projeção PCA do treino. Linhas com NaN ficam com NaN.
+        """
+        if self.projecao is None:
+            raise ValueError("O modelo não tem projeção PCA (ou ela é de uma versão antiga); "
+                             "exporte-o com analise_segmentacao.py com os gráficos ligados")
+        matriz = np.asarray(matriz)
+        coordenadas = np.empty((len(matriz), self._eixos.shape[1]), dtype='float32')
+        for inicio in range(0, len(matriz), tamanho_lote):
+            lote = np.asarray(matriz[inicio:inicio + tamanho_lote], dtype='float32')
+            coordenadas[inicio:inicio + len(lote)] = lote @ self._eixos + self._deslocamento
+        return coordenadas
+
+    def caminho(self, diretorio=DIRETORIO_MODELOS):
+        return os.path.join(diretorio, f'segmentacao-{self.identificador()}.npz')
+
+    def salvar(self, diretorio=DIRETORIO_MODELOS):
+        """
+        Grava o artefato (se ainda não existir, ou se a projeção gravada for
+        diferente da que este modelo tem) e o marca como atual.
+        """
+        os.makedirs(diretorio, exist_ok=True)
+        caminho = self.caminho(diretorio)
+        identificador = self.identificador()
+        if not os.path.exists(caminho) or (self.projecao is not None
+                                           and not _mesma_projecao(carregar_modelo(caminho).projecao,
+                                                                   self.projecao)):
+            meta = dict(self.meta)
+            meta.pop('versao_projecao', None)
+            if self.projecao is not None:
+                meta['versao_projecao'] = VERSAO_PROJECAO
+            meta.update({
+                'versao_formato': VERSAO_FORMATO,
+                'id': identificador,
+                'criado_em': datetime.now().isoformat(timespec='seconds'),
+                'variaveis': self.variaveis,
+                'config': self.config,
+                'n_clusters': self.n_clusters,
+            })
+            temporario = caminho + '.tmp.npz'
+            projecao = {f'pca_{chave}': valor for chave, valor in (self.projecao or {}).items()}
+            np.savez(temporario, media=self.media, escala=self.escala,
+                     centroides=self.centroides, **projecao,
+                     meta=np.array(json.dumps(meta, ensure_ascii=False, default=str)))
+            os.replace(temporario, caminho)
+        with open(os.path.join(diretorio, ARQUIVO_ATUAL), 'w', encoding='utf-8') as arquivo:
+            arquivo.write(os.path.basename(caminho) + '\n')
+        return caminho
+
+
+def _mesma_projecao(a, b):
+    return (a is not None and a.keys() == b.keys()
+            and all(np.array_equal(a[chave], b[chave]) for chave in a))
+
+
+def caminho_modelo_atual(diretorio=DIRETORIO_MODELOS):
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_ATUAL), encoding='utf-8') as arquivo:
+            return os.path.join(diretorio, arquivo.read().strip())
+    except OSError:
+        raise FileNotFoundError(f"Nenhum modelo exportado em {diretorio}/; "
+                                "execute analise_segmentacao.py primeiro") from None
+
+
+def carregar_modelo(caminho=None):
+    """Carrega um artefato; sem caminho, o modelo atual de modelos/."""
+    caminho = caminho or caminho_modelo_atual()
+    with np.load(caminho, allow_pickle=False) as dados:
+        meta = json.loads(str(dados['meta']))
+        if meta.get('versao_formato', 0) > VERSAO_FORMATO:
+            raise ValueError(f"{caminho} usa o formato {meta['versao_formato']}, "
+                             f"mais novo que o suportado ({VERSAO_FORMATO})")
+        projecao = {chave[len('pca_'):]: dados[chave] for chave in dados.files if chave.startswith('pca_')}
+        if meta.get('versao_projecao') != VERSAO_PROJECAO:
+            # Projeção de outra versão (ou sem versão): como se o artefato não a tivesse
+            projecao = {}
+        return ModeloSegmentacao(dados['media'], dados['escala'], dados['centroides'],
+                                 meta['variaveis'], meta['config'], meta, projecao or None)
+
+
+def config_features(data_referencia, faixas, conta_adicional):
+    """Configuração de features serializável em JSON, para o artefato."""
+    return {
+        'data_referencia': data_referencia.isoformat(),
+        'faixas': {nome: [coluna, [float(b) for b in bins], list(labels)]
+                   for nome, (coluna, bins, labels) in faixas.items()},
+        'conta_adicional': dict(conta_adicional),
+    }
+
+
+def parametros_features(config):
+    """Converte a configuração do artefato de volta em argumentos de criar_features."""
+    return {
+        'data_referencia': datetime.fromisoformat(config['data_referencia']),
+        'faixas': {nome: (coluna, bins, labels)
+                   for nome, (coluna, bins, labels) in config['faixas'].items()},
+        'conta_adicional': config['conta_adicional'],
+    }
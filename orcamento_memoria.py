@@ -0,0 +1,138 @@
+"""
+Orçamento de Memória
+Priceless Bank - Mastercard Challenge 2025
+
+Execuções com --memoria-maxima (nós compartilhados, em que o limite de
+memória por job é o que manda) trocam velocidade por um pico menor:
+
+- as etapas rodam em sequência e a varredura de k e os gráficos, no próprio
+  processo (a não ser que --threads, --processos ou --processos-graficos
+  sejam informados);
+- o k-means é ajustado sobre uma matriz float32, montada coluna a coluna e
+  padronizada no lugar (em bases sem segmentos bem separados, o ajuste pode
+  convergir para outra partição que a do float64);
+- correlações e quantis são acumulados em blocos de TAMANHO_BLOCO linhas;
+- cada etapa descarta seu resultado assim que o último consumidor termina
+  (ver agendador_etapas.py).
+
+Antes de ler a base, o pico é estimado a partir do número de clientes (da
+base colunar ou, antes da conversão, do tamanho do CSV). Se a estimativa
+passar do orçamento, a execução falha na hora, com a estimativa na
+mensagem, em vez de ser interrompida no meio pelo limite do nó.
+
+Os coeficientes da estimativa vêm de execuções com orçamento em bases
+sintéticas (dados_sinteticos.py) de 100 mil a 1 milhão de clientes,
+medidas pelo RSS máximo (instrumentacao.py), com alguma folga.
+
+Uso:
+    python analise_segmentacao.py --memoria-maxima 2G
+    python analise_renda_idade.py --memoria-maxima 800M
+"""
+
+import os
+import re
+
+from base_colunar import TAMANHO_CHUNK, linhas_convertidas
+from instrumentacao import rss_maximo_mb
+
+TAMANHO_BLOCO = 100_000
+UNIDADES = {'': 1, 'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+
+# Interpretador com as bibliotecas (plotly incluído) carregadas
+MEMORIA_BASE_MB = {'segmentacao': 220, 'renda': 140, 'completa': 230}
+# Pico por cliente, com orçamento, acima da memória base
+BYTES_POR_CLIENTE = {'segmentacao': 240, 'renda': 170, 'completa': 240}
+# Conversão do CSV para a base colunar (primeira execução), por linha do chunk
+BYTES_POR_LINHA_CONVERSAO = 220
+# Cada processo de trabalho além do principal (varredura de k ou gráficos)
+MEMORIA_PROCESSO_MB = 130
+BYTES_POR_CLIENTE_PROCESSO = 100
+
+DICAS = {
+    'renda': 'use --streaming, cuja memória depende só de --tamanho-chunk',
+    'segmentacao': 'kmeans_minibatch.py segmenta a base em chunks, com memória limitada',
+    'completa': 'rode as análises separadas (renda x idade com --streaming)',
+}
+
+
+def tamanho_memoria(texto):
+    """Bytes de um tamanho como '800M', '4G' ou '1.5GB' (sem unidade: bytes)."""
+    correspondencia = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)I?B?\s*', texto.upper())
+    if correspondencia is None:
+        raise ValueError(f"Tamanho de memória inválido: {texto!r} (exemplos: 800M, 4G)")
+    numero, unidade = correspondencia.groups()
+    return int(float(numero) * UNIDADES[unidade])
+
+
+def formatar_tamanho(n_bytes):
+    for unidade in ('B', 'KB', 'MB'):
+        if n_bytes < 2**10:
+            return f"{n_bytes:.0f} {unidade}" if unidade == 'B' else f"{n_bytes:.1f} {unidade}"
+        n_bytes /= 2**10
+    return f"{n_bytes:.2f} GB"
+
+
+def numero_clientes(caminho, amostra=1 << 20):
+    """
+    Clientes da base: exato se a base colunar já foi convertida; senão,
+    estimado pelo tamanho médio das linhas no início do CSV.
+    """
+    linhas = linhas_convertidas(caminho)
+    if linhas is not None:
+        return linhas
+    tamanho = os.path.getsize(caminho)
+    with open(caminho, 'rb') as arquivo:
+        inicio = arquivo.read(amostra)
+    quebras = max(inicio.count(b'\n'), 1)
+    if len(inicio) == tamanho:
+        return max(quebras - 1, 0)
+    return max(round(tamanho * quebras / len(inicio)) - 1, 0)
+
+
+def estimar_memoria(analise, clientes, processos=0, convertida=True):
+    """
+    Pico estimado, em bytes, de `analise` ('segmentacao', 'renda' ou
+    'completa') com orçamento, com `processos` de trabalho além do principal
+    (varredura de k e gráficos) e, se a base ainda não foi `convertida`, a
+    conversão do CSV.
+    """
+    base = MEMORIA_BASE_MB[analise] * 2**20
+    pico = base + BYTES_POR_CLIENTE[analise] * clientes
+    if processos:
+        pico += processos * (MEMORIA_PROCESSO_MB * 2**20 + BYTES_POR_CLIENTE_PROCESSO * clientes)
+    if not convertida:
+        pico = max(pico, base + BYTES_POR_LINHA_CONVERSAO * min(clientes, TAMANHO_CHUNK))
+    return int(pico)
+
+
+def verificar_orcamento(limite, analise, caminho, processos=0):
+    """
+    Estima o pico de `analise` sobre `caminho` e retorna (clientes,
+    estimativa); MemoryError, com a estimativa, se ela passar de `limite`.
+    """
+    clientes = numero_clientes(caminho)
+    estimativa = estimar_memoria(analise, clientes, processos,
+                                 convertida=linhas_convertidas(caminho) is not None)
+    if estimativa > limite:
+        dica = f"reduza --processos/--processos-graficos ou {DICAS[analise]}" if processos else DICAS[analise]
+        raise MemoryError(f"Orçamento de memória insuficiente: {clientes:,} clientes precisam de "
+                          f"cerca de {formatar_tamanho(estimativa)} e o orçamento é de "
+                          f"{formatar_tamanho(limite)}; {dica}.")
+    return clientes, estimativa
+
+
+def relatorio_orcamento(limite, clientes, estimativa):
+    print(f"💾 Orçamento de memória: {formatar_tamanho(limite)} "
+          f"(estimativa: {formatar_tamanho(estimativa)} para {clientes:,} clientes)")
+
+
+def relatorio_pico(limite):
+    """Compara o RSS máximo do processo principal com o orçamento."""
+    pico = rss_maximo_mb()
+    if pico is None:
+        return
+    pico *= 2**20
+    if pico > limite:
+        print(f"\n⚠️  Pico de memória: {formatar_tamanho(pico)}, acima do orçamento de {formatar_tamanho(limite)}")
+    else:
+        print(f"\n💾 Pico de memória: {formatar_tamanho(pico)} (orçamento: {formatar_tamanho(limite)})")
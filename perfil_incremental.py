@@ -0,0 +1,312 @@
+"""
+Perfil de Segmentos Incremental
+Priceless Bank - Mastercard Challenge 2025
+
+Mantém perfil_segmentos.csv atualizado a partir de deltas diários de
+clientes (inclusões, alterações e exclusões), sem refazer o groupby sobre a
+base inteira. O estado fica em um arquivo SQLite com:
+
+- clientes: a imagem de cada cliente (features do perfil, Segmento,
+  Estado e Cidade), indexada por Cliente_ID, para saber o que retirar
+  quando um cliente é alterado ou excluído;
+- estatisticas: contagem, soma e M2 de cada variável por segmento;
+- localizacao: número de clientes por segmento e Estado/Cidade.
+
+Aplicar um delta custa proporcional ao tamanho do delta: as linhas antigas
+dos clientes afetados são retiradas das estatísticas e as novas, pontuadas
+com o modelo salvo por analise_segmentacao.py, são somadas.
+
+Um delta é um CSV no esquema de Base_clientes.csv com a coluna adicional
+Operacao: I (inclusão), U (alteração) ou D (exclusão; basta o Cliente_ID).
+I e U substituem o cliente se ele já existir; vale a última linha de cada
+Cliente_ID no arquivo.
+
+Uso:
+    python perfil_incremental.py inicializar [--arquivo Base_clientes.csv]
+    python perfil_incremental.py aplicar delta_2025-10-04.csv [delta_2025-10-05.csv ...]
+    python perfil_incremental.py perfil
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from base_colunar import ARQUIVO_CLIENTES, carregar_clientes
+from estatisticas_streaming import EstatisticasGrupo
+from features_clientes import criar_features
+from modelo_segmentacao import DIRETORIO_MODELOS, carregar_modelo, parametros_features
+from relatorio_segmentos import relatorio_perfil
+
+ARQUIVO_ESTADO = 'perfil_incremental.sqlite'
+ARQUIVO_PERFIL = 'perfil_segmentos.csv'
+OPERACOES = ('I', 'U', 'D')
+COLUNAS_LOCALIZACAO = ['Estado', 'Cidade']
+
+# Colunas de perfil_segmentos.csv: (nome, variável, estatística)
+COLUNAS_PERFIL = [
+    ('Idade_Média', 'Idade', 'media'),
+    ('Idade_Desvio', 'Idade', 'desvio'),
+    ('Renda_Média', 'Renda_Anual', 'media'),
+    ('Renda_Desvio', 'Renda_Anual', 'desvio'),
+    ('Cartões_Média', 'Numero_Cartoes', 'media'),
+    ('Pct_Conta_Adicional', 'Possui_Conta_Adicional_Bin', 'media'),
+    ('Tempo_Médio_Anos', 'Tempo_Cliente_Anos', 'media'),
+]
+
+
+class PerfilIncremental:
+    """Estado persistido do perfil de segmentos, atualizado por deltas."""
+
+    def __init__(self, caminho=ARQUIVO_ESTADO):
+        if not os.path.exists(caminho):
+            raise FileNotFoundError(f"{caminho} não existe; execute "
+                                    "'python perfil_incremental.py inicializar' primeiro")
+        self.caminho = caminho
+        self.conexao = sqlite3.connect(caminho)
+        self.meta = dict(self.conexao.execute('SELECT chave, valor FROM meta'))
+        self.modelo = carregar_modelo(os.path.join(self.meta['diretorio_modelos'],
+                                                   f"segmentacao-{self.meta['modelo']}.npz"))
+        self.variaveis = json.loads(self.meta['variaveis'])
+        self.estatisticas = self._ler_estatisticas()
+
+    @classmethod
+    def inicializar(cls, df_clientes, modelo=None, caminho=ARQUIVO_ESTADO,
+                    diretorio_modelos=DIRETORIO_MODELOS):
+        """Cria o estado a partir da base completa (carga inicial)."""
+        modelo = modelo or carregar_modelo()
+        temporario = caminho + '.tmp'
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        variaveis = list(dict.fromkeys(v for _, v, _ in COLUNAS_PERFIL))
+
+        conexao = sqlite3.connect(temporario)
+        colunas = ', '.join(f'{v} REAL' for v in variaveis)
+        conexao.executescript(f"""
+            CREATE TABLE meta (chave TEXT PRIMARY KEY, valor TEXT);
+            CREATE TABLE clientes (Cliente_ID INTEGER PRIMARY KEY, Segmento INTEGER,
+                                   {colunas}, Estado TEXT, Cidade TEXT);
+            CREATE TABLE estatisticas (variavel TEXT, Segmento INTEGER, n INTEGER,
+                                       soma REAL, m2 REAL, PRIMARY KEY (variavel, Segmento));
+            CREATE TABLE localizacao (tipo TEXT, Segmento INTEGER, valor TEXT, n INTEGER,
+                                      PRIMARY KEY (tipo, Segmento, valor));
+        """)
+        conexao.executemany('INSERT INTO meta VALUES (?, ?)', [
+            ('modelo', modelo.meta['id']),
+            ('diretorio_modelos', diretorio_modelos),
+            ('variaveis', json.dumps(variaveis)),
+        ])
+        conexao.commit()
+        conexao.close()
+        os.replace(temporario, caminho)
+
+        estado = cls(caminho)
+        with estado.conexao:
+            imagem = estado._imagem(df_clientes)
+            estado._gravar_imagens(imagem)
+            estado._contabilizar(imagem, estado.estatisticas, sinal=1)
+            estado._gravar_estatisticas(estado.estatisticas)
+        return estado
+
+    # ------------------------------------------------------------------
+    # Imagens de clientes
+    # ------------------------------------------------------------------
+    def _imagem(self, df_clientes):
+        """Features do perfil, Segmento (-1 se incompleto) e localização de cada cliente."""
+        if df_clientes.empty:
+            # Delta só com exclusões pode trazer apenas Cliente_ID e Operacao
+            return pd.DataFrame({c: pd.Series(dtype='float64')
+                                 for c in ['Cliente_ID', 'Segmento'] + self.variaveis
+                                 + COLUNAS_LOCALIZACAO})
+        df = criar_features(df_clientes, **parametros_features(self.modelo.config))
+        imagem = pd.DataFrame({'Cliente_ID': df['Cliente_ID'].to_numpy('int64')})
+        imagem['Segmento'] = self.modelo.atribuir(df[self.modelo.variaveis].to_numpy('float32'))
+        for variavel in self.variaveis:
+            imagem[variavel] = df[variavel].to_numpy('float64')
+        for coluna in COLUNAS_LOCALIZACAO:
+            imagem[coluna] = df[coluna].astype(object).to_numpy()
+        return imagem
+
+    def _gravar_imagens(self, imagem):
+        colunas = list(imagem.columns)
+        self.conexao.executemany(
+            f"INSERT OR REPLACE INTO clientes ({', '.join(colunas)}) "
+            f"VALUES ({', '.join('?' * len(colunas))})",
+            imagem.astype(object).where(imagem.notna(), None).itertuples(index=False, name=None))
+
+    def _ler_imagens(self, ids):
+        self.conexao.execute('CREATE TEMP TABLE IF NOT EXISTS ids_delta (Cliente_ID INTEGER PRIMARY KEY)')
+        self.conexao.execute('DELETE FROM ids_delta')
+        self.conexao.executemany('INSERT OR IGNORE INTO ids_delta VALUES (?)',
+                                 ((int(i),) for i in ids))
+        return pd.read_sql_query(
+            'SELECT c.* FROM clientes c JOIN ids_delta USING (Cliente_ID)', self.conexao,
+            dtype={'Cliente_ID': 'int64', 'Segmento': 'int64',
+                   **{v: 'float64' for v in self.variaveis}})
+
+    # ------------------------------------------------------------------
+    # Estatísticas suficientes
+    # ------------------------------------------------------------------
+    def _ler_estatisticas(self):
+        tabela = pd.read_sql_query('SELECT * FROM estatisticas', self.conexao)
+        estatisticas = {}
+        for variavel in self.variaveis:
+            acumulador = EstatisticasGrupo()
+            parte = tabela[tabela['variavel'] == variavel]
+            if len(parte):
+                acumulador.tabela = (parte.set_index('Segmento')[['n', 'soma', 'm2']]
+                                     .astype({'n': 'int64'}).rename_axis(None))
+            estatisticas[variavel] = acumulador
+        return estatisticas
+
+    def _gravar_estatisticas(self, estatisticas):
+        self.conexao.execute('DELETE FROM estatisticas')
+        self.conexao.executemany('INSERT INTO estatisticas VALUES (?, ?, ?, ?, ?)', [
+            (variavel, int(segmento), int(linha.n), float(linha.soma), float(linha.m2))
+            for variavel, acumulador in estatisticas.items()
+            for segmento, linha in acumulador.tabela.iterrows()
+        ])
+
+    def _contabilizar(self, imagem, estatisticas, sinal):
+        imagem = imagem[imagem['Segmento'] >= 0]
+        if imagem.empty:
+            return
+        segmentos = imagem['Segmento']
+        for variavel, acumulador in estatisticas.items():
+            if sinal > 0:
+                acumulador.atualizar(segmentos, imagem[variavel])
+            else:
+                acumulador.remover(segmentos, imagem[variavel])
+
+        for coluna in COLUNAS_LOCALIZACAO:
+            contagens = imagem.groupby(['Segmento', coluna]).size() * sinal
+            self.conexao.executemany(
+                'INSERT INTO localizacao VALUES (?, ?, ?, ?) ON CONFLICT (tipo, Segmento, valor) '
+                'DO UPDATE SET n = n + excluded.n',
+                [(coluna, int(seg), valor, int(n)) for (seg, valor), n in contagens.items()])
+        self.conexao.execute('DELETE FROM localizacao WHERE n <= 0')
+
+    # ------------------------------------------------------------------
+    # Deltas
+    # ------------------------------------------------------------------
+    def aplicar_delta(self, delta):
+        """
+        Aplica um delta (DataFrame com a coluna Operacao) em uma transação.
+        Retorna a contagem de clientes incluídos, substituídos, excluídos e
+        de exclusões de clientes inexistentes.
+        """
+        operacoes = delta['Operacao'].astype(str).str.strip().str.upper()
+        invalidas = ~operacoes.isin(OPERACOES)
+        if invalidas.any():
+            raise ValueError(f"Operações inválidas no delta: {sorted(operacoes[invalidas].unique())} "
+                             f"(esperado: {', '.join(OPERACOES)})")
+        delta = delta.assign(Operacao=operacoes).drop_duplicates('Cliente_ID', keep='last')
+
+        # Estatísticas são alteradas em cópias e só substituídas após o commit
+        estatisticas = {v: EstatisticasGrupo() for v in self.variaveis}
+        for variavel, acumulador in estatisticas.items():
+            acumulador.tabela = self.estatisticas[variavel].tabela.copy()
+
+        with self.conexao:
+            antigas = self._ler_imagens(delta['Cliente_ID'])
+            novas = self._imagem(delta[delta['Operacao'] != 'D'].drop(columns='Operacao'))
+
+            self._contabilizar(antigas, estatisticas, sinal=-1)
+            self.conexao.execute('DELETE FROM clientes WHERE Cliente_ID IN (SELECT Cliente_ID FROM ids_delta)')
+            self._contabilizar(novas, estatisticas, sinal=1)
+            self._gravar_imagens(novas)
+            self._gravar_estatisticas(estatisticas)
+        self.estatisticas = estatisticas
+
+        existentes = set(antigas['Cliente_ID'])
+        excluidos = delta.loc[delta['Operacao'] == 'D', 'Cliente_ID']
+        gravados = novas['Cliente_ID']
+        return {
+            'incluidos': int((~gravados.isin(existentes)).sum()),
+            'substituidos': int(gravados.isin(existentes).sum()),
+            'excluidos': int(excluidos.isin(existentes).sum()),
+            'ausentes': int((~excluidos.isin(existentes)).sum()),
+        }
+
+    # ------------------------------------------------------------------
+    # Perfil
+    # ------------------------------------------------------------------
+    def perfil(self):
+        """Mesma tabela de calcular_perfil (perfil_segmentos.csv)."""
+        colunas = {}
+        for nome, variavel, estatistica in COLUNAS_PERFIL:
+            colunas[nome] = getattr(self.estatisticas[variavel], estatistica)()
+        segment_profile = pd.DataFrame(colunas).sort_index().round(2)
+        segment_profile.index = segment_profile.index.astype('int32')
+        segment_profile.index.name = 'Segmento'
+
+        num_clientes = self.estatisticas[self.variaveis[0]].contagem().sort_index()
+        segment_profile['Num_Clientes'] = num_clientes.to_numpy('int64')
+        segment_profile['Pct_Total'] = (segment_profile['Num_Clientes'] / num_clientes.sum() * 100).round(1)
+        return segment_profile
+
+    def localizacao(self):
+        """Estado e Cidade mais frequentes por segmento (empate: menor valor, como Series.mode)."""
+        predominantes = {}
+        for coluna in COLUNAS_LOCALIZACAO:
+            linhas = self.conexao.execute(
+                'SELECT Segmento, valor FROM localizacao WHERE tipo = ? '
+                'ORDER BY Segmento, n DESC, valor', (coluna,))
+            for segmento, valor in linhas:
+                predominantes.setdefault(coluna, {}).setdefault(segmento, valor)
+        segmentos = sorted(predominantes.get('Estado', {}))
+        return {seg: (predominantes['Estado'][seg], predominantes['Cidade'].get(seg, 'N/A'))
+                for seg in segmentos}
+
+    def fechar(self):
+        self.conexao.close()
+
+
+def ler_delta(caminho):
+    return pd.read_csv(caminho)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Perfil de segmentos atualizado por deltas')
+    parser.add_argument('--estado', default=ARQUIVO_ESTADO, help='arquivo SQLite do estado')
+    parser.add_argument('--perfil', default=ARQUIVO_PERFIL, help='CSV do perfil, regravado por inicializar e aplicar')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    inicializar = sub.add_parser('inicializar', help='carga inicial a partir da base completa')
+    inicializar.add_argument('--arquivo', default=ARQUIVO_CLIENTES)
+    inicializar.add_argument('--modelo', default=None, help='artefato .npz (padrão: modelos/ATUAL)')
+    aplicar = sub.add_parser('aplicar', help='aplica deltas (CSV com a coluna Operacao), em ordem')
+    aplicar.add_argument('deltas', nargs='+')
+    sub.add_parser('perfil', help='mostra o perfil atual (sem regravar o CSV)')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    if args.comando == 'inicializar':
+        modelo = carregar_modelo(args.modelo)
+        estado = PerfilIncremental.inicializar(carregar_clientes(args.arquivo), modelo, args.estado)
+        print(f"✓ Estado inicializado com o modelo {modelo.meta['id']}: {args.estado}")
+    else:
+        estado = PerfilIncremental(args.estado)
+    try:
+        for caminho in getattr(args, 'deltas', []):
+            contagens = estado.aplicar_delta(ler_delta(caminho))
+            print(f"✓ {caminho}: {contagens['incluidos']:,} incluídos, "
+                  f"{contagens['substituidos']:,} alterados, {contagens['excluidos']:,} excluídos"
+                  + (f", {contagens['ausentes']:,} exclusões de clientes inexistentes"
+                     if contagens['ausentes'] else ''))
+
+        segment_profile = estado.perfil()
+        relatorio_perfil({'segment_profile': segment_profile, 'localizacao': estado.localizacao()})
+    finally:
+        estado.fechar()
+
+    # A consulta (perfil) só mostra: o CSV é regravado quando o estado muda
+    if args.comando != 'perfil':
+        segment_profile.to_csv(args.perfil, encoding='utf-8-sig')
+        print(f"\n✓ Perfil dos segmentos exportado: {args.perfil} ({time.perf_counter() - inicio:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Pontuação de Clientes com o Modelo de Segmentação
+Priceless Bank - Mastercard Challenge 2025
+
+Atribui o Segmento a clientes novos ou atualizados usando o modelo
+exportado por analise_segmentacao.py, sem retreinar. O modelo é carregado
+uma vez e a base é processada em lotes, com as features calculadas pela
+mesma configuração (datas e faixas) gravada no artefato.
+
+Com --projecao, a saída inclui também as coordenadas PCA1 e PCA2 dos
+clientes no gráfico de segmentos (segmentos_pca_2d.html), com os eixos
+gravados no artefato: uma multiplicação de matrizes por lote, sem reajuste.
+
+Uso:
+    python pontuar_clientes.py novos_clientes.csv segmentos.csv [--modelo modelos/segmentacao-<id>.npz]
+                               [--projecao]
+
+Ou, a partir de outro script:
+    from pontuar_clientes import pontuar, projetar
+    df['Segmento'] = pontuar(df)
+    coordenadas = projetar(df)
+"""
+
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+from features_clientes import criar_features
+from modelo_segmentacao import carregar_modelo, parametros_features
+
+TAMANHO_LOTE = 500_000
+
+
+def matriz_features(df_clientes, modelo):
+    """Features do modelo (float32, na ordem de `modelo.variaveis`) de clientes no esquema da base."""
+    df = criar_features(df_clientes, **parametros_features(modelo.config))
+    return df[modelo.variaveis].to_numpy('float32')
+
+
+def pontuar(df_clientes, modelo=None, matriz=None):
+    """Segmento de cada cliente de um DataFrame no esquema de Base_clientes.csv."""
+    modelo = modelo or carregar_modelo()
+    matriz = matriz if matriz is not None else matriz_features(df_clientes, modelo)
+    rotulos = modelo.atribuir(matriz)
+    return pd.Series(rotulos, index=df_clientes.index, name='Segmento').astype('Int64').where(rotulos >= 0)
+
+
+def projetar(df_clientes, modelo=None, matriz=None):
+    """Coordenadas PCA1 e PCA2 de cada cliente na projeção gravada com o modelo."""
+    modelo = modelo or carregar_modelo()
+    matriz = matriz if matriz is not None else matriz_features(df_clientes, modelo)
+    coordenadas = modelo.projetar(matriz)
+    return pd.DataFrame({'PCA1': coordenadas[:, 0], 'PCA2': coordenadas[:, 1]}, index=df_clientes.index)
+
+
+def pontuar_arquivo(entrada, saida, modelo=None, tamanho_lote=TAMANHO_LOTE, colunas_saida=('Cliente_ID',),
+                    projecao=False):
+    modelo = modelo or carregar_modelo()
+    total = 0
+    primeiro = True
+    for lote in pd.read_csv(entrada, chunksize=tamanho_lote):
+        resultado = lote[list(colunas_saida)].copy()
+        matriz = matriz_features(lote, modelo)
+        resultado['Segmento'] = pontuar(lote, modelo, matriz)
+        if projecao:
+            resultado[['PCA1', 'PCA2']] = projetar(lote, modelo, matriz)
+        resultado.to_csv(saida, mode='w' if primeiro else 'a', header=primeiro,
+                         index=False, encoding='utf-8-sig' if primeiro else 'utf-8')
+        primeiro = False
+        total += len(lote)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Atribui segmentos a clientes com o modelo salvo')
+    parser.add_argument('entrada', help='CSV no esquema de Base_clientes.csv')
+    parser.add_argument('saida', help='CSV de saída com Cliente_ID e Segmento')
+    parser.add_argument('--modelo', default=None, help='artefato .npz (padrão: modelos/ATUAL)')
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE)
+    parser.add_argument('--projecao', action='store_true',
+                        help='inclui as coordenadas PCA1 e PCA2 do gráfico de segmentos')
+    args = parser.parse_args()
+
+    modelo = carregar_modelo(args.modelo)
+    print(f"📦 Modelo {modelo.meta.get('id')} ({modelo.n_clusters} segmentos, "
+          f"treinado em {modelo.meta.get('criado_em')})")
+
+    inicio = time.perf_counter()
+    try:
+        total = pontuar_arquivo(args.entrada, args.saida, modelo, args.tamanho_lote, projecao=args.projecao)
+    except ValueError as erro:
+        print(f"❌ {erro}")
+        sys.exit(1)
+    duracao = time.perf_counter() - inicio
+    print(f"✓ {total:,} clientes pontuados em {duracao:.2f}s ({total / max(duracao, 1e-9):,.0f} clientes/s)")
+    print(f"✓ Arquivo salvo: {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+"""
+Relatórios HTML com Plotly
+Priceless Bank - Mastercard Challenge 2025
+
+fig.write_html embute a biblioteca plotly.js inteira (cerca de 4,8 MB) em
+cada arquivo, e uma execução dos dois scripts grava a mesma biblioteca 13
+vezes. Os gráficos passam por um escritor de relatório com cinco modos:
+
+- compartilhado (padrão): um HTML por gráfico, com os mesmos nomes de
+  antes, todos apontando para um único plotly-<versão>.min.js gravado no
+  mesmo diretório; continua funcionando offline;
+- independente: o comportamento anterior, cada HTML com a biblioteca
+  embutida;
+- painel: um único HTML de várias páginas (uma aba por gráfico), com a
+  biblioteca embutida uma vez e cada gráfico desenhado só quando a aba é
+  aberta;
+- pacote: o mesmo painel compactado com gzip (.html.gz);
+- nenhum: execução sem gráficos (só relatórios em texto e CSVs); nenhuma
+  figura é montada e o plotly nem chega a ser importado.
+
+Em todos os modos, os vetores numéricos da figura (já gravados pelo plotly
+como arrays binários em base64) são convertidos para o menor tipo que
+representa os valores sem perda: idades e contagens vão de float64 para
+int8/int16, valores exatos em float32 vão para float32.
+
+As figuras podem ser montadas e serializadas em paralelo, em um pool de
+processos (n_processos), enquanto o script continua com os relatórios em
+texto e as exportações de CSV.
+
+Uso:
+    import relatorio_html
+    relatorio_html.configurar('painel', titulo='Segmentação', arquivo_painel='relatorio.html',
+                              n_processos=4)
+    relatorio_html.agendar_figura('analise_idade.html', figura_idade, df['Idade'], demografia)
+    arquivos = relatorio_html.finalizar()
+"""
+
+import base64
+import gzip
+import html
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from agendador_etapas import contexto_processos
+import instrumentacao
+
+MODOS_RELATORIO = ('compartilhado', 'independente', 'painel', 'pacote', 'nenhum')
+
+# Tipos de array binário aceitos pelo plotly.js, do menor para o maior
+_TIPOS_INTEIROS = ('i1', 'u1', 'i2', 'u2', 'i4', 'u4')
+
+_MODELO_PAINEL = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>{titulo}</title>
+<style>
+body {{ margin: 0; font-family: sans-serif; }}
+nav {{ position: sticky; top: 0; z-index: 10; display: flex; flex-wrap: wrap; gap: 4px;
+       padding: 8px; background: #f4f4f4; border-bottom: 1px solid #ddd; }}
+nav strong {{ padding: 6px 12px 6px 4px; }}
+nav a {{ padding: 6px 10px; border-radius: 4px; color: #333; text-decoration: none; font-size: 14px; }}
+nav a.ativo {{ background: #333; color: #fff; }}
+section {{ display: none; padding: 8px; }}
+section.ativo {{ display: block; }}
+.grafico {{ width: 100%; min-height: 600px; }}
+</style>
+<script type="text/javascript">{plotlyjs}</script>
+</head>
+<body>
+<nav><strong>{titulo}</strong>{links}</nav>
+{secoes}
+<script type="text/javascript">
+(function () {{
+  var desenhados = {{}};
+  function mostrar(id) {{
+    var secao = document.getElementById(id) || document.querySelector('section');
+    document.querySelectorAll('section, nav a').forEach(function (el) {{ el.classList.remove('ativo'); }});
+    secao.classList.add('ativo');
+    document.querySelector('nav a[href="#' + secao.id + '"]').classList.add('ativo');
+    var div = secao.querySelector('.grafico');
+    if (desenhados[secao.id]) {{
+      Plotly.Plots.resize(div);
+      return;
+    }}
+    var fig = JSON.parse(document.getElementById('dados-' + secao.id).textContent);
+    Plotly.newPlot(div, fig.data, fig.layout, {{responsive: true}});
+    desenhados[secao.id] = true;
+  }}
+  window.addEventListener('hashchange', function () {{ mostrar(location.hash.slice(1)); }});
+  mostrar(location.hash.slice(1));
+}})();
+</script>
+</body>
+</html>
+"""
+
+
+def _menor_tipo(valores):
+    """Menor dtype aceito pelo plotly.js que representa `valores` sem perda."""
+    if valores.dtype.kind == 'f':
+        if valores.size and np.isfinite(valores).all() and np.array_equal(valores, np.trunc(valores)):
+            inteiros = valores.astype('int64')
+            menor = _menor_tipo(inteiros)
+            return valores if menor is inteiros else menor
+        simples = valores.astype('<f4')
+        if np.array_equal(simples.astype(valores.dtype), valores, equal_nan=True):
+            return simples
+        return valores
+    if valores.dtype.kind in 'iu' and valores.size:
+        minimo, maximo = valores.min(), valores.max()
+        for tipo in _TIPOS_INTEIROS:
+            limites = np.iinfo(tipo)
+            if limites.min <= minimo and maximo <= limites.max:
+                return valores if valores.dtype.itemsize <= limites.bits // 8 else valores.astype('<' + tipo)
+    return valores
+
+
+def _compactar(valor):
+    if isinstance(valor, dict):
+        if set(valor) >= {'dtype', 'bdata'}:
+            valores = np.frombuffer(base64.b64decode(valor['bdata']), dtype='<' + valor['dtype'])
+            menor = _menor_tipo(valores)
+            if menor is not valores:
+                return {**valor, 'dtype': menor.dtype.str[1:],
+                        'bdata': base64.b64encode(menor.tobytes()).decode('ascii')}
+            return valor
+        return {chave: _compactar(v) for chave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_compactar(v) for v in valor]
+    return valor
+
+
+def compactar_figura(fig):
+    """Dicionário da figura com os arrays binários dos traços no menor tipo sem perda."""
+    figura = fig.to_plotly_json()
+    return {**figura, 'data': _compactar(figura.get('data', []))}
+
+
+def _titulo(figura, padrao):
+    titulo = (figura.get('layout', {}).get('title') or {}).get('text')
+    return titulo.split('<br>')[0].strip() if titulo else padrao
+
+
+def _figura_pronta(fig):
+    return fig
+
+
+def _montar(construir, args, kwargs, destino, plotlyjs):
+    import plotly.io as pio
+
+    figura = compactar_figura(construir(*args, **kwargs))
+    if destino is None:
+        return figura
+    pio.write_html(figura, destino, include_plotlyjs=plotlyjs, validate=False)
+    return None
+
+
+def _renderizar(construir, args, kwargs, destino, plotlyjs):
+    """
+    Monta a figura e grava o HTML em `destino`; sem destino (modos painel e
+    pacote), devolve o dicionário compactado para o painel. Retorna também a
+    medição do trecho, feita no processo que o executou.
+    """
+    return instrumentacao.medir(_montar, construir, args, kwargs, destino, plotlyjs)
+
+
+class EscritorRelatorio:
+    """
+    Grava as figuras de uma execução no modo escolhido.
+
+    Com `n_processos` maior que 1 (None: um por núcleo), cada figura é
+    montada e serializada em um pool de processos a partir de uma função de
+    módulo e das tabelas já calculadas; o script segue com os relatórios e
+    as exportações enquanto os gráficos são gerados, e finalizar() espera
+    por todos. Com 1 processo, tudo roda na hora, em sequência.
+    """
+
+    def __init__(self, modo='compartilhado', diretorio='.', titulo='Relatório',
+                 arquivo_painel='relatorio.html', n_processos=1):
+        if modo not in MODOS_RELATORIO:
+            raise ValueError(f"Modo de relatório inválido: {modo!r} "
+                             f"(esperado: {', '.join(MODOS_RELATORIO)})")
+        self.modo = modo
+        self.diretorio = Path(diretorio)
+        self.titulo = titulo
+        self.arquivo_painel = arquivo_painel + ('.gz' if modo == 'pacote' else '')
+        self.n_processos = n_processos or os.cpu_count() or 1
+        self.arquivos = []      # arquivos gravados, na ordem
+        self._pendentes = []    # (arquivo, Future ou (resultado, medição)), na ordem de agendamento
+        self._executor = None
+
+    @property
+    def painel(self):
+        return self.modo in ('painel', 'pacote')
+
+    @property
+    def ativo(self):
+        return self.modo != 'nenhum'
+
+    @property
+    def arquivo_plotly(self):
+        from plotly.offline import get_plotlyjs_version
+        return f"plotly-{get_plotlyjs_version()}.min.js"
+
+    def _gravar_plotly(self):
+        from plotly.offline import get_plotlyjs
+
+        caminho = self.diretorio / self.arquivo_plotly
+        if not caminho.exists():
+            caminho.write_text(get_plotlyjs(), encoding='utf-8')
+        if caminho.name not in self.arquivos:
+            self.arquivos.append(caminho.name)
+
+    def agendar(self, arquivo, construir, *args, **kwargs):
+        """
+        Gera a figura `construir(*args, **kwargs)` sob o nome `arquivo` (nos
+        modos painel e pacote, como página do painel). `construir` precisa
+        ser uma função de módulo e os argumentos, serializáveis com pickle.
+        Retorna onde o gráfico vai ficar (None no modo nenhum).
+        """
+        if not self.ativo:
+            return None
+        if self.painel:
+            destino = plotlyjs = None
+        else:
+            self.diretorio.mkdir(parents=True, exist_ok=True)
+            if self.modo == 'compartilhado':
+                self._gravar_plotly()
+                plotlyjs = self.arquivo_plotly
+            else:
+                plotlyjs = True
+            destino = self.diretorio / arquivo
+
+        tarefa = (construir, args, kwargs, destino, plotlyjs)
+        if self.n_processos == 1:
+            resultado = _renderizar(*tarefa)
+        else:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.n_processos,
+                                                     mp_context=contexto_processos())
+            resultado = self._executor.submit(_renderizar, *tarefa)
+        self._pendentes.append((arquivo, resultado))
+        return f"{self.arquivo_painel}#{Path(arquivo).stem}" if self.painel else arquivo
+
+    def salvar(self, fig, arquivo):
+        """Gera uma figura já montada sob o nome `arquivo` (ver agendar)."""
+        return self.agendar(arquivo, _figura_pronta, fig)
+
+    def _painel(self, paginas):
+        import plotly.io as pio
+        from plotly.offline import get_plotlyjs
+
+        links = ''.join(f'<a href="#{pagina}" title="{html.escape(titulo)}">{html.escape(pagina)}</a>'
+                        for pagina, titulo, _ in paginas)
+        secoes = '\n'.join(
+            f'<section id="{pagina}"><div class="grafico"></div>'
+            f'<script type="application/json" id="dados-{pagina}">{pio.to_json(figura, validate=False)}</script>'
+            f'</section>'
+            for pagina, _, figura in paginas)
+        return _MODELO_PAINEL.format(titulo=html.escape(self.titulo), plotlyjs=get_plotlyjs(),
+                                     links=links, secoes=secoes)
+
+    def finalizar(self):
+        """
+        Espera as figuras pendentes, grava o painel (se houver) e retorna a
+        lista de arquivos gerados. Um erro em qualquer figura é repassado.
+        """
+        pendentes, self._pendentes = self._pendentes, []
+        try:
+            resultados = []
+            for arquivo, r in pendentes:
+                figura, medicao = r.result() if isinstance(r, Future) else r
+                instrumentacao.registrar(f"figura:{arquivo}", medicao, categoria='figura')
+                resultados.append((arquivo, figura))
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+        if not self.painel:
+            self.arquivos.extend(arquivo for arquivo, _ in resultados)
+        elif resultados:
+            with instrumentacao.secao(f"painel:{self.arquivo_painel}", linhas=len(resultados),
+                                      categoria='exportar'):
+                paginas = [(Path(arquivo).stem, _titulo(figura, Path(arquivo).stem), figura)
+                           for arquivo, figura in resultados]
+                self.diretorio.mkdir(parents=True, exist_ok=True)
+                conteudo = self._painel(paginas).encode('utf-8')
+                caminho = self.diretorio / self.arquivo_painel
+                if self.modo == 'pacote':
+                    with gzip.open(caminho, 'wb', compresslevel=9) as arquivo:
+                        arquivo.write(conteudo)
+                else:
+                    caminho.write_bytes(conteudo)
+            self.arquivos.append(self.arquivo_painel)
+        return list(self.arquivos)
+
+
+_escritor = EscritorRelatorio()
+
+
+def configurar(modo='compartilhado', **kwargs):
+    """Define o escritor usado por agendar_figura, salvar_figura e finalizar nesta execução."""
+    global _escritor
+    _escritor = EscritorRelatorio(modo, **kwargs)
+    return _escritor
+
+
+def graficos_ativos():
+    """Se o escritor desta execução gera gráficos (falso no modo nenhum)."""
+    return _escritor.ativo
+
+
+def agendar_figura(arquivo, construir, *args, **kwargs):
+    return _escritor.agendar(arquivo, construir, *args, **kwargs)
+
+
+def salvar_figura(fig, arquivo):
+    return _escritor.salvar(fig, arquivo)
+
+
+def finalizar():
+    return _escritor.finalizar()
@@ -0,0 +1,76 @@
+"""
+Relatório do Perfil dos Segmentos
+Priceless Bank - Mastercard Challenge 2025
+
+Impressão do perfil detalhado dos segmentos e da qualidade da segmentação,
+comum a analise_segmentacao.py (perfil completo) e a perfil_incremental.py
+(perfil mantido por deltas, só com tamanhos, médias e localização).
+"""
+
+
+def relatorio_perfil(perfil):
+    print("\n" + "="*80)
+    print("📋 PERFIL DETALHADO DOS SEGMENTOS")
+    print("="*80)
+
+    segment_profile = perfil['segment_profile']
+    print("\n" + segment_profile.to_string())
+
+    avaliacao = perfil.get('avaliacao')
+    if avaliacao:
+        relatorio_avaliacao(avaliacao)
+
+    print("\n\n🎯 CARACTERIZAÇÃO DOS SEGMENTOS:\n")
+
+    for seg, (top_estado, top_cidade) in perfil['localizacao'].items():
+        seg_data = segment_profile.loc[seg]
+
+        print(f"\n{'='*80}")
+        print(f"SEGMENTO {seg}")
+        print(f"{'='*80}")
+        print(f"👥 Tamanho: {seg_data['Num_Clientes']:,.0f} clientes ({seg_data['Pct_Total']:.1f}% do total)")
+        print(f"\n📊 Perfil Demográfico:")
+        print(f"   • Idade Média: {seg_data['Idade_Média']:.0f} anos (± {seg_data['Idade_Desvio']:.1f})")
+        print(f"   • Renda Média: R$ {seg_data['Renda_Média']:,.2f} (± R$ {seg_data['Renda_Desvio']:,.2f})")
+        print(f"   • Cartões por Cliente: {seg_data['Cartões_Média']:.1f} em média")
+        print(f"   • Conta Adicional: {seg_data['Pct_Conta_Adicional']*100:.1f}% possuem")
+        print(f"   • Tempo Médio como Cliente: {seg_data['Tempo_Médio_Anos']:.1f} anos")
+        for var1, var2, corr in perfil.get('correlacoes', {}).get(seg, []):
+            print(f"   • Correlação mais forte: {var1} <-> {var2} ({corr:.3f})")
+        if 'Silhueta_Média' in segment_profile:
+            print(f"   • Coesão: silhueta média {seg_data['Silhueta_Média']:.3f}, distância média "
+                  f"ao centróide {seg_data['Distância_Média_Centróide']:.2f} (variáveis padronizadas)")
+
+        print(f"\n🗺️ Localização:")
+        print(f"   • Estado predominante: {top_estado}")
+        print(f"   • Cidade predominante: {top_cidade}")
+        for coluna, rotulo in (('Estado', 'Estados'), ('Cidade', 'Cidades')):
+            if coluna in perfil.get('top_localizacao', {}):
+                top = perfil['top_localizacao'][coluna].xs(seg, level='Segmento')
+                print(f"   • Principais {rotulo.lower()}: " + ', '.join(
+                    f"{linha.valor} ({linha.participacao*100:.1f}%)" for linha in top.itertuples()))
+
+
+def relatorio_avaliacao(avaliacao):
+    por_k = avaliacao['por_k']
+    k_escolhido = avaliacao['n_clusters']
+    print("\n\n🧪 QUALIDADE DA SEGMENTAÇÃO POR K:")
+    if avaliacao['exata']:
+        print(f"   • Silhueta exata ({avaliacao['tamanho_amostra']:,} clientes)")
+    else:
+        print(f"   • Silhueta em {avaliacao['n_amostras']} amostras estratificadas de "
+              f"~{avaliacao['tamanho_amostra']:,} clientes (média e IC 95%)")
+    print(f"   • Davies-Bouldin (menor é melhor) e Calinski-Harabasz (maior é melhor) na base inteira")
+    print(f"   • Estabilidade: ARI médio entre o ajuste e {avaliacao['n_bootstrap']} reajustes em "
+          f"reamostragens (1 = mesma partição)")
+    print("\n" + por_k.to_string())
+
+    escolhido = por_k.loc[k_escolhido]
+    print(f"\n   • k = {k_escolhido}: silhueta {escolhido['Silhueta']:.3f} "
+          f"[{escolhido['Silhueta_IC_Inf']:.3f}, {escolhido['Silhueta_IC_Sup']:.3f}], "
+          f"Davies-Bouldin {escolhido['Davies_Bouldin']:.3f}, "
+          f"estabilidade {escolhido['Estabilidade_ARI']:.2f}")
+    if por_k['Silhueta'].notna().any():
+        print(f"   • Maior silhueta: k = {por_k['Silhueta'].idxmax()}; "
+              f"menor Davies-Bouldin: k = {por_k['Davies_Bouldin'].idxmin()}; "
+              f"maior estabilidade: k = {por_k['Estabilidade_ARI'].idxmax()}")
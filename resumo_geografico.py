@@ -0,0 +1,221 @@
+"""
+Resumo Geográfico com Sketches
+Priceless Bank - Mastercard Challenge 2025
+
+Número de estados e cidades distintos e os estados/cidades com mais
+clientes, com memória limitada e estado mesclável: a base pode chegar em
+chunks ou em partes processadas em paralelo e os resumos são somados no fim.
+
+Para cada coluna, o resumo mantém:
+
+- contagens exatas enquanto houver até `limite_exato` valores distintos
+  (o caso normal: poucas dezenas de estados e cidades), com o mesmo
+  resultado de nunique() e value_counts();
+- HyperLogLog para o número de valores distintos (erro relativo de cerca
+  de 1,04/√2^precisao);
+- Space-Saving para os valores mais frequentes (toda contagem acima de
+  n/capacidade aparece) e Count-Min para limitar as contagens estimadas,
+  ambos superestimando; a contagem publicada é o menor dos dois.
+
+Acima do limite, as contagens exatas são descartadas e os relatórios saem
+dos sketches. Cada chunk é reduzido primeiro a (valor distinto, contagem),
+pelos códigos quando a coluna é categórica, de modo que os sketches só
+veem os valores distintos de cada chunk e não cada linha.
+"""
+
+import numpy as np
+import pandas as pd
+
+COLUNAS_GEOGRAFIA = ['Estado', 'Cidade']
+LIMITE_EXATO = 10_000
+CAPACIDADE_TOP = 1_000
+PRECISAO_HLL = 14
+ERRO_CONTAGEM = 0.001     # Count-Min: erro de até ERRO_CONTAGEM·n por valor
+PROFUNDIDADE_CONTAGEM = 5  # ... com probabilidade 1 - e^-5
+
+
+def _contagens(serie):
+    """Valores distintos presentes na série e suas contagens."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos = serie.cat.codes.to_numpy()
+        valores = serie.cat.categories
+    else:
+        codigos, valores = pd.factorize(serie)
+    contagens = np.bincount(codigos[codigos >= 0], minlength=len(valores))
+    presentes = contagens > 0
+    return pd.Series(contagens[presentes], index=pd.Index(np.asarray(valores)[presentes]), dtype='int64')
+
+
+def _hashes(valores):
+    return pd.util.hash_array(np.asarray(valores, dtype=object))
+
+
+def _ordenar(contagens):
+    # Contagem decrescente; empates em ordem crescente de valor
+    return contagens.sort_index().sort_values(ascending=False, kind='stable')
+
+
+class HyperLogLog:
+    """Estimativa do número de valores distintos em 2^precisao registros de um byte."""
+
+    def __init__(self, precisao=PRECISAO_HLL):
+        self.precisao = precisao
+        self.registros = np.zeros(1 << precisao, dtype='uint8')
+
+    def atualizar(self, hashes):
+        hashes = np.asarray(hashes, dtype='uint64')
+        p = np.uint64(self.precisao)
+        indice = (hashes >> np.uint64(64 - self.precisao)).astype('int64')
+        resto = hashes << p
+        # Posição do primeiro bit 1 nos 64 - p bits restantes (frexp é exato em 32 bits)
+        alto = (resto >> np.uint64(32)).astype('float64')
+        baixo = (resto & np.uint64(0xFFFFFFFF)).astype('float64')
+        bits = np.where(alto > 0, 32 + np.frexp(alto)[1], np.frexp(baixo)[1])
+        posicao = np.minimum(65 - bits, 64 - self.precisao + 1).astype('uint8')
+        np.maximum.at(self.registros, indice, posicao)
+
+    def mesclar(self, outro):
+        np.maximum(self.registros, outro.registros, out=self.registros)
+
+    def estimativa(self):
+        m = len(self.registros)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        estimativa = alfa * m * m / np.sum(np.ldexp(1.0, -self.registros.astype('int64')))
+        vazios = int(np.count_nonzero(self.registros == 0))
+        if estimativa <= 2.5 * m and vazios:
+            estimativa = m * np.log(m / vazios)    # contagem linear para poucos valores
+        return int(round(estimativa))
+
+
+class CountMin:
+    """Contagem aproximada (superestimada) de qualquer valor, em profundidade x largura contadores."""
+
+    def __init__(self, erro=ERRO_CONTAGEM, profundidade=PROFUNDIDADE_CONTAGEM):
+        self.largura = int(np.ceil(np.e / erro))
+        self.tabela = np.zeros((profundidade, self.largura), dtype='int64')
+
+    def _colunas(self, hashes):
+        # Kirsch-Mitzenmacher: as linhas usam h1 + i·h2 a partir de um único hash de 64 bits
+        h1 = (hashes & np.uint64(0xFFFFFFFF)).astype('int64')
+        h2 = (hashes >> np.uint64(32)).astype('int64') | 1
+        return [(h1 + i * h2) % self.largura for i in range(len(self.tabela))]
+
+    def atualizar(self, hashes, contagens):
+        for linha, colunas in zip(self.tabela, self._colunas(np.asarray(hashes, dtype='uint64'))):
+            np.add.at(linha, colunas, contagens)
+
+    def mesclar(self, outro):
+        self.tabela += outro.tabela
+
+    def estimar(self, hashes):
+        colunas = self._colunas(np.asarray(hashes, dtype='uint64'))
+        return np.min([linha[c] for linha, c in zip(self.tabela, colunas)], axis=0)
+
+
+class SpaceSaving:
+    """
+    Até `capacidade` candidatos a mais frequentes, com contagem superestimada
+    e o erro máximo de cada uma. `piso` é a contagem atribuída a valores fora
+    do resumo (zero enquanto nada foi descartado).
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_TOP):
+        self.capacidade = capacidade
+        self.contagens = pd.Series(dtype='int64')
+        self.erros = pd.Series(dtype='int64')
+        self.piso = 0
+
+    def atualizar(self, contagens):
+        """Soma as contagens exatas de um chunk (Series valor -> contagem)."""
+        parcial = SpaceSaving(self.capacidade)
+        parcial.contagens = contagens.astype('int64')
+        parcial.erros = pd.Series(0, index=contagens.index, dtype='int64')
+        parcial._truncar()
+        self.mesclar(parcial)
+
+    def mesclar(self, outro):
+        # Resumos mescláveis (Agarwal et al.): quem falta em um lado recebe o piso dele
+        itens = self.contagens.index.union(outro.contagens.index)
+        self.contagens = (self.contagens.reindex(itens, fill_value=self.piso)
+                          + outro.contagens.reindex(itens, fill_value=outro.piso))
+        self.erros = (self.erros.reindex(itens, fill_value=self.piso)
+                      + outro.erros.reindex(itens, fill_value=outro.piso))
+        self.piso += outro.piso
+        self._truncar()
+
+    def _truncar(self):
+        if len(self.contagens) <= self.capacidade:
+            return
+        ordem = _ordenar(self.contagens)
+        self.piso = max(self.piso, int(ordem.iloc[self.capacidade]))
+        manter = ordem.index[:self.capacidade]
+        self.contagens = self.contagens[manter]
+        self.erros = self.erros[manter]
+
+
+class ResumoGeografico:
+    """Distintos e mais frequentes de cada coluna geográfica, exatos ou por sketches."""
+
+    def __init__(self, colunas=COLUNAS_GEOGRAFIA, limite_exato=LIMITE_EXATO,
+                 capacidade=CAPACIDADE_TOP, precisao=PRECISAO_HLL, erro_contagem=ERRO_CONTAGEM):
+        self.colunas = list(colunas)
+        self.limite_exato = limite_exato
+        self.exatas = {c: pd.Series(dtype='int64') for c in self.colunas}   # None: acima do limite
+        self.distintos_hll = {c: HyperLogLog(precisao) for c in self.colunas}
+        self.frequentes = {c: SpaceSaving(capacidade) for c in self.colunas}
+        self.contagem_min = {c: CountMin(erro_contagem) for c in self.colunas}
+        self.n = 0
+
+    def atualizar(self, df):
+        self.n += len(df)
+        for coluna in self.colunas:
+            contagens = _contagens(df[coluna])
+            hashes = _hashes(contagens.index)
+            self.distintos_hll[coluna].atualizar(hashes)
+            self.contagem_min[coluna].atualizar(hashes, contagens.to_numpy())
+            self.frequentes[coluna].atualizar(contagens)
+            self._somar_exatas(coluna, contagens)
+
+    def mesclar(self, outro):
+        self.n += outro.n
+        for coluna in self.colunas:
+            self.distintos_hll[coluna].mesclar(outro.distintos_hll[coluna])
+            self.contagem_min[coluna].mesclar(outro.contagem_min[coluna])
+            self.frequentes[coluna].mesclar(outro.frequentes[coluna])
+            if outro.exatas[coluna] is None:
+                self.exatas[coluna] = None
+            else:
+                self._somar_exatas(coluna, outro.exatas[coluna])
+
+    def _somar_exatas(self, coluna, contagens):
+        atual = self.exatas[coluna]
+        if atual is None:
+            return
+        soma = atual.add(contagens, fill_value=0).astype('int64') if len(atual) else contagens
+        self.exatas[coluna] = soma if len(soma) <= self.limite_exato else None
+
+    def exato(self, coluna):
+        return self.exatas[coluna] is not None
+
+    def distintos(self, coluna):
+        """Número de valores distintos (exato ou estimado pelo HyperLogLog)."""
+        if self.exato(coluna):
+            return len(self.exatas[coluna])
+        return self.distintos_hll[coluna].estimativa()
+
+    def contagens(self, coluna, n=None):
+        """
+        Clientes por valor, em ordem decrescente, como value_counts(): todos
+        os valores (ou os `n` primeiros) no modo exato; os candidatos do
+        Space-Saving, com a contagem limitada pelo Count-Min, acima do limite.
+        """
+        if self.exato(coluna):
+            contagens = self.exatas[coluna]
+        else:
+            candidatos = self.frequentes[coluna].contagens
+            estimadas = self.contagem_min[coluna].estimar(_hashes(candidatos.index))
+            contagens = pd.Series(np.minimum(candidatos.to_numpy(), estimadas), index=candidatos.index)
+        contagens = _ordenar(contagens.astype('int64'))
+        contagens.index.name = coluna
+        contagens.name = 'count'
+        return contagens if n is None else contagens.head(n)
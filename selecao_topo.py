@@ -0,0 +1,177 @@
+"""
+Seleção dos Maiores Valores (Top-k)
+Priceless Bank - Mastercard Challenge 2025
+
+Listas de clientes de maior renda (ou de qualquer outra medida), no total
+ou por grupo, sem ordenar nem filtrar a base inteira:
+
+- em memória, o k-ésimo maior valor sai de uma seleção parcial
+  (np.partition, tempo linear) e só as posições selecionadas são ordenadas;
+  por grupo, a seleção é feita dentro das posições de cada grupo;
+- em streaming, cada chunk é reduzido aos seus k melhores candidatos por
+  grupo e eles disputam um heap limitado a k linhas por grupo, de modo que
+  a memória depende de k e do número de grupos, nunca do tamanho da base.
+  Heaps de partes diferentes da base podem ser mesclados.
+
+Em ambos, a ordem é decrescente de valor, com empates na ordem da base, e
+o resultado é gravado direto no CSV de destino, em blocos de linhas.
+
+Uso:
+    python selecao_topo.py clientes_segmentados.csv top_segmento.csv --n 100 --por Segmento
+
+Ou, a partir de outro script:
+    from selecao_topo import posicoes_topo, exportar_posicoes
+    exportar_posicoes(df, posicoes_topo(df['Renda_Anual'], 500), 'top500.csv')
+"""
+
+import argparse
+import heapq
+import math
+
+import numpy as np
+import pandas as pd
+
+TAMANHO_BLOCO = 100_000
+
+
+def quantidade_fracao(n, fracao):
+    """
+    Quantos dos n valores formam os `fracao` maiores: as posições acima do
+    quantil 1 - fracao (interpolação linear), como em `valores >= quantil`.
+    """
+    return n - math.ceil((1 - fracao) * (n - 1)) if n else 0
+
+
+def posicoes_topo(valores, k, empates=False):
+    """
+    Posições dos k maiores valores (NaN ignorados), em ordem decrescente de
+    valor e, nos empates, na ordem da base. Com `empates`, todos os valores
+    iguais ao k-ésimo entram no resultado.
+    """
+    valores = np.asarray(valores, dtype='float64')
+    validos = np.flatnonzero(~np.isnan(valores))
+    k = min(int(k), len(validos))
+    if k <= 0:
+        return np.empty(0, dtype='int64')
+    candidatos = valores[validos]
+    corte = np.partition(candidatos, len(candidatos) - k)[len(candidatos) - k]
+    acima = validos[candidatos > corte]
+    no_corte = validos[candidatos == corte]
+    if not empates:
+        no_corte = no_corte[:k - len(acima)]
+    posicoes = np.concatenate([acima, no_corte])
+    return posicoes[np.argsort(-valores[posicoes], kind='stable')]
+
+
+def posicoes_topo_grupo(chaves, valores, k, empates=False):
+    """
+    Posições dos k maiores valores de cada grupo, grupo a grupo em ordem
+    crescente de chave (linhas sem chave são ignoradas).
+    """
+    codigos, _ = pd.factorize(pd.Series(chaves), sort=True)
+    valores = np.asarray(valores, dtype='float64')
+    ordem = np.argsort(codigos, kind='stable')
+    ordem = ordem[codigos[ordem] >= 0]
+    limites = np.cumsum(np.bincount(codigos[ordem]))[:-1] if len(ordem) else []
+    return np.concatenate([np.empty(0, dtype='int64')] + [
+        linhas[posicoes_topo(valores[linhas], k, empates)]
+        for linhas in np.split(ordem, limites)])
+
+
+def exportar_posicoes(df, posicoes, arquivo, tamanho_bloco=TAMANHO_BLOCO):
+    """Grava as linhas `posicoes` de `df` no CSV, em blocos, sem copiar o resultado inteiro."""
+    if len(posicoes) == 0:
+        df.iloc[:0].to_csv(arquivo, index=False, encoding='utf-8-sig')
+    for inicio in range(0, len(posicoes), tamanho_bloco):
+        primeiro = inicio == 0
+        df.take(posicoes[inicio:inicio + tamanho_bloco]).to_csv(
+            arquivo, mode='w' if primeiro else 'a', header=primeiro,
+            index=False, encoding='utf-8-sig' if primeiro else 'utf-8')
+    return len(posicoes)
+
+
+class TopoStreaming:
+    """
+    Os k maiores valores de `coluna` (por grupo de `por`, se informado) em
+    uma base lida em chunks. Cada grupo guarda um heap de até k entradas
+    (valor, -sequência, linha): o menor valor sai primeiro e, entre valores
+    iguais, a linha mais recente.
+    """
+
+    def __init__(self, coluna, k, por=None):
+        self.coluna = coluna
+        self.k = k
+        self.por = por
+        self.colunas = None
+        self.heaps = {}
+        self.linhas_lidas = 0
+
+    def atualizar(self, chunk):
+        if self.colunas is None:
+            self.colunas = list(chunk.columns)
+        valores = chunk[self.coluna].to_numpy('float64')
+        if self.por is None:
+            chaves = None
+            candidatos = posicoes_topo(valores, self.k)
+        else:
+            chaves = chunk[self.por].to_numpy()
+            candidatos = posicoes_topo_grupo(chaves, valores, self.k)
+        linhas = chunk.take(candidatos).itertuples(index=False, name=None)
+        for posicao, linha in zip(candidatos, linhas):
+            grupo = None if chaves is None else chaves[posicao]
+            self._inserir(grupo, (valores[posicao], -(self.linhas_lidas + int(posicao)), linha))
+        self.linhas_lidas += len(chunk)
+
+    def _inserir(self, grupo, item):
+        heap = self.heaps.setdefault(grupo, [])
+        if len(heap) < self.k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    def mesclar(self, outro):
+        """Junta o resultado de outra parte da base, lida depois desta."""
+        self.colunas = self.colunas or outro.colunas
+        for grupo, heap in outro.heaps.items():
+            for valor, sequencia, linha in heap:
+                self._inserir(grupo, (valor, sequencia - self.linhas_lidas, linha))
+        self.linhas_lidas += outro.linhas_lidas
+
+    def resultado(self):
+        """DataFrame com as linhas selecionadas, grupo a grupo, em ordem decrescente de valor."""
+        grupos = sorted(self.heaps, key=lambda g: (g is None, g))
+        linhas = [linha for grupo in grupos
+                  for _, _, linha in sorted(self.heaps[grupo], reverse=True)]
+        return pd.DataFrame.from_records(linhas, columns=self.colunas)
+
+    def exportar(self, arquivo):
+        resultado = self.resultado()
+        resultado.to_csv(arquivo, index=False, encoding='utf-8-sig')
+        return len(resultado)
+
+
+def selecionar_arquivo(entrada, saida, coluna, k, por=None, tamanho_chunk=TAMANHO_BLOCO):
+    topo = TopoStreaming(coluna, k, por)
+    for chunk in pd.read_csv(entrada, chunksize=tamanho_chunk):
+        topo.atualizar(chunk)
+    return topo.exportar(saida)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seleciona as linhas de maior valor de um CSV')
+    parser.add_argument('entrada', help='CSV de clientes (por exemplo, clientes_segmentados.csv)')
+    parser.add_argument('saida', help='CSV de saída com as linhas selecionadas')
+    parser.add_argument('--coluna', default='Renda_Anual', help='medida usada na ordenação')
+    parser.add_argument('--n', type=int, default=100, help='linhas por grupo (ou no total)')
+    parser.add_argument('--por', default=None, help='coluna de grupo (Estado, Cidade, Segmento...)')
+    parser.add_argument('--tamanho-chunk', type=int, default=TAMANHO_BLOCO)
+    args = parser.parse_args()
+
+    total = selecionar_arquivo(args.entrada, args.saida, args.coluna, args.n, args.por,
+                               args.tamanho_chunk)
+    print(f"✓ {total:,} clientes selecionados")
+    print(f"✓ Arquivo salvo: {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""
+Varredura Paralela do Número de Clusters
+Priceless Bank - Mastercard Challenge 2025
+
+Executa os ajustes de K-Means para cada par (k, semente) em um pool de
+processos. A matriz padronizada é publicada uma vez em memória
+compartilhada (PoolMatriz) e lida pelos processos sem cópia. O melhor
+ajuste de cada k é guardado, o cotovelo da curva de inércia é detectado
+automaticamente (método Kneedle) e o ajuste vencedor é reutilizado na
+segmentação.
+
+O mesmo pool atribui depois o segmento e a distância ao centróide de cada
+cliente, em blocos de linhas: cada processo escreve a sua parte direto nos
+buffers de saída compartilhados, sem devolver arrays por pickling.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from agendador_etapas import contexto_processos
+import instrumentacao
+from memoria_compartilhada import MatrizCompartilhada, anexar
+
+K_RANGE = range(2, 11)
+N_CLUSTERS = None  # None: detectado automaticamente pelo método do cotovelo
+RANDOM_STATE = 42
+TAMANHO_BLOCO_ATRIBUICAO = 100_000
+
+# Estado de cada processo de trabalho, preenchido pelo inicializador
+_BLOCO = None
+_MATRIZ = None
+
+
+def _inicializar_processo(descritor):
+    global _BLOCO, _MATRIZ
+    from threadpoolctl import threadpool_limits
+
+    _BLOCO, _MATRIZ = anexar(descritor)
+    # Um processo por núcleo: sem threads extras do BLAS/OpenMP em cada um
+    threadpool_limits(1)
+
+
+def _ajustar(matriz, k, semente, max_iter):
+    # sklearn só é importado quando há ajuste a fazer
+    from sklearn.cluster import KMeans
+
+    modelo = KMeans(n_clusters=k, n_init=1, random_state=semente, max_iter=max_iter)
+    _, medicao = instrumentacao.medir(modelo.fit, matriz)
+    # Os rótulos têm o tamanho da base; só o vencedor precisa deles
+    del modelo.labels_
+    return k, semente, modelo.inertia_, modelo, medicao
+
+
+def _ajustar_no_processo(tarefa):
+    return _ajustar(_MATRIZ, *tarefa)
+
+
+def _executar_no_processo(tarefa):
+    funcao, argumentos = tarefa
+    return funcao(_MATRIZ, *argumentos)
+
+
+def atribuir_lote(lote, modelo):
+    """Segmento e distância euclidiana ao centróide de cada linha de `lote`."""
+    rotulos = modelo.predict(lote)
+    diferenca = lote - modelo.cluster_centers_[rotulos].astype(lote.dtype, copy=False)
+    return rotulos, np.sqrt(np.einsum('ij,ij->i', diferenca, diferenca))
+
+
+def _atribuir_bloco(matriz, inicio, fim, modelo, rotulos, distancias):
+    rotulos[inicio:fim], distancias[inicio:fim] = atribuir_lote(matriz[inicio:fim], modelo)
+
+
+def _atribuir_no_processo(tarefa):
+    inicio, fim, modelo, descritores = tarefa
+    blocos, saidas = zip(*(anexar(d, escrita=True) for d in descritores))
+    try:
+        _atribuir_bloco(_MATRIZ, inicio, fim, modelo, *saidas)
+    finally:
+        del saidas
+        for bloco in blocos:
+            bloco.close()
+
+
+class PoolMatriz:
+    """
+    Processos de trabalho anexados a `matriz`, publicada uma vez em memória
+    compartilhada e usada por todas as tarefas do `with`. Com um processo,
+    as tarefas rodam no próprio processo, sobre a matriz original.
+    """
+
+    def __init__(self, matriz, n_processos=None):
+        self.matriz = matriz
+        self.n_processos = n_processos or os.cpu_count() or 1
+        self.executor = None
+        self._compartilhada = None
+
+    def __enter__(self):
+        if self.n_processos > 1:
+            self._compartilhada = MatrizCompartilhada.publicar(self.matriz)
+            self.executor = ProcessPoolExecutor(max_workers=self.n_processos,
+                                                mp_context=contexto_processos(),
+                                                initializer=_inicializar_processo,
+                                                initargs=(self._compartilhada.descritor,))
+        return self
+
+    def __exit__(self, *exc):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self._compartilhada.fechar()
+            self.executor = self._compartilhada = None
+
+    def mapear(self, funcao, tarefas):
+        """Resultados de `funcao(tarefa)` nos processos, em ordem."""
+        return list(self.executor.map(funcao, tarefas,
+                                      chunksize=max(1, len(tarefas) // (4 * self.n_processos))))
+
+    def executar(self, funcao, tarefas):
+        """
+        Resultados de `funcao(matriz, *tarefa)`, em ordem: nos processos (com
+        a matriz compartilhada) ou, com um processo, no próprio processo.
+        `funcao` precisa ser de nível de módulo, para ir por referência.
+        """
+        if self.executor is None:
+            return [funcao(self.matriz, *tarefa) for tarefa in tarefas]
+        return self.mapear(_executar_no_processo, [(funcao, tarefa) for tarefa in tarefas])
+
+
+def detectar_cotovelo(k_valores, inercias):
+    """
+    Método Kneedle para uma curva decrescente e convexa: normaliza k e a
+    inércia para [0, 1] e escolhe o ponto mais distante, abaixo, da reta
+    que liga o primeiro e o último ponto. Retorna None se não houver joelho.
+    """
+    k_valores = np.asarray(k_valores, dtype='float64')
+    inercias = np.asarray(inercias, dtype='float64')
+    if len(k_valores) < 3 or inercias.max() == inercias.min():
+        return None
+    x = (k_valores - k_valores.min()) / (k_valores.max() - k_valores.min())
+    y = (inercias - inercias.min()) / (inercias.max() - inercias.min())
+    diferenca = (1 - x) - y
+    indice = int(np.argmax(diferenca))
+    if diferenca[indice] <= 0:
+        return None
+    return int(k_valores[indice])
+
+
+def varrer_k(matriz, k_range, n_init=10, random_state=RANDOM_STATE, n_processos=None, max_iter=300,
+             pool=None):
+    """
+    Ajusta K-Means para cada k em `k_range` com `n_init` sementes e retorna
+    um dicionário com as inércias (melhor semente por k) e o melhor modelo
+    de cada k. Com `pool` (um PoolMatriz de `matriz` já aberto), os ajustes
+    rodam nos processos dele, que continuam disponíveis para a atribuição.
+    """
+    if pool is None:
+        with PoolMatriz(matriz, n_processos) as pool:
+            return varrer_k(matriz, k_range, n_init, random_state, max_iter=max_iter, pool=pool)
+
+    sementes = np.random.RandomState(random_state).randint(np.iinfo(np.int32).max, size=n_init)
+    tarefas = [(k, int(s), max_iter) for k in k_range for s in sementes]
+
+    with instrumentacao.secao('varredura_k', linhas=len(matriz)):
+        if pool.executor is None:
+            resultados = [_ajustar(matriz, *t) for t in tarefas]
+        else:
+            resultados = pool.mapear(_ajustar_no_processo, tarefas)
+        for k, _, _, _, medicao in resultados:
+            instrumentacao.registrar(f"kmeans[k={k}]", medicao, categoria='ajuste', linhas=len(matriz))
+
+    melhores = {}
+    for k, semente, inercia, modelo, _ in resultados:
+        if k not in melhores or inercia < melhores[k].inertia_:
+            melhores[k] = modelo
+    k_valores = list(k_range)
+    return {
+        'k_range': k_valores,
+        'inertias': [melhores[k].inertia_ for k in k_valores],
+        'modelos': melhores,
+    }
+
+
+def atribuir(matriz, modelo, pool=None, tamanho_bloco=TAMANHO_BLOCO_ATRIBUICAO):
+    """
+    Segmento (int32) e distância euclidiana ao centróide (no dtype da
+    matriz) de cada linha de `matriz`, calculados em blocos de linhas. Com
+    `pool`, cada processo escreve os seus blocos nos buffers compartilhados.
+    """
+    n = len(matriz)
+    blocos = [(inicio, min(inicio + tamanho_bloco, n)) for inicio in range(0, n, tamanho_bloco)]
+    with instrumentacao.secao('atribuicao', linhas=n):
+        if pool is None or pool.executor is None:
+            rotulos = np.empty(n, dtype='int32')
+            distancias = np.empty(n, dtype=matriz.dtype)
+            for inicio, fim in blocos:
+                _atribuir_bloco(matriz, inicio, fim, modelo, rotulos, distancias)
+            return rotulos, distancias
+        with MatrizCompartilhada((n,), 'int32') as rotulos, \
+                MatrizCompartilhada((n,), matriz.dtype) as distancias:
+            descritores = (rotulos.descritor, distancias.descritor)
+            pool.mapear(_atribuir_no_processo, [(inicio, fim, modelo, descritores) for inicio, fim in blocos])
+            # Os buffers saem da memória compartilhada com o `with`
+            return rotulos.array.copy(), distancias.array.copy()
+
+
+def escolher_modelo(varredura, matriz, n_clusters=None, n_clusters_padrao=5, pool=None):
+    """
+    Escolhe o k (informado ou detectado pelo cotovelo), reatribui os rótulos
+    do ajuste vencedor (ver atribuir) e retorna (k, modelo, rotulos,
+    distancias, automatico).
+    """
+    automatico = n_clusters is None
+    if automatico:
+        n_clusters = detectar_cotovelo(varredura['k_range'], varredura['inertias']) or n_clusters_padrao
+    if n_clusters not in varredura['modelos']:
+        raise ValueError(f"k={n_clusters} está fora da varredura {varredura['k_range']}")
+    modelo = varredura['modelos'][n_clusters]
+    rotulos, distancias = atribuir(matriz, modelo, pool)
+    modelo.labels_ = rotulos
+    return n_clusters, modelo, rotulos, distancias, automatico